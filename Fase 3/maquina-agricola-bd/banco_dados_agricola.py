@@ -1,283 +1,2008 @@
-import sqlite3
-import datetime
-import random
-import csv
-import os
-from typing import List, Dict, Any, Tuple, Optional
-
-class BancoDadosAgricola:
-    def __init__(self, nome_bd: str = "dados_agricolas.db"):
-        """Inicializa a conexão com o banco de dados."""
-        self.nome_bd = nome_bd
-        self.conn = sqlite3.connect(nome_bd)
-        self.cursor = self.conn.cursor()
-        self.criar_tabelas()
-        
-    def criar_tabelas(self) -> None:
-        """Cria a tabela de sensores se não existir."""
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS leituras_sensores (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            data_hora TEXT NOT NULL,
-            umidade REAL,
-            ph REAL,
-            fosforo INTEGER,
-            potassio INTEGER,
-            status_bomba INTEGER,
-            observacoes TEXT
-        )
-        ''')
-        self.conn.commit()
-        print("Tabela criada com sucesso!")
-        
-    def inserir_leitura(self, umidade: float, ph: float, fosforo: int, 
-                      potassio: int, status_bomba: int, observacoes: str = "") -> int:
-        """
-        Insere uma nova leitura no banco de dados.
-        
-        Args:
-            umidade: Valor de umidade (%)
-            ph: Valor de pH
-            fosforo: Nível de fósforo (P)
-            potassio: Nível de potássio (K)
-            status_bomba: Status da bomba (0=desligada, 1=ligada)
-            observacoes: Observações adicionais
-            
-        Returns:
-            ID do registro inserido
-        """
-        data_hora = datetime.datetime.now().isoformat()
-        
-        self.cursor.execute('''
-        INSERT INTO leituras_sensores 
-        (data_hora, umidade, ph, fosforo, potassio, status_bomba, observacoes)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (data_hora, umidade, ph, fosforo, potassio, status_bomba, observacoes))
-        
-        self.conn.commit()
-        return self.cursor.lastrowid
-    
-    def obter_todas_leituras(self) -> List[Dict[str, Any]]:
-        """Retorna todas as leituras do banco de dados."""
-        self.cursor.execute('SELECT * FROM leituras_sensores')
-        linhas = self.cursor.fetchall()
-        
-        colunas = [description[0] for description in self.cursor.description]
-        resultado = []
-        
-        for linha in linhas:
-            resultado.append(dict(zip(colunas, linha)))
-            
-        return resultado
-    
-    def obter_leitura_por_id(self, id_leitura: int) -> Optional[Dict[str, Any]]:
-        """Retorna uma leitura específica pelo ID."""
-        self.cursor.execute('SELECT * FROM leituras_sensores WHERE id = ?', (id_leitura,))
-        linha = self.cursor.fetchone()
-        
-        if linha:
-            colunas = [description[0] for description in self.cursor.description]
-            return dict(zip(colunas, linha))
-        return None
-    
-    def atualizar_leitura(self, id_leitura: int, **kwargs) -> bool:
-        """
-        Atualiza uma leitura existente.
-        
-        Args:
-            id_leitura: ID do registro a ser atualizado
-            **kwargs: Campos a serem atualizados (umidade, ph, etc.)
-            
-        Returns:
-            True se a atualização foi bem-sucedida, False caso contrário
-        """
-        if not kwargs:
-            return False
-            
-        # Construir a query de atualização dinamicamente
-        set_clause = ", ".join([f"{key} = ?" for key in kwargs.keys()])
-        valores = list(kwargs.values())
-        valores.append(id_leitura)
-        
-        self.cursor.execute(
-            f'UPDATE leituras_sensores SET {set_clause} WHERE id = ?', 
-            valores
-        )
-        
-        self.conn.commit()
-        return self.cursor.rowcount > 0
-    
-    def deletar_leitura(self, id_leitura: int) -> bool:
-        """
-        Deleta uma leitura pelo ID.
-        
-        Args:
-            id_leitura: ID do registro a ser deletado
-            
-        Returns:
-            True se a deleção foi bem-sucedida, False caso contrário
-        """
-        self.cursor.execute('DELETE FROM leituras_sensores WHERE id = ?', (id_leitura,))
-        self.conn.commit()
-        return self.cursor.rowcount > 0
-    
-    def exportar_para_csv(self, nome_arquivo: str = "dados_sensores.csv") -> str:
-        """
-        Exporta todos os dados para um arquivo CSV.
-        
-        Args:
-            nome_arquivo: Nome do arquivo CSV
-            
-        Returns:
-            Caminho do arquivo CSV gerado
-        """
-        dados = self.obter_todas_leituras()
-        
-        if not dados:
-            return "Sem dados para exportar"
-            
-        with open(nome_arquivo, 'w', newline='') as csvfile:
-            nomes_campos = dados[0].keys()
-            writer = csv.DictWriter(csvfile, fieldnames=nomes_campos)
-            
-            writer.writeheader()
-            for linha in dados:
-                writer.writerow(linha)
-                
-        return os.path.abspath(nome_arquivo)
-    
-    def importar_do_serial(self, dados_serial: List[str]) -> List[int]:
-        """
-        Importa dados do monitor serial.
-        
-        Args:
-            dados_serial: Lista de strings com dados do monitor serial
-            
-        Returns:
-            Lista de IDs dos registros inseridos
-        """
-        ids_inseridos = []
-        
-        for linha in dados_serial:
-            # Assumindo formato: "umidade,ph,fosforo,potassio,status_bomba"
-            try:
-                partes = linha.strip().split(',')
-                if len(partes) >= 5:
-                    umidade = float(partes[0])
-                    ph = float(partes[1])
-                    fosforo = int(partes[2])
-                    potassio = int(partes[3])
-                    status_bomba = int(partes[4])
-                    
-                    observacoes = ""
-                    if len(partes) > 5:
-                        observacoes = partes[5]
-                        
-                    id_leitura = self.inserir_leitura(
-                        umidade, ph, fosforo, potassio, status_bomba, observacoes
-                    )
-                    ids_inseridos.append(id_leitura)
-            except (ValueError, IndexError) as e:
-                print(f"Erro ao processar linha: {linha}. Erro: {e}")
-                
-        return ids_inseridos
-    
-    def fechar(self):
-        """Fecha a conexão com o banco de dados."""
-        if self.conn:
-            self.conn.close()
-            
-    def __enter__(self):
-        return self
-        
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        self.fechar()
-
-
-# Função para gerar dados simulados do monitor serial
-def gerar_dados_exemplo(num_amostras: int = 10) -> List[str]:
-    """
-    Gera dados simulados do monitor serial.
-    
-    Args:
-        num_amostras: Número de amostras a serem geradas
-        
-    Returns:
-        Lista de strings simulando dados do monitor serial
-    """
-    dados = []
-    
-    for _ in range(num_amostras):
-        umidade = round(random.uniform(20.0, 90.0), 1)  # 20% a 90%
-        ph = round(random.uniform(4.0, 8.5), 1)  # pH 4.0 a 8.5
-        fosforo = random.randint(0, 100)  # Nível de 0 a 100
-        potassio = random.randint(0, 100)  # Nível de 0 a 100
-        status_bomba = 1 if umidade < 40.0 else 0  # Liga a bomba se umidade < 40%
-        
-        linha = f"{umidade},{ph},{fosforo},{potassio},{status_bomba}"
-        dados.append(linha)
-        
-    return dados
-
-
-# Demonstração do uso da classe
-if __name__ == "__main__":
-    # Criar instância do banco de dados
-    bd = BancoDadosAgricola()
-    
-    print("\n=== Demonstração do Sistema de Banco de Dados Agrícola ===\n")
-    
-    # 1. Gerar e importar dados simulados
-    print("Gerando dados simulados do monitor serial...")
-    dados_serial = gerar_dados_exemplo(15)
-    print(f"Dados gerados: {dados_serial[:3]}... (total: {len(dados_serial)})")
-    
-    print("\nImportando dados para o banco de dados...")
-    ids_inseridos = bd.importar_do_serial(dados_serial)
-    print(f"Registros inseridos: {len(ids_inseridos)}")
-    
-    # 2. Consultar todos os registros
-    print("\nConsultando todos os registros:")
-    todas_leituras = bd.obter_todas_leituras()
-    for i, leitura in enumerate(todas_leituras[:3]):
-        print(f"  Registro {i+1}: {leitura}")
-    if len(todas_leituras) > 3:
-        print(f"  ... (mais {len(todas_leituras) - 3} registros)")
-    
-    # 3. Consultar um registro específico
-    if ids_inseridos:
-        id_leitura = ids_inseridos[0]
-        print(f"\nConsultando registro com ID {id_leitura}:")
-        leitura = bd.obter_leitura_por_id(id_leitura)
-        print(f"  {leitura}")
-    
-    # 4. Atualizar um registro
-    if ids_inseridos:
-        id_leitura = ids_inseridos[0]
-        print(f"\nAtualizando registro com ID {id_leitura}:")
-        sucesso = bd.atualizar_leitura(id_leitura, umidade=95.5, observacoes="Valor atualizado manualmente")
-        print(f"  Atualização {'bem-sucedida' if sucesso else 'falhou'}")
-        
-        # Verificar a atualização
-        leitura_atualizada = bd.obter_leitura_por_id(id_leitura)
-        print(f"  Registro atualizado: {leitura_atualizada}")
-    
-    # 5. Deletar um registro
-    if len(ids_inseridos) > 1:
-        id_leitura = ids_inseridos[-1]
-        print(f"\nDeletando registro com ID {id_leitura}:")
-        sucesso = bd.deletar_leitura(id_leitura)
-        print(f"  Deleção {'bem-sucedida' if sucesso else 'falhou'}")
-        
-        # Verificar a deleção
-        leitura_deletada = bd.obter_leitura_por_id(id_leitura)
-        print(f"  Tentativa de buscar registro deletado: {leitura_deletada}")
-    
-    # 6. Exportar para CSV
-    print("\nExportando dados para CSV:")
-    caminho_csv = bd.exportar_para_csv()
-    print(f"  Arquivo CSV gerado em: {caminho_csv}")
-    
-    # Fechar a conexão
-    bd.fechar()
+import sqlite3
+import datetime
+import random
+import csv
+import os
+import gzip
+import time
+from collections import OrderedDict, namedtuple
+from itertools import chain
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import List, Dict, Any, Tuple, Optional, Iterable, Iterator, Sequence, Callable, TextIO
+
+from pool_conexoes import PoolConexoes
+from leituras_recentes import LeiturasRecentes
+from cache_consultas import CacheConsultas
+from leituras_batch import LeiturasBatch
+
+# Colunas preenchidas a partir de uma linha do monitor serial, na ordem do protocolo
+COLUNAS_SERIAL = ('umidade', 'ph', 'fosforo', 'potassio', 'status_bomba', 'observacoes')
+
+# Colunas graváveis da tabela leituras_sensores (todas exceto o id)
+COLUNAS_LEITURA = ('data_hora', 'umidade', 'ph', 'fosforo', 'potassio', 'status_bomba',
+                   'observacoes')
+
+# Perfis de desempenho do SQLite, aplicados com PRAGMAs ao abrir a conexão.
+# Todos usam WAL, para que o painel leia enquanto a ingestão grava. O checkpoint
+# periódico (PASSIVE, não bloqueia leitores) limita o crescimento do arquivo -wal.
+PERFIS_DESEMPENHO = {
+    # Cada commit é sincronizado no disco: nenhuma leitura confirmada se perde
+    'durable': {
+        'pragmas': {'journal_mode': 'WAL', 'synchronous': 'FULL', 'cache_size': -16000,
+                    'mmap_size': 0, 'temp_store': 'DEFAULT', 'busy_timeout': 5000},
+        'checkpoint_commits': 1000,
+        'checkpoint_segundos': 60,
+    },
+    # Uso geral: em WAL, NORMAL só sincroniza nos checkpoints e não corrompe o banco
+    'balanced': {
+        'pragmas': {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'cache_size': -64000,
+                    'mmap_size': 256 * 1024 * 1024, 'temp_store': 'MEMORY',
+                    'busy_timeout': 10000},
+        'checkpoint_commits': 500,
+        'checkpoint_segundos': 30,
+    },
+    # Cargas em massa que podem ser refeitas: sem fsync, uma queda de energia pode
+    # perder as últimas transações
+    'ingest': {
+        'pragmas': {'journal_mode': 'WAL', 'synchronous': 'OFF', 'cache_size': -256000,
+                    'mmap_size': 1024 * 1024 * 1024, 'temp_store': 'MEMORY',
+                    'busy_timeout': 30000},
+        'checkpoint_commits': 200,
+        'checkpoint_segundos': 10,
+    },
+}
+
+# Formatos de linha aceitos por BancoDadosAgricola.iterar_leituras ('batch': cada
+# lote é um LeiturasBatch e cada linha, uma Leitura desse lote)
+TIPOS_LINHA = ('dict', 'tupla', 'namedtuple', 'batch')
+
+# Tabelas de resumo por granularidade: uma linha por hora ('AAAA-MM-DDTHH') ou por dia ('AAAA-MM-DD')
+TABELAS_RESUMO = {'hora': 'resumo_horario', 'dia': 'resumo_diario'}
+
+# Expressão que extrai a chave do período de data_hora, por tabela de resumo
+_PERIODO_RESUMO = {
+    'resumo_horario': "substr(data_hora, 1, 10) || 'T' || substr(data_hora, 12, 2)",
+    'resumo_diario': "substr(data_hora, 1, 10)",
+}
+
+# O mesmo para data_hora em epoch (ms), convertido para a hora local
+_PERIODO_RESUMO_EPOCH = {
+    'resumo_horario': "strftime('%Y-%m-%dT%H', data_hora / 1000, 'unixepoch', 'localtime')",
+    'resumo_diario': "strftime('%Y-%m-%d', data_hora / 1000, 'unixepoch', 'localtime')",
+}
+
+# Converte data_hora em texto ISO (hora local) para epoch em ms, na migração
+_SQL_EPOCH_MS = ("CAST(strftime('%s', {0}, 'utc') AS INTEGER) * 1000 "
+                 "+ CAST(substr(strftime('%f', {0}), 4) AS INTEGER)")
+
+# Índices das tabelas de leituras (nome -> colunas). O de status_bomba inclui
+# data_hora para filtrar bomba e período juntos.
+_INDICES_LEITURAS = {
+    'idx_leituras_data_hora': 'data_hora',
+    'idx_leituras_status_data': 'status_bomba, data_hora',
+}
+
+# Medidas resumidas (quantidade, soma, mínimo e máximo de cada uma)
+MEDIDAS_RESUMO = ('umidade', 'ph', 'fosforo', 'potassio')
+
+# Colunas cuja alteração muda os resumos da leitura (valores ou período)
+_COLUNAS_RESUMIDAS = frozenset(MEDIDAS_RESUMO + ('status_bomba', 'data_hora'))
+
+# Modo particionado: cada mês fica em um arquivo próprio ("<banco>_AAAA-MM.db").
+# Os IDs de um mês começam em (ano * 12 + mês - 1) << BITS_ID_MES, então o mês
+# de uma leitura é conhecido pelo ID e os IDs não se repetem entre arquivos.
+BITS_ID_MES = 32
+
+# Partições anexadas ao mesmo tempo (o SQLite aceita 10 bancos anexados; uma
+# vaga fica para o banco de arquivo da retenção)
+LIMITE_PARTICOES_ANEXADAS = 8
+
+# PRAGMAs do perfil que valem por banco e são repetidos em cada partição anexada
+_PRAGMAS_POR_BANCO = ('journal_mode', 'synchronous', 'cache_size', 'mmap_size')
+
+
+@lru_cache(maxsize=None)
+def _tipo_leitura(colunas: Tuple[str, ...]):
+    """Cria (uma única vez por projeção) o namedtuple usado nas leituras."""
+    return namedtuple('Leitura', colunas)
+
+
+def _texto_data_hora(valor: Any) -> str:
+    """
+    Converte datetime/date/texto ISO (ou epoch em ms) para data_hora em texto
+    ISO, sempre com 'T' entre a data e a hora, como datetime.isoformat().
+    """
+    if isinstance(valor, (datetime.datetime, datetime.date)):
+        return valor.isoformat()
+    if isinstance(valor, int):
+        return _data_hora_de_epoch(valor).isoformat()
+    valor = str(valor)
+    if valor[10:11] == ' ':
+        # 'AAAA-MM-DD HH:MM:SS' (str(datetime)) ficaria fora de ordem nas comparações de texto
+        return valor[:10] + 'T' + valor[11:]
+    return valor
+
+
+def _epoch_ms(valor: Any) -> int:
+    """Converte datetime/date/texto ISO (hora local) para epoch em milissegundos."""
+    if isinstance(valor, int):
+        return valor
+    if isinstance(valor, str):
+        valor = datetime.datetime.fromisoformat(valor)
+    elif not isinstance(valor, datetime.datetime):
+        valor = datetime.datetime.combine(valor, datetime.time())
+    # Em inteiros, arredondando meio milissegundo para cima como o SQLite
+    segundos = int(valor.replace(microsecond=0).timestamp())
+    return segundos * 1000 + (valor.microsecond + 500) // 1000
+
+
+def _data_hora_de_epoch(epoch_ms: int) -> datetime.datetime:
+    """Converte epoch em milissegundos para datetime na hora local."""
+    # O float tem resolução bem menor que 1 µs nessa faixa: os milissegundos saem exatos
+    return datetime.datetime.fromtimestamp(epoch_ms / 1000)
+
+
+def _chave_periodo(valor: Any, granularidade: str) -> str:
+    """Converte datetime/date/texto ISO na chave de período das tabelas de resumo."""
+    texto = _texto_data_hora(valor)
+    if granularidade == 'hora' and len(texto) >= 13:
+        return f"{texto[:10]}T{texto[11:13]}"
+    return texto[:10]
+
+
+def _periodo_seguinte(chave: str) -> str:
+    """Retorna a chave da hora ou do dia seguinte."""
+    if len(chave) > 10:
+        proxima = datetime.datetime.strptime(chave, '%Y-%m-%dT%H') + datetime.timedelta(hours=1)
+        return proxima.strftime('%Y-%m-%dT%H')
+    return (datetime.date.fromisoformat(chave) + datetime.timedelta(days=1)).isoformat()
+
+
+def _mes_seguinte(mes: str) -> str:
+    """Retorna o mês ('AAAA-MM') seguinte."""
+    ano, numero = int(mes[:4]), int(mes[5:7])
+    return f"{ano + numero // 12:04d}-{numero % 12 + 1:02d}"
+
+
+def _primeiro_id_mes(mes: str) -> int:
+    """Retorna o início da sequência de IDs da partição de um mês ('AAAA-MM')."""
+    return (int(mes[:4]) * 12 + int(mes[5:7]) - 1) << BITS_ID_MES
+
+
+def _mes_do_id(id_leitura: int) -> str:
+    """Retorna o mês ('AAAA-MM') da partição que guarda a leitura com esse ID."""
+    ano, indice = divmod(id_leitura >> BITS_ID_MES, 12)
+    return f"{ano:04d}-{indice + 1:02d}"
+
+
+def _filtro_intervalo(coluna: str, inicio: Optional[str], fim: Optional[str]) -> Tuple[str, List[str]]:
+    """Monta a condição `coluna` em [inicio, fim) (limites opcionais)."""
+    condicoes = []
+    parametros = []
+    if inicio is not None:
+        condicoes.append(f'{coluna} >= ?')
+        parametros.append(inicio)
+    if fim is not None:
+        condicoes.append(f'{coluna} < ?')
+        parametros.append(fim)
+    return ' AND '.join(condicoes) or '1', parametros
+
+
+def _colunas_resumo() -> str:
+    return ", ".join(f"quantidade_{m}, soma_{m}, min_{m}, max_{m}" for m in MEDIDAS_RESUMO)
+
+
+@lru_cache(maxsize=None)
+def _sql_somar_resumo(tabela: str, filtro: str, origem: str = 'leituras_sensores',
+                      epoch: bool = False) -> str:
+    """
+    Monta o INSERT ... SELECT que agrega as leituras de `origem` que atendem
+    `filtro` e soma o resultado às linhas já existentes da tabela de resumo (UPSERT).
+    Com epoch=True, data_hora está em epoch (ms).
+    """
+    agregados = ", ".join(f"COUNT({m}), SUM({m}), MIN({m}), MAX({m})" for m in MEDIDAS_RESUMO)
+    somas = ", ".join(
+        f"quantidade_{m} = quantidade_{m} + excluded.quantidade_{m}, "
+        f"soma_{m} = COALESCE(soma_{m} + excluded.soma_{m}, soma_{m}, excluded.soma_{m}), "
+        f"min_{m} = COALESCE(MIN(min_{m}, excluded.min_{m}), min_{m}, excluded.min_{m}), "
+        f"max_{m} = COALESCE(MAX(max_{m}, excluded.max_{m}), max_{m}, excluded.max_{m})"
+        for m in MEDIDAS_RESUMO
+    )
+    return (
+        f"INSERT INTO {tabela} (periodo, quantidade, bomba_ligada, {_colunas_resumo()}) "
+        f"SELECT {(_PERIODO_RESUMO_EPOCH if epoch else _PERIODO_RESUMO)[tabela]}, COUNT(*), "
+        f"SUM(CASE WHEN status_bomba = 1 THEN 1 ELSE 0 END), {agregados} "
+        f"FROM {origem} WHERE {filtro} GROUP BY 1 "
+        f"ON CONFLICT(periodo) DO UPDATE SET quantidade = quantidade + excluded.quantidade, "
+        f"bomba_ligada = bomba_ligada + excluded.bomba_ligada, {somas}"
+    )
+
+
+@lru_cache(maxsize=None)
+def _sql_retirar_resumo(tabela: str) -> str:
+    """Monta o UPDATE que subtrai leituras de uma linha da tabela de resumo."""
+    subtracoes = ", ".join(f"quantidade_{m} = quantidade_{m} - ?, soma_{m} = soma_{m} - ?"
+                           for m in MEDIDAS_RESUMO)
+    return (f"UPDATE {tabela} SET quantidade = quantidade - ?, "
+            f"bomba_ligada = bomba_ligada - ?, {subtracoes} WHERE periodo = ?")
+
+
+@lru_cache(maxsize=None)
+def _sql_agregar_retirada(tabela: str, filtro: str, origem: str, epoch: bool = False) -> str:
+    """
+    Monta o SELECT que agrega por período as leituras de `origem` que atendem
+    `filtro`, na ordem dos parâmetros de _sql_retirar_resumo.
+    """
+    periodo = (_PERIODO_RESUMO_EPOCH if epoch else _PERIODO_RESUMO)[tabela]
+    agregados = ", ".join(f"COUNT({m}), COALESCE(SUM({m}), 0)" for m in MEDIDAS_RESUMO)
+    return (f"SELECT COUNT(*), SUM(CASE WHEN status_bomba = 1 THEN 1 ELSE 0 END), {agregados}, "
+            f"{periodo} FROM {origem} WHERE {filtro} GROUP BY {periodo}")
+
+
+@lru_cache(maxsize=None)
+def _sql_atualizar(tabela: str, colunas: Tuple[str, ...]) -> str:
+    """Monta o UPDATE por ID das colunas informadas (já validadas)."""
+    return f"UPDATE {tabela} SET {', '.join(f'{coluna} = ?' for coluna in colunas)} WHERE id = ?"
+
+
+@lru_cache(maxsize=None)
+def _sql_dias_de_horas(filtro: str) -> str:
+    """Monta o INSERT ... SELECT que calcula o resumo diário a partir do horário."""
+    agregados = ", ".join(f"SUM(quantidade_{m}), SUM(soma_{m}), MIN(min_{m}), MAX(max_{m})"
+                          for m in MEDIDAS_RESUMO)
+    return (
+        f"INSERT INTO resumo_diario (periodo, quantidade, bomba_ligada, {_colunas_resumo()}) "
+        f"SELECT substr(periodo, 1, 10), SUM(quantidade), SUM(bomba_ligada), {agregados} "
+        f"FROM resumo_horario WHERE {filtro} GROUP BY 1"
+    )
+
+
+# Extensão acrescentada ao nome do CSV exportado, por compressão
+EXTENSOES_COMPRESSAO = {'gzip': '.gz', 'zstd': '.zst'}
+
+
+class _LinhasCsv(list):
+    """Destino de um csv.writer que guarda cada linha formatada como um item."""
+    write = list.append
+
+
+def _abrir_saida_csv(caminho: str, compressao: Optional[str], encoding: Optional[str]) -> TextIO:
+    """Abre um CSV para gravação, comprimindo durante a gravação com gzip ou zstd."""
+    if compressao == 'gzip':
+        # Nível 6: bem mais rápido que o padrão (9), com quase a mesma compressão
+        return gzip.open(caminho, 'wt', compresslevel=6, encoding=encoding, newline='')
+    if compressao == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("A compressão zstd requer o pacote zstandard (pip install zstandard)") from None
+        return zstandard.open(caminho, 'wt', encoding=encoding, newline='')
+    return open(caminho, 'w', newline='', encoding=encoding)
+
+
+def _nome_parte(nome_arquivo: str, numero: int) -> str:
+    """Nome de uma parte do CSV exportado: dados.csv.gz -> dados_parte001.csv.gz"""
+    raiz, extensao = os.path.splitext(nome_arquivo)
+    if extensao in EXTENSOES_COMPRESSAO.values():
+        raiz, interna = os.path.splitext(raiz)
+        extensao = interna + extensao
+    return f"{raiz}_parte{numero:03d}{extensao}"
+
+
+def _gravar_csv_em_partes(nome_arquivo: str, colunas: Sequence[str], lotes: Iterable[LeiturasBatch],
+                          compressao: Optional[str], tamanho_parte: int,
+                          encoding: Optional[str]) -> List[str]:
+    """
+    Grava lotes de leituras em arquivos CSV de até `tamanho_parte` bytes (do
+    CSV sem compressão), cada um com o cabeçalho. Uma linha maior que o limite
+    fica sozinha numa parte.
+
+    Returns:
+        Caminhos das partes gravadas
+    """
+    cabecalho = _LinhasCsv()
+    csv.writer(cabecalho).writerow(colunas)
+    cabecalho = cabecalho[0]
+    caminhos = []
+    saida = None
+    ocupado = 0
+    try:
+        for lote in lotes:
+            linhas = _LinhasCsv()
+            csv.writer(linhas).writerows(lote.tuplas())
+            for texto in linhas:
+                tamanho = len(texto) if texto.isascii() else len(texto.encode('utf-8'))
+                if saida is None or (ocupado + tamanho > tamanho_parte and ocupado > len(cabecalho)):
+                    if saida is not None:
+                        saida.close()
+                    caminhos.append(os.path.abspath(_nome_parte(nome_arquivo, len(caminhos) + 1)))
+                    saida = _abrir_saida_csv(caminhos[-1], compressao, encoding)
+                    saida.write(cabecalho)
+                    ocupado = len(cabecalho)
+                saida.write(texto)
+                ocupado += tamanho
+    finally:
+        if saida is not None:
+            saida.close()
+    return caminhos
+
+
+def converter_linha_serial(linha: str) -> Optional[Tuple]:
+    """
+    Converte uma linha do monitor serial em uma tupla na ordem de COLUNAS_SERIAL.
+
+    Args:
+        linha: Linha no formato "umidade,ph,fosforo,potassio,status_bomba[,observacoes]"
+
+    Returns:
+        Tupla com os valores convertidos ou None se a linha tiver menos de 5 campos
+
+    Raises:
+        ValueError: Se algum campo numérico for inválido
+    """
+    partes = linha.strip().split(',')
+    if len(partes) < 5:
+        return None
+
+    observacoes = partes[5] if len(partes) > 5 else ""
+
+    return (float(partes[0]), float(partes[1]), int(partes[2]), int(partes[3]),
+            int(partes[4]), observacoes)
+
+
+class BancoDadosAgricola:
+    def __init__(self, nome_bd: str = "dados_agricolas.db", perfil: str = "balanced",
+                 leitores: int = 0, particionado: bool = False,
+                 data_hora_epoch: bool = False, tamanho_recentes: int = 32,
+                 cache_consultas: int = 0):
+        """
+        Inicializa a conexão com o banco de dados.
+        
+        Args:
+            nome_bd: Caminho do arquivo SQLite
+            perfil: Perfil de desempenho ('durable', 'balanced' ou 'ingest')
+            leitores: Com 0 (padrão) usa uma única conexão. Com N > 0 ativa o modo
+                pool: uma conexão de escrita e até N conexões somente leitura,
+                seguro para uso por várias threads.
+            particionado: Grava as leituras de cada mês em um arquivo próprio ao lado
+                de nome_bd ("<nome>_AAAA-MM.db"), anexado sob demanda. O banco
+                principal guarda os resumos e o catálogo de partições.
+                Usa uma única conexão (leitores=0).
+            data_hora_epoch: Em um banco novo, grava data_hora como epoch em
+                milissegundos (INTEGER) em vez de texto ISO. Num banco existente
+                vale o tipo da coluna; para converter, use migrar_data_hora_para_epoch().
+                As leituras continuam voltando com data_hora em datetime.
+            tamanho_recentes: Leituras mais recentes mantidas em memória
+                (self.recentes), carregadas ao abrir e atualizadas a cada
+                gravação desta instância; 0 desativa
+            cache_consultas: Bytes do cache de resultados usado por
+                consultar_em_cache (self.cache), invalidado só quando os dados
+                mudam; 0 (padrão) desativa
+        """
+        if particionado and (leitores > 0 or nome_bd == ':memory:'):
+            raise ValueError("O modo particionado precisa de um arquivo e de uma única conexão (leitores=0)")
+        self.nome_bd = nome_bd
+        self.pool = None
+        self.particionado = particionado
+        # Atualizado por criar_tabelas com o tipo da coluna no banco
+        self.data_hora_epoch = data_hora_epoch
+        self.recentes = LeiturasRecentes(tamanho_recentes, MEDIDAS_RESUMO)
+        self.cache = CacheConsultas(cache_consultas)
+        # Commits feitos por esta instância (a data_version não muda com eles)
+        self._gravacoes = 0
+        # Colunas de leituras_sensores, na ordem da tabela (atualizado por recarregar_recentes)
+        self._colunas_leituras = ()
+        # Partições anexadas (mês -> nome do banco), da usada há mais tempo à mais recente
+        self._particoes_anexadas = OrderedDict()
+        if leitores > 0:
+            pragmas = PERFIS_DESEMPENHO.get(perfil, {}).get('pragmas', {})
+            self.pool = PoolConexoes(nome_bd, max_leitores=leitores,
+                                     pragmas={'auto_vacuum': 'INCREMENTAL', **pragmas})
+            self.conn = self.pool.escritor
+        else:
+            self.conn = sqlite3.connect(nome_bd)
+            # Precisa vir antes do WAL e das tabelas; só vale para banco novo
+            # (bancos antigos são convertidos por compactar())
+            self.conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        self.cursor = self.conn.cursor()
+        self.aplicar_perfil(perfil)
+        self.criar_tabelas()
+        self.recarregar_recentes()
+        
+    def aplicar_perfil(self, perfil: str) -> None:
+        """
+        Aplica um perfil de PERFIS_DESEMPENHO (PRAGMAs e política de checkpoint).
+        Pode ser chamado a qualquer momento, por exemplo para trocar para 'ingest'
+        durante uma carga grande e voltar para 'balanced' no final.
+        
+        Args:
+            perfil: 'durable', 'balanced' ou 'ingest'
+        """
+        if perfil not in PERFIS_DESEMPENHO:
+            raise ValueError(f"Perfil desconhecido: {perfil}. Use um de {list(PERFIS_DESEMPENHO)}")
+        
+        configuracao = PERFIS_DESEMPENHO[perfil]
+        with self._trava_escrita():
+            for nome, valor in configuracao['pragmas'].items():
+                self.conn.execute(f'PRAGMA {nome} = {valor}')
+            for nome_banco in self._particoes_anexadas.values():
+                self._aplicar_pragmas_particao(nome_banco, configuracao['pragmas'])
+        if self.pool is not None:
+            # Leitores abertos a partir de agora usam os novos PRAGMAs
+            self.pool.pragmas = dict(configuracao['pragmas'])
+        
+        self.perfil = perfil
+        self._checkpoint_commits = configuracao['checkpoint_commits']
+        self._checkpoint_segundos = configuracao['checkpoint_segundos']
+        self._commits_desde_checkpoint = 0
+        self._ultimo_checkpoint = time.monotonic()
+    
+    def checkpoint(self, modo: str = 'PASSIVE') -> Tuple[int, int, int]:
+        """
+        Copia as páginas do arquivo WAL para o banco principal.
+        
+        Args:
+            modo: 'PASSIVE' (não espera leitores), 'FULL', 'RESTART' ou 'TRUNCATE'
+        
+        Returns:
+            Tupla (ocupado, páginas no WAL, páginas copiadas) do PRAGMA wal_checkpoint
+        """
+        if modo not in ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'):
+            raise ValueError(f"Modo de checkpoint inválido: {modo}")
+        with self._trava_escrita():
+            resultado = self.conn.execute(f'PRAGMA wal_checkpoint({modo})').fetchone()
+            self._commits_desde_checkpoint = 0
+            self._ultimo_checkpoint = time.monotonic()
+        return resultado
+    
+    def _verificar_checkpoint(self) -> None:
+        """Faz um checkpoint PASSIVE a cada N commits ou T segundos, conforme o perfil."""
+        self._commits_desde_checkpoint += 1
+        if (self._commits_desde_checkpoint >= self._checkpoint_commits or
+                time.monotonic() - self._ultimo_checkpoint >= self._checkpoint_segundos):
+            self.checkpoint()
+    
+    @contextmanager
+    def _trava_escrita(self) -> Iterator[None]:
+        """No modo pool, garante acesso exclusivo à conexão de escrita."""
+        if self.pool is None:
+            yield
+        else:
+            with self.pool.escrita():
+                yield
+    
+    @contextmanager
+    def _escrita(self, imediata: bool = False) -> Iterator[sqlite3.Cursor]:
+        """
+        Executa um bloco de escrita em uma transação: commit (com a política de
+        checkpoint) ao final ou rollback em caso de erro.
+        
+        Args:
+            imediata: Abre a transação já com a trava de escrita do SQLite
+                (BEGIN IMMEDIATE). Sem ela, a trava só vem na primeira
+                gravação, e o que o bloco leu antes pode ter mudado por
+                gravações de outras conexões.
+        """
+        with self._trava_escrita():
+            cursor = self.conn.cursor()
+            try:
+                if imediata and not self.conn.in_transaction:
+                    cursor.execute('BEGIN IMMEDIATE')
+                yield cursor
+            except BaseException:
+                self.conn.rollback()
+                raise
+            self.conn.commit()
+            self._gravacoes += 1
+            self._verificar_checkpoint()
+    
+    @contextmanager
+    def _leitura(self) -> Iterator[sqlite3.Cursor]:
+        """Fornece um cursor de leitura (de um leitor do pool, se ativo)."""
+        with self.conexao_leitura() as conn:
+            cursor = conn.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+    
+    @contextmanager
+    def conexao_leitura(self) -> Iterator[sqlite3.Connection]:
+        """
+        Empresta uma conexão para leituras externas (ex.: pandas.read_sql_query).
+        No modo pool é uma conexão somente leitura; senão, a conexão principal.
+        """
+        if self.pool is None:
+            yield self.conn
+        else:
+            with self.pool.leitor() as conn:
+                yield conn
+
+    def versao_dados(self) -> Tuple[int, int]:
+        """
+        Versão dos dados, que muda a cada gravação: PRAGMA data_version (commits
+        de outras conexões e processos) e os commits desta instância. No modo
+        particionado, gravações externas que só alteram uma partição (e não os
+        resumos, no banco principal) não mudam a versão.
+
+        Returns:
+            Tupla (data_version, gravações desta instância)
+        """
+        if self.pool is not None:
+            return self.pool.versao_dados(), self._gravacoes
+        return self.conn.execute('PRAGMA data_version').fetchone()[0], self._gravacoes
+
+    def consultar_em_cache(self, funcao: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Executa funcao(*args, **kwargs) ou, se os dados não mudaram desde a
+        última execução com os mesmos argumentos, devolve o resultado guardado
+        em self.cache. A chave é o nome qualificado da função com os
+        argumentos, que precisam ser hashable. O resultado é compartilhado e
+        não deve ser alterado.
+
+        Ex.: bd.consultar_em_cache(bd.obter_resumo, 'dia', inicio, fim)
+        """
+        chave = (getattr(funcao, '__module__', None), getattr(funcao, '__qualname__', repr(funcao)),
+                 args, tuple(sorted(kwargs.items())))
+        return self.cache.obter(chave, self.versao_dados(), lambda: funcao(*args, **kwargs))
+        
+    def _anexar_particao(self, mes: str, criar: bool = False) -> Optional[str]:
+        """
+        Anexa a partição de um mês, se ainda não estiver anexada. No limite de
+        partições anexadas, desanexa as usadas há mais tempo; as que ainda têm
+        uma consulta em andamento continuam anexadas. Deve ser chamado fora de
+        transações.
+        
+        Args:
+            mes: Mês no formato 'AAAA-MM'
+            criar: Cria a partição (arquivo, tabela e índices) se ela não existir
+        
+        Returns:
+            Nome do banco anexado ou None se a partição não existe
+        """
+        nome = self._particoes_anexadas.get(mes)
+        if nome is not None:
+            self._particoes_anexadas.move_to_end(mes)
+            return nome
+        
+        linha = self.conn.execute('SELECT arquivo FROM particoes WHERE mes = ?', (mes,)).fetchone()
+        if linha is None and not criar:
+            return None
+        arquivo = linha[0] if linha is not None else self._arquivo_particao(mes)
+        
+        for antigo in list(self._particoes_anexadas):
+            if len(self._particoes_anexadas) < LIMITE_PARTICOES_ANEXADAS:
+                break
+            try:
+                self.conn.execute(f'DETACH DATABASE {self._particoes_anexadas[antigo]}')
+            except sqlite3.OperationalError:
+                # Lida por um iterador aberto (database is locked): fica para depois
+                continue
+            del self._particoes_anexadas[antigo]
+        
+        nome = 'p' + mes.replace('-', '_')
+        self.conn.execute(f'ATTACH DATABASE ? AS {nome}', (self._caminho_particao(arquivo),))
+        self._particoes_anexadas[mes] = nome
+        if linha is None:
+            self._criar_particao(mes, nome, arquivo)
+        self._aplicar_pragmas_particao(nome, PERFIS_DESEMPENHO[self.perfil]['pragmas'])
+        return nome
+    
+    def _definicao_leituras(self, tabela: str) -> str:
+        """CREATE TABLE IF NOT EXISTS de `tabela` com a definição atual de leituras_sensores."""
+        definicao = self.conn.execute(
+            "SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = 'leituras_sensores'"
+        ).fetchone()[0]
+        # Depois de um ALTER TABLE ... RENAME o nome fica entre aspas: troca-se tudo antes do '('
+        return f'CREATE TABLE IF NOT EXISTS {tabela} ({definicao.split("(", 1)[1]}'
+    
+    def _criar_particao(self, mes: str, nome: str, arquivo: str) -> None:
+        """Cria no banco anexado a tabela de leituras, com a sequência de IDs do mês."""
+        self.conn.execute(f'PRAGMA {nome}.auto_vacuum = INCREMENTAL')
+        definicao = self._definicao_leituras(f'{nome}.leituras_sensores')
+        with self._escrita() as cursor:
+            cursor.execute(definicao)
+            for indice, colunas in _INDICES_LEITURAS.items():
+                cursor.execute(f'CREATE INDEX IF NOT EXISTS {nome}.{indice} ON leituras_sensores ({colunas})')
+            # Um arquivo que já existia mantém a sua sequência
+            cursor.execute(
+                f"INSERT INTO {nome}.sqlite_sequence (name, seq) SELECT 'leituras_sensores', ? "
+                f"WHERE NOT EXISTS (SELECT 1 FROM {nome}.sqlite_sequence WHERE name = 'leituras_sensores')",
+                (_primeiro_id_mes(mes),)
+            )
+            cursor.execute('INSERT OR IGNORE INTO particoes (mes, arquivo) VALUES (?, ?)', (mes, arquivo))
+    
+    def _aplicar_pragmas_particao(self, nome: str, pragmas: Dict[str, Any]) -> None:
+        """Repete na partição anexada os PRAGMAs do perfil que valem por banco."""
+        for pragma in _PRAGMAS_POR_BANCO:
+            if pragma not in pragmas:
+                continue
+            try:
+                self.conn.execute(f'PRAGMA {nome}.{pragma} = {pragmas[pragma]}')
+            except sqlite3.OperationalError:
+                # O WAL não pode ser ligado com uma consulta em andamento; fica
+                # para a próxima vez que a partição for anexada
+                if pragma != 'journal_mode':
+                    raise
+    
+    def _arquivo_particao(self, mes: str) -> str:
+        """Nome do arquivo da partição de um mês (ex.: dados_agricolas_2025-03.db)."""
+        base, extensao = os.path.splitext(os.path.basename(self.nome_bd))
+        return f"{base}_{mes}{extensao or '.db'}"
+    
+    def _caminho_particao(self, arquivo: str) -> str:
+        """Caminho de um arquivo de partição, no mesmo diretório do banco principal."""
+        return os.path.join(os.path.dirname(self.nome_bd), arquivo)
+    
+    def _meses_particoes(self, inicio: Any = None, fim: Any = None,
+                         decrescente: bool = False) -> List[str]:
+        """Meses ('AAAA-MM') das partições que podem ter leituras no período [inicio, fim)."""
+        condicoes = []
+        parametros = []
+        if inicio is not None:
+            condicoes.append('mes >= ?')
+            parametros.append(_texto_data_hora(inicio)[:7])
+        if fim is not None:
+            condicoes.append("mes || '-01' < ?")
+            parametros.append(_texto_data_hora(fim))
+        where = f" WHERE {' AND '.join(condicoes)}" if condicoes else ""
+        ordem = ' DESC' if decrescente else ''
+        return [linha[0] for linha in
+                self.conn.execute(f'SELECT mes FROM particoes{where} ORDER BY mes{ordem}', parametros)]
+    
+    def _tabelas_leituras(self, inicio: Any = None, fim: Any = None,
+                          decrescente: bool = False) -> Iterator[str]:
+        """
+        Produz as tabelas de leituras que cobrem o período [inicio, fim): a tabela
+        principal ou, no modo particionado, a de cada mês do período, em ordem,
+        anexada só quando chega a sua vez.
+        """
+        if not self.particionado:
+            yield 'leituras_sensores'
+            return
+        for mes in self._meses_particoes(inicio, fim, decrescente):
+            yield f'{self._anexar_particao(mes)}.leituras_sensores'
+    
+    def _tabela_para_mes(self, mes: str) -> str:
+        """Tabela que recebe as leituras de um mês ('AAAA-MM'), criando a partição se preciso."""
+        if not self.particionado:
+            return 'leituras_sensores'
+        # Valida o mês antes de ele virar nome de arquivo e de banco anexado
+        datetime.datetime.strptime(mes, '%Y-%m')
+        return f'{self._anexar_particao(mes, criar=True)}.leituras_sensores'
+    
+    def _tabela_do_id(self, id_leitura: int) -> Optional[str]:
+        """Tabela que guarda a leitura com esse ID (None se a partição não existe)."""
+        if not self.particionado:
+            return 'leituras_sensores'
+        nome = self._anexar_particao(_mes_do_id(id_leitura))
+        return f'{nome}.leituras_sensores' if nome is not None else None
+
+    def criar_tabelas(self) -> None:
+        """Cria a tabela de sensores se não existir."""
+        with self._escrita() as cursor:
+            cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS leituras_sensores (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                data_hora {'INTEGER' if self.data_hora_epoch else 'TEXT'} NOT NULL,
+                umidade REAL,
+                ph REAL,
+                fosforo INTEGER,
+                potassio INTEGER,
+                status_bomba INTEGER,
+                observacoes TEXT
+            )
+            ''')
+            # Estado das rotinas de manutenção (ex.: corte da retenção)
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS manutencao (
+                chave TEXT PRIMARY KEY,
+                valor TEXT
+            )
+            ''')
+            if self.particionado:
+                # Catálogo das partições mensais (arquivo relativo ao diretório do banco)
+                cursor.execute('''
+                CREATE TABLE IF NOT EXISTS particoes (
+                    mes TEXT PRIMARY KEY,
+                    arquivo TEXT NOT NULL
+                )
+                ''')
+        self.data_hora_epoch = any(
+            linha[1] == 'data_hora' and linha[2].upper() == 'INTEGER'
+            for linha in self.conn.execute('PRAGMA main.table_info(leituras_sensores)')
+        )
+        self.criar_indices()
+        self.criar_tabelas_resumo()
+        if self.particionado and self.conn.execute('SELECT 1 FROM main.leituras_sensores LIMIT 1').fetchone():
+            print("Aviso: há leituras no banco principal; use migrar_para_particoes() para movê-las")
+        print("Tabela criada com sucesso!")
+        
+    def criar_indices(self) -> None:
+        """
+        Cria os índices usados nas consultas por período.
+        O índice de status_bomba inclui data_hora para filtrar bomba e período juntos.
+        """
+        with self._escrita() as cursor:
+            for indice, colunas in _INDICES_LEITURAS.items():
+                cursor.execute(f'CREATE INDEX IF NOT EXISTS {indice} ON leituras_sensores ({colunas})')
+    
+    def criar_tabelas_resumo(self) -> None:
+        """
+        Cria as tabelas de resumo por hora e por dia. Em um banco que já tem
+        leituras, os resumos são calculados na criação.
+        """
+        medidas = ", ".join(f"quantidade_{m} INTEGER NOT NULL DEFAULT 0, soma_{m} REAL, "
+                            f"min_{m} REAL, max_{m} REAL" for m in MEDIDAS_RESUMO)
+        with self._escrita() as cursor:
+            cursor.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN (?, ?)",
+                tuple(TABELAS_RESUMO.values())
+            )
+            existentes = cursor.fetchone()[0]
+            for tabela in TABELAS_RESUMO.values():
+                cursor.execute(f'''
+                CREATE TABLE IF NOT EXISTS {tabela} (
+                    periodo TEXT PRIMARY KEY,
+                    quantidade INTEGER NOT NULL,
+                    bomba_ligada INTEGER NOT NULL,
+                    {medidas}
+                ) WITHOUT ROWID
+                ''')
+        if existentes < len(TABELAS_RESUMO):
+            self.reconstruir_resumos()
+
+    def inserir_leitura(self, umidade: float, ph: float, fosforo: int, 
+                      potassio: int, status_bomba: int, observacoes: str = "") -> int:
+        """
+        Insere uma nova leitura no banco de dados.
+        
+        Args:
+            umidade: Valor de umidade (%)
+            ph: Valor de pH
+            fosforo: Nível de fósforo (P)
+            potassio: Nível de potássio (K)
+            status_bomba: Status da bomba (0=desligada, 1=ligada)
+            observacoes: Observações adicionais
+            
+        Returns:
+            ID do registro inserido
+        """
+        data_hora = self._agora()
+        tabela = self._tabela_para_mes(_texto_data_hora(data_hora)[:7])
+        
+        # O buffer é atualizado ainda com a trava de escrita: uma recarga
+        # (recarregar_recentes) não se intercala entre o commit e o registro
+        with self._trava_escrita():
+            with self._escrita() as cursor:
+                cursor.execute(f'''
+                INSERT INTO {tabela} 
+                (data_hora, umidade, ph, fosforo, potassio, status_bomba, observacoes)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (data_hora, umidade, ph, fosforo, potassio, status_bomba, observacoes))
+                id_leitura = cursor.lastrowid
+                self._somar_aos_resumos(cursor, 'id = ?', (id_leitura,), tabela)
+            
+            self._registrar_recentes(
+                range(id_leitura, id_leitura + 1),
+                ('data_hora', 'umidade', 'ph', 'fosforo', 'potassio', 'status_bomba', 'observacoes'),
+                [(data_hora, umidade, ph, fosforo, potassio, status_bomba, observacoes)]
+            )
+            return id_leitura
+    
+    def obter_todas_leituras(self) -> List[Dict[str, Any]]:
+        """Retorna todas as leituras do banco de dados (ver também obter_leituras_batch)."""
+        return list(self.iterar_leituras())
+    
+    def obter_leituras_batch(self, colunas: Optional[Sequence[str]] = None, inicio: Any = None,
+                             fim: Any = None, tamanho_lote: int = 10000) -> LeiturasBatch:
+        """
+        Retorna as leituras (todas ou as de um período) em um LeiturasBatch:
+        uma coluna por array em vez de um dicionário por leitura, com uma
+        fração da memória de obter_todas_leituras e conversão para DataFrame
+        sem cópia (para_dataframe).
+        
+        Args:
+            colunas: Colunas retornadas (padrão: todas)
+            inicio: Início opcional do período (inclusivo)
+            fim: Fim opcional do período (exclusivo)
+            tamanho_lote: Quantidade de linhas buscadas por vez no banco
+            
+        Returns:
+            LeiturasBatch com as leituras
+        """
+        colunas = tuple(colunas) if colunas is not None else self._colunas_leituras
+        leituras = LeiturasBatch(colunas)
+        for linhas in self.iterar_leituras(colunas, tamanho_lote, 'tupla', True, inicio, fim):
+            leituras.anexar_linhas(linhas)
+        return leituras
+    
+    def iterar_leituras(self, colunas: Optional[Sequence[str]] = None,
+                        tamanho_lote: int = 1000, tipo_linha: str = 'dict',
+                        em_lotes: bool = False, inicio: Any = None,
+                        fim: Any = None) -> Iterator[Any]:
+        """
+        Percorre as leituras em lotes (fetchmany), sem carregar a tabela inteira na memória.
+        
+        Args:
+            colunas: Colunas retornadas (padrão: todas)
+            tamanho_lote: Quantidade de linhas buscadas por vez no banco
+            tipo_linha: 'dict', 'tupla', 'namedtuple' ou 'batch'
+            em_lotes: Se True, produz uma lista de linhas (com 'batch', um
+                LeiturasBatch) por lote
+            inicio: Início opcional do período (inclusivo)
+            fim: Fim opcional do período (exclusivo)
+            
+        Returns:
+            Iterador com uma leitura por vez ou, com em_lotes=True, listas de leituras
+        """
+        condicoes, parametros = self._filtro_periodo(inicio, fim)
+        where = f" WHERE {' AND '.join(condicoes)}" if condicoes else ""
+        
+        return self._consultar_leituras(
+            f'SELECT {self._projecao(colunas)} FROM {{tabela}}{where}',
+            parametros, tamanho_lote, tipo_linha, em_lotes, inicio, fim
+        )
+    
+    def obter_leituras_periodo(self, inicio: Any = None, fim: Any = None,
+                               limite: int = 1000, apos_id: Optional[int] = None,
+                               colunas: Optional[Sequence[str]] = None,
+                               tipo_linha: str = 'dict',
+                               status_bomba: Optional[int] = None) -> List[Any]:
+        """
+        Retorna uma página de leituras de um período, em ordem cronológica.
+        
+        A paginação é por chave (keyset): a próxima página começa depois da
+        última leitura da página anterior, informada em apos_id, em vez de usar
+        OFFSET. Assim cada página custa o mesmo, percorrendo apenas o índice.
+        
+        Args:
+            inicio: Início do período (inclusivo), datetime/date ou texto ISO
+            fim: Fim do período (exclusivo)
+            limite: Quantidade máxima de leituras na página
+            apos_id: ID da última leitura da página anterior
+            colunas: Colunas retornadas (padrão: todas)
+            tipo_linha: 'dict', 'tupla' ou 'namedtuple'
+            status_bomba: Filtra pelo status da bomba (0 ou 1)
+        
+        Returns:
+            Lista de leituras da página (vazia quando não há mais leituras)
+        """
+        condicoes, parametros = self._filtro_periodo(inicio, fim)
+        
+        if status_bomba is not None:
+            condicoes.append('status_bomba = ?')
+            parametros.append(status_bomba)
+        
+        inicio_particoes = inicio
+        if apos_id is not None:
+            tabela = self._tabela_do_id(apos_id)
+            linha = None
+            if tabela is not None:
+                with self._leitura() as cursor:
+                    cursor.execute(f'SELECT data_hora FROM {tabela} WHERE id = ?', (apos_id,))
+                    linha = cursor.fetchone()
+            if linha is None:
+                raise ValueError(f"Leitura {apos_id} não encontrada")
+            condicoes += ['data_hora >= ?', '(data_hora > ? OR id > ?)']
+            parametros += [linha[0], linha[0], apos_id]
+            inicio_particoes = linha[0]
+        
+        where = f" WHERE {' AND '.join(condicoes)}" if condicoes else ""
+        sql = (f'SELECT {self._projecao(colunas)} FROM {{tabela}}{where} '
+               'ORDER BY data_hora, id LIMIT ?')
+        
+        # As partições são meses em ordem: a página continua na seguinte se precisar
+        pagina = []
+        for tabela in self._tabelas_leituras(inicio_particoes, fim):
+            restante = limite - len(pagina)
+            pagina += [linha for lote in self._iterar_consulta(sql.format(tabela=tabela),
+                                                               parametros + [restante], restante,
+                                                               tipo_linha, True)
+                       for linha in lote]
+            if len(pagina) >= limite:
+                break
+        return pagina
+    
+    def obter_intervalo_datas(self) -> Optional[Tuple[datetime.datetime, datetime.datetime]]:
+        """
+        Retorna a data/hora da leitura mais antiga e da mais recente (usa o índice).
+        
+        Returns:
+            Tupla (primeira, ultima) ou None se não houver leituras
+        """
+        primeira = ultima = None
+        with self._leitura() as cursor:
+            for tabela in self._tabelas_leituras():
+                primeira = cursor.execute(f'SELECT MIN(data_hora) FROM {tabela}').fetchone()[0]
+                if primeira is not None:
+                    break
+            for tabela in self._tabelas_leituras(decrescente=True):
+                ultima = cursor.execute(f'SELECT MAX(data_hora) FROM {tabela}').fetchone()[0]
+                if ultima is not None:
+                    break
+        if primeira is None:
+            return None
+        if self.data_hora_epoch:
+            return _data_hora_de_epoch(primeira), _data_hora_de_epoch(ultima)
+        return (datetime.datetime.fromisoformat(primeira),
+                datetime.datetime.fromisoformat(ultima))
+    
+    def obter_resumo(self, granularidade: str = 'dia', inicio: Any = None,
+                     fim: Any = None) -> List[Dict[str, Any]]:
+        """
+        Retorna médias, mínimos e máximos por hora ou por dia, lidos das tabelas
+        de resumo em vez das leituras.
+        
+        Args:
+            granularidade: 'hora' ou 'dia'
+            inicio: Início do período (inclusivo); a hora/dia que o contém entra inteiro
+            fim: Fim do período (exclusivo)
+        
+        Returns:
+            Lista em ordem cronológica com periodo, quantidade, bomba_ligada e
+            media_, min_ e max_ de cada medida
+        """
+        if granularidade not in TABELAS_RESUMO:
+            raise ValueError(f"granularidade deve ser uma de {tuple(TABELAS_RESUMO)}")
+        
+        medidas = ", ".join(f"soma_{m} / quantidade_{m} AS media_{m}, min_{m}, max_{m}"
+                            for m in MEDIDAS_RESUMO)
+        filtro, parametros = _filtro_intervalo(
+            'periodo',
+            _chave_periodo(inicio, granularidade) if inicio is not None else None,
+            _chave_periodo(fim, granularidade) if fim is not None else None,
+        )
+        sql = (f'SELECT periodo, quantidade, bomba_ligada, {medidas} '
+               f'FROM {TABELAS_RESUMO[granularidade]} WHERE {filtro} ORDER BY periodo')
+        return list(self._iterar_consulta(sql, parametros, 1000, 'dict', False))
+    
+    def reconstruir_resumos(self, inicio: Any = None, fim: Any = None) -> None:
+        """
+        Recalcula as tabelas de resumo a partir das leituras, em dias inteiros.
+        Use depois de atualizações/remoções para voltar a ter mínimos e máximos
+        exatos, ou quando as leituras forem alteradas por fora da classe.
+        
+        Args:
+            inicio: Início do período (inclusivo); None recalcula desde a primeira leitura
+            fim: Fim do período (exclusivo); None recalcula até a última
+        """
+        dia_inicio = _chave_periodo(inicio, 'dia') if inicio is not None else None
+        dia_fim = _periodo_seguinte(_chave_periodo(fim, 'dia')) if fim is not None else None
+        with self._escrita() as cursor:
+            cursor.execute("SELECT valor FROM manutencao WHERE chave = 'retencao_corte'")
+            linha = cursor.fetchone()
+            if linha is not None:
+                # Antes do corte da retenção só restam os resumos: eles não são recalculados
+                corte = linha[0][:10]
+                dia_inicio = max(dia_inicio or corte, corte)
+            if not self.particionado:
+                self._recalcular_resumos(cursor, dia_inicio, dia_fim)
+                return
+            filtro, parametros = _filtro_intervalo('periodo', dia_inicio, dia_fim)
+            for tabela in TABELAS_RESUMO.values():
+                cursor.execute(f'DELETE FROM {tabela} WHERE {filtro}', parametros)
+        
+        # Particionado: uma transação por mês, cada uma lendo só a sua partição
+        for mes in self._meses_particoes(dia_inicio, dia_fim):
+            origem = f'{self._anexar_particao(mes)}.leituras_sensores'
+            primeiro_dia = f'{mes}-01'
+            dia_seguinte = f'{_mes_seguinte(mes)}-01'
+            with self._escrita() as cursor:
+                self._recalcular_resumos(cursor, max(dia_inicio or primeiro_dia, primeiro_dia),
+                                         min(dia_fim or dia_seguinte, dia_seguinte), origem)
+    
+    def _somar_aos_resumos(self, cursor: sqlite3.Cursor, filtro: str,
+                           parametros: Sequence[Any], origem: str = 'leituras_sensores') -> None:
+        """Soma as leituras de `origem` que atendem `filtro` aos resumos, na transação do cursor."""
+        for tabela in TABELAS_RESUMO.values():
+            cursor.execute(_sql_somar_resumo(tabela, filtro, origem, self.data_hora_epoch), parametros)
+    
+    def _recalcular_resumos(self, cursor: sqlite3.Cursor, inicio: Optional[str],
+                            fim: Optional[str], origem: str = 'leituras_sensores') -> None:
+        """
+        Recalcula os resumos do intervalo [inicio, fim) de chaves de período: as
+        horas a partir das leituras de `origem` e os dias afetados, inteiros, a
+        partir das horas.
+        """
+        filtro, parametros = _filtro_intervalo('periodo', inicio, fim)
+        cursor.execute(f'DELETE FROM resumo_horario WHERE {filtro}', parametros)
+        filtro_leituras, parametros_leituras = _filtro_intervalo(
+            'data_hora',
+            self._valor_data_hora(inicio) if inicio is not None else None,
+            self._valor_data_hora(fim) if fim is not None else None,
+        )
+        cursor.execute(_sql_somar_resumo('resumo_horario', filtro_leituras, origem, self.data_hora_epoch),
+                       parametros_leituras)
+        
+        filtro, parametros = _filtro_intervalo(
+            'periodo',
+            inicio[:10] if inicio is not None else None,
+            _periodo_seguinte(fim[:10]) if fim is not None else None,
+        )
+        cursor.execute(f'DELETE FROM resumo_diario WHERE {filtro}', parametros)
+        cursor.execute(_sql_dias_de_horas(filtro), parametros)
+    
+    def _retirar_dos_resumos(self, cursor: sqlite3.Cursor, id_leitura: int,
+                             origem: str = 'leituras_sensores') -> bool:
+        """
+        Subtrai uma leitura dos resumos antes de ela ser alterada ou removida.
+        Quantidades, somas e médias ficam exatas; mínimo e máximo não têm como
+        ser desfeitos e continuam como limites até reconstruir_resumos.
+        
+        Returns:
+            False se a leitura não existe
+        """
+        cursor.execute(
+            f'SELECT data_hora, status_bomba, {", ".join(MEDIDAS_RESUMO)} '
+            f'FROM {origem} WHERE id = ?', (id_leitura,)
+        )
+        linha = cursor.fetchone()
+        if linha is None:
+            return False
+        data_hora, status_bomba, *valores = linha
+        parametros = [1, 1 if status_bomba == 1 else 0]
+        for valor in valores:
+            parametros += [0 if valor is None else 1, valor or 0]
+        for granularidade, tabela in TABELAS_RESUMO.items():
+            chave = _chave_periodo(data_hora, granularidade)
+            cursor.execute(_sql_retirar_resumo(tabela), parametros + [chave])
+            cursor.execute(f'DELETE FROM {tabela} WHERE periodo = ? AND quantidade <= 0', (chave,))
+        return True
+
+    def _retirar_lote_dos_resumos(self, cursor: sqlite3.Cursor, filtro: str,
+                                  parametros: Sequence[Any], origem: str = 'leituras_sensores') -> None:
+        """
+        Subtrai dos resumos as leituras de `origem` que atendem `filtro`, com uma
+        atualização por período em vez de uma por leitura. Mínimo e máximo
+        continuam como limites, como em _retirar_dos_resumos.
+        """
+        for tabela in TABELAS_RESUMO.values():
+            cursor.execute(_sql_agregar_retirada(tabela, filtro, origem, self.data_hora_epoch), parametros)
+            cursor.executemany(_sql_retirar_resumo(tabela), cursor.fetchall())
+            cursor.execute(f'DELETE FROM {tabela} WHERE quantidade <= 0')
+
+    @staticmethod
+    def _preparar_ids_lote(cursor: sqlite3.Cursor, ids: Iterable[int]) -> str:
+        """
+        Carrega `ids` na tabela temporária ids_lote, na transação do cursor.
+
+        Returns:
+            Filtro SQL que seleciona as leituras desses IDs
+        """
+        cursor.execute('CREATE TEMP TABLE IF NOT EXISTS ids_lote (id INTEGER PRIMARY KEY)')
+        cursor.execute('DELETE FROM temp.ids_lote')
+        cursor.executemany('INSERT OR IGNORE INTO temp.ids_lote (id) VALUES (?)', ((i,) for i in ids))
+        return 'id IN (SELECT id FROM temp.ids_lote)'
+
+    def _validar_colunas_atualizacao(self, colunas: Iterable[str]) -> None:
+        """Recusa colunas que não são graváveis em leituras_sensores (os nomes entram no SQL)."""
+        invalidas = set(colunas) - (set(COLUNAS_LEITURA) & set(self._colunas_leituras))
+        if invalidas:
+            raise ValueError(f"Colunas inválidas: {sorted(invalidas)}")
+
+    def _projecao(self, colunas: Optional[Sequence[str]]) -> str:
+        """Valida as colunas pedidas e monta a lista do SELECT."""
+        if colunas is None:
+            return '*'
+        colunas = tuple(colunas)
+        invalidas = set(colunas) - set(('id',) + COLUNAS_LEITURA)
+        if invalidas:
+            raise ValueError(f"Colunas inválidas: {sorted(invalidas)}")
+        return ", ".join(colunas)
+    
+    def _agora(self) -> Any:
+        """Horário atual no formato gravado em data_hora."""
+        if self.data_hora_epoch:
+            return time.time_ns() // 1_000_000
+        return datetime.datetime.now().isoformat()
+    
+    def _valor_data_hora(self, valor: Any) -> Any:
+        """Converte datetime/date/texto ISO para o valor comparável com data_hora no banco."""
+        return _epoch_ms(valor) if self.data_hora_epoch else _texto_data_hora(valor)
+    
+    def _filtro_periodo(self, inicio: Any, fim: Any) -> Tuple[List[str], List[Any]]:
+        """Monta as condições de data_hora de um período [inicio, fim)."""
+        condicoes = []
+        parametros = []
+        if inicio is not None:
+            condicoes.append('data_hora >= ?')
+            parametros.append(self._valor_data_hora(inicio))
+        if fim is not None:
+            condicoes.append('data_hora < ?')
+            parametros.append(self._valor_data_hora(fim))
+        return condicoes, parametros
+
+    def _consultar_leituras(self, sql: str, parametros: Sequence[Any], tamanho_lote: int,
+                            tipo_linha: str, em_lotes: bool, inicio: Any = None,
+                            fim: Any = None, decrescente: bool = False) -> Iterator[Any]:
+        """
+        Executa `sql` ({tabela} no lugar da tabela de leituras) em cada tabela que
+        cobre o período, na ordem dos meses, e produz as linhas lote a lote.
+        """
+        for tabela in self._tabelas_leituras(inicio, fim, decrescente):
+            yield from self._iterar_consulta(sql.format(tabela=tabela), parametros,
+                                             tamanho_lote, tipo_linha, em_lotes)
+    
+    def _iterar_consulta(self, sql: str, parametros: Sequence[Any], tamanho_lote: int,
+                         tipo_linha: str, em_lotes: bool) -> Iterator[Any]:
+        """Executa uma consulta em um cursor próprio e produz as linhas lote a lote."""
+        if tipo_linha not in TIPOS_LINHA:
+            raise ValueError(f"tipo_linha deve ser um de {TIPOS_LINHA}")
+        
+        with self._leitura() as cursor:
+            cursor.execute(sql, parametros)
+            nomes = tuple(description[0] for description in cursor.description)
+            tipo = _tipo_leitura(nomes) if tipo_linha == 'namedtuple' else None
+            # data_hora em epoch (ms) volta como datetime
+            posicao = nomes.index('data_hora') if self.data_hora_epoch and 'data_hora' in nomes else None
+            
+            while True:
+                linhas = cursor.fetchmany(tamanho_lote)
+                if not linhas:
+                    break
+                if posicao is not None:
+                    linhas = [linha[:posicao] + (_data_hora_de_epoch(linha[posicao]),) + linha[posicao + 1:]
+                              for linha in linhas]
+                if tipo_linha == 'dict':
+                    linhas = [dict(zip(nomes, linha)) for linha in linhas]
+                elif tipo is not None:
+                    linhas = [tipo._make(linha) for linha in linhas]
+                elif tipo_linha == 'batch':
+                    lote = LeiturasBatch(nomes)
+                    lote.anexar_linhas(linhas)
+                    linhas = lote
+                
+                if em_lotes:
+                    yield linhas
+                else:
+                    yield from linhas
+    
+    def obter_leitura_por_id(self, id_leitura: int) -> Optional[Dict[str, Any]]:
+        """Retorna uma leitura específica pelo ID."""
+        tabela = self._tabela_do_id(id_leitura)
+        if tabela is None:
+            return None
+        with self._leitura() as cursor:
+            cursor.execute(f'SELECT * FROM {tabela} WHERE id = ?', (id_leitura,))
+            linha = cursor.fetchone()
+            
+            if linha:
+                colunas = [description[0] for description in cursor.description]
+                leitura = dict(zip(colunas, linha))
+                if self.data_hora_epoch:
+                    leitura['data_hora'] = _data_hora_de_epoch(leitura['data_hora'])
+                return leitura
+        return None
+    
+    def atualizar_leitura(self, id_leitura: int, **kwargs) -> bool:
+        """
+        Atualiza uma leitura existente.
+        
+        Args:
+            id_leitura: ID do registro a ser atualizado
+            **kwargs: Campos a serem atualizados (umidade, ph, etc.)
+            
+        Returns:
+            True se a atualização foi bem-sucedida, False caso contrário
+            
+        Raises:
+            ValueError: Se alguma coluna não existir em leituras_sensores
+        """
+        if not kwargs:
+            return False
+        self._validar_colunas_atualizacao(kwargs)
+        tabela = self._tabela_do_id(id_leitura)
+        if tabela is None:
+            return False
+        if (self.particionado and 'data_hora' in kwargs and
+                _texto_data_hora(kwargs['data_hora'])[:7] != _mes_do_id(id_leitura)):
+            raise ValueError("No modo particionado a data_hora não pode mudar de mês")
+        if 'data_hora' in kwargs:
+            kwargs['data_hora'] = self._valor_data_hora(kwargs['data_hora'])
+            
+        valores = list(kwargs.values())
+        valores.append(id_leitura)
+        
+        with self._escrita() as cursor:
+            # Campos resumidos mudam: a leitura sai dos resumos e volta com os novos valores
+            resumida = bool(set(kwargs) & _COLUNAS_RESUMIDAS)
+            if resumida:
+                self._retirar_dos_resumos(cursor, id_leitura, tabela)
+            cursor.execute(_sql_atualizar(tabela, tuple(kwargs)), valores)
+            atualizada = cursor.rowcount > 0
+            if atualizada and resumida:
+                self._somar_aos_resumos(cursor, 'id = ?', (id_leitura,), tabela)
+        
+        if atualizada and 'data_hora' in kwargs:
+            # A leitura pode entrar, sair ou mudar de lugar nas recentes
+            self.recarregar_recentes()
+        elif atualizada:
+            self.recentes.atualizar(id_leitura, kwargs)
+        return atualizada
+    
+    def deletar_leitura(self, id_leitura: int) -> bool:
+        """
+        Deleta uma leitura pelo ID.
+        
+        Args:
+            id_leitura: ID do registro a ser deletado
+            
+        Returns:
+            True se a deleção foi bem-sucedida, False caso contrário
+        """
+        tabela = self._tabela_do_id(id_leitura)
+        if tabela is None:
+            return False
+        with self._escrita() as cursor:
+            self._retirar_dos_resumos(cursor, id_leitura, tabela)
+            cursor.execute(f'DELETE FROM {tabela} WHERE id = ?', (id_leitura,))
+            deletada = cursor.rowcount > 0
+        if deletada and self.recentes.contem(id_leitura) is not None:
+            # Completa o buffer com a leitura anterior às que ficaram
+            self.recarregar_recentes()
+        return deletada
+
+    def _agrupar_ids_por_tabela(self, ids: Iterable[int]) -> Iterator[Tuple[str, List[int]]]:
+        """
+        Produz (tabela, IDs) para as tabelas que guardam os IDs informados. No
+        modo particionado a partição de cada grupo é anexada só quando chega a
+        sua vez, fora de transações; IDs de partições inexistentes são ignorados.
+        """
+        if not self.particionado:
+            yield 'leituras_sensores', list(ids)
+            return
+        por_mes = {}
+        for id_leitura in ids:
+            por_mes.setdefault(_mes_do_id(id_leitura), []).append(id_leitura)
+        for mes in sorted(por_mes):
+            nome = self._anexar_particao(mes)
+            if nome is not None:
+                yield f'{nome}.leituras_sensores', por_mes[mes]
+
+    def atualizar_leituras_em_lote(self, atualizacoes: Dict[int, Dict[str, Any]]) -> int:
+        """
+        Atualiza muitas leituras de uma vez.
+        
+        As atualizações são agrupadas pelo conjunto de colunas e cada grupo vira
+        um único UPDATE preparado, executado com executemany; tudo em uma
+        transação (no modo particionado, uma por mês). As colunas são validadas
+        uma vez contra o esquema. Leituras com campos resumidos alterados saem
+        dos resumos e voltam com os novos valores, agregadas por período.
+        
+        Args:
+            atualizacoes: ID -> {coluna: valor}, ou pares (ID, {coluna: valor})
+            
+        Returns:
+            Número de leituras atualizadas (IDs inexistentes são ignorados)
+            
+        Raises:
+            ValueError: Se alguma coluna não existir em leituras_sensores ou,
+                no modo particionado, se a data_hora mudar de mês
+        """
+        if isinstance(atualizacoes, dict):
+            atualizacoes = atualizacoes.items()
+        atualizacoes = {id_leitura: dict(campos) for id_leitura, campos in atualizacoes if campos}
+        colunas = set().union(*atualizacoes.values())
+        self._validar_colunas_atualizacao(colunas)
+        if 'data_hora' in colunas:
+            for id_leitura, campos in atualizacoes.items():
+                if 'data_hora' not in campos:
+                    continue
+                if self.particionado and _texto_data_hora(campos['data_hora'])[:7] != _mes_do_id(id_leitura):
+                    raise ValueError("No modo particionado a data_hora não pode mudar de mês")
+                campos['data_hora'] = self._valor_data_hora(campos['data_hora'])
+
+        atualizadas = 0
+        for tabela, ids in self._agrupar_ids_por_tabela(atualizacoes):
+            grupos = {}
+            for id_leitura in ids:
+                campos = atualizacoes[id_leitura]
+                grupo = tuple(sorted(campos))
+                grupos.setdefault(grupo, []).append(
+                    tuple(campos[coluna] for coluna in grupo) + (id_leitura,))
+            resumidos = [id_leitura for id_leitura in ids if _COLUNAS_RESUMIDAS & set(atualizacoes[id_leitura])]
+            with self._escrita() as cursor:
+                if resumidos:
+                    filtro = self._preparar_ids_lote(cursor, resumidos)
+                    self._retirar_lote_dos_resumos(cursor, filtro, (), tabela)
+                for grupo, valores in grupos.items():
+                    cursor.executemany(_sql_atualizar(tabela, grupo), valores)
+                    atualizadas += max(cursor.rowcount, 0)
+                if resumidos:
+                    self._somar_aos_resumos(cursor, filtro, (), tabela)
+
+        if 'data_hora' in colunas:
+            # Leituras podem ter entrado, saído ou mudado de lugar nas recentes
+            self.recarregar_recentes()
+        else:
+            self.recentes.atualizar_lote(atualizacoes)
+        return atualizadas
+
+    def deletar_leituras(self, ids: Optional[Iterable[int]] = None, inicio: Any = None,
+                         fim: Any = None) -> int:
+        """
+        Deleta muitas leituras de uma vez: as dos IDs informados ou as do
+        período [inicio, fim). Os resumos são descontados por período, sem uma
+        atualização por leitura; tudo em uma transação (no modo particionado,
+        uma por mês).
+        
+        Args:
+            ids: IDs das leituras; se informado, o período não é usado
+            inicio: Início do período (datetime, date ou texto ISO), inclusivo
+            fim: Fim do período, exclusivo
+            
+        Returns:
+            Número de leituras deletadas
+            
+        Raises:
+            ValueError: Sem IDs nem período (para não apagar a tabela inteira)
+        """
+        deletadas = 0
+        if ids is not None:
+            ids = list(ids)
+            for tabela, grupo in self._agrupar_ids_por_tabela(ids):
+                with self._escrita() as cursor:
+                    filtro = self._preparar_ids_lote(cursor, grupo)
+                    self._retirar_lote_dos_resumos(cursor, filtro, (), tabela)
+                    cursor.execute(f'DELETE FROM {tabela} WHERE {filtro}')
+                    deletadas += cursor.rowcount
+            if deletadas and self.recentes.dispositivos_de(ids):
+                self.recarregar_recentes()
+            return deletadas
+
+        if inicio is None and fim is None:
+            raise ValueError("Informe os IDs ou o período das leituras a deletar")
+        condicoes, parametros = self._filtro_periodo(inicio, fim)
+        filtro = ' AND '.join(condicoes)
+        for tabela in self._tabelas_leituras(inicio, fim):
+            with self._escrita() as cursor:
+                self._retirar_lote_dos_resumos(cursor, filtro, parametros, tabela)
+                cursor.execute(f'DELETE FROM {tabela} WHERE {filtro}', parametros)
+                deletadas += cursor.rowcount
+        if deletadas:
+            self.recarregar_recentes()
+        return deletadas
+    
+    def aplicar_retencao(self, dias: int = 90,
+                         arquivo: Optional[str] = "dados_agricolas_arquivo.db",
+                         tamanho_lote: int = 5000, pausa: float = 0.0) -> Dict[str, Any]:
+        """
+        Retira do banco as leituras com mais de `dias` dias, em lotes, mantendo
+        online apenas os resumos por hora e por dia. As leituras são copiadas
+        para um banco de arquivo anexado (ATTACH) antes de serem apagadas.
+        
+        Cada lote é copiado e apagado em uma única transação curta, sobre os
+        mesmos IDs (só sai do banco o que está no arquivo), então a rotina pode
+        ser interrompida e executada de novo: a remoção continua de onde parou. Ao final, o
+        espaço livre é devolvido com compactar().
+        
+        No modo particionado, os meses inteiros anteriores ao corte saem como
+        arquivos: cada partição antiga deixa o catálogo e o seu arquivo é
+        apagado ou, com `arquivo` informado, fica no disco como arquivo morto.
+        As leituras do mês do corte anteriores a ele saem da partição do mês em
+        lotes, como no banco único, então `dias` vale também nesse modo.
+        
+        Args:
+            dias: Idade das leituras retiradas, contada a partir da meia-noite de hoje
+            arquivo: Banco de arquivo; None apaga as leituras sem arquivar
+            tamanho_lote: Leituras por transação
+            pausa: Segundos de espera entre lotes, liberando o escritor para a ingestão
+        
+        Returns:
+            Dicionário com o corte usado, leituras retiradas, lotes e páginas
+            liberadas (no modo particionado, também os meses retirados inteiros)
+        """
+        hoje = datetime.datetime.combine(datetime.date.today(), datetime.time())
+        corte = (hoje - datetime.timedelta(days=dias)).isoformat()
+        limite = self._valor_data_hora(corte)
+        resultado = {'corte': corte, 'leituras': 0, 'lotes': 0, 'paginas_liberadas': 0}
+        
+        with self._escrita() as cursor:
+            cursor.execute(
+                "INSERT INTO manutencao (chave, valor) VALUES ('retencao_corte', ?) "
+                "ON CONFLICT(chave) DO UPDATE SET valor = MAX(valor, excluded.valor)",
+                (corte,)
+            )
+        
+        tabela = 'main.leituras_sensores'
+        if self.particionado:
+            resultado['meses'], resultado['leituras'] = self._descartar_particoes(
+                corte[:7], apagar=arquivo is None
+            )
+            # O resto do período sai da partição do mês do corte, em lotes
+            nome = self._anexar_particao(corte[:7])
+            if nome is None:
+                self.recarregar_recentes()
+                return resultado
+            tabela = f'{nome}.leituras_sensores'
+        selecao = (f'SELECT id FROM {tabela} WHERE data_hora < ? '
+                   'ORDER BY data_hora, id LIMIT ?')
+        
+        if arquivo is not None:
+            with self._trava_escrita():
+                colunas = self._anexar_arquivo(arquivo)
+        try:
+            while True:
+                # Os IDs do lote são fixados antes da cópia: cópia e remoção valem
+                # para as mesmas leituras, mesmo com data_hora repetida ou com uma
+                # leitura atrasada gravada por outra conexão durante o lote
+                with self._escrita(imediata=True) as cursor:
+                    ids = [linha[0] for linha in cursor.execute(selecao, (limite, tamanho_lote))]
+                    if not ids:
+                        break
+                    filtro = self._preparar_ids_lote(cursor, ids)
+                    if arquivo is not None:
+                        cursor.execute(
+                            f'INSERT OR IGNORE INTO arquivo.leituras_sensores ({colunas}) '
+                            f'SELECT {colunas} FROM {tabela} WHERE {filtro}'
+                        )
+                        filtro = f'id IN (SELECT id FROM arquivo.leituras_sensores WHERE {filtro})'
+                    # Resumos não são alterados: eles continuam valendo para o período retirado
+                    cursor.execute(f'DELETE FROM {tabela} WHERE {filtro}')
+                    apagadas = cursor.rowcount
+                if apagadas <= 0:
+                    break
+                resultado['leituras'] += apagadas
+                resultado['lotes'] += 1
+                if pausa:
+                    time.sleep(pausa)
+        finally:
+            if arquivo is not None:
+                with self._trava_escrita():
+                    self.conn.execute('DETACH DATABASE arquivo')
+        
+        # No modo particionado o espaço volta quando a partição sai inteira
+        if not self.particionado:
+            resultado['paginas_liberadas'] = self.compactar()
+        if resultado['leituras']:
+            self.recarregar_recentes()
+        return resultado
+    
+    def _descartar_particoes(self, mes_corte: str, apagar: bool) -> Tuple[List[str], int]:
+        """
+        Retira do catálogo e desanexa as partições dos meses anteriores a
+        `mes_corte`; com apagar=True os arquivos também são removidos do disco.
+        
+        Returns:
+            Tupla (meses retirados, leituras que eles tinham)
+        """
+        meses = self._meses_particoes(fim=f'{mes_corte}-01')
+        leituras = 0
+        for mes in meses:
+            nome = self._anexar_particao(mes)
+            leituras += self.conn.execute(f'SELECT COUNT(*) FROM {nome}.leituras_sensores').fetchone()[0]
+            with self._escrita() as cursor:
+                arquivo = cursor.execute('SELECT arquivo FROM particoes WHERE mes = ?', (mes,)).fetchone()[0]
+                cursor.execute('DELETE FROM particoes WHERE mes = ?', (mes,))
+            self.conn.execute(f'DETACH DATABASE {self._particoes_anexadas.pop(mes)}')
+            if apagar:
+                for sufixo in ('', '-wal', '-shm'):
+                    if os.path.exists(self._caminho_particao(arquivo) + sufixo):
+                        os.remove(self._caminho_particao(arquivo) + sufixo)
+        return meses, leituras
+    
+    def migrar_para_particoes(self, tamanho_lote: int = 5000) -> int:
+        """
+        Move para as partições mensais as leituras que estão na tabela do banco
+        principal (ex.: um banco criado antes do modo particionado), em lotes.
+        As leituras recebem IDs novos, da sequência do seu mês; os resumos não mudam.
+        
+        Args:
+            tamanho_lote: Leituras movidas por transação
+        
+        Returns:
+            Número de leituras movidas
+        """
+        if not self.particionado:
+            raise ValueError("migrar_para_particoes só vale para o modo particionado")
+        colunas = ", ".join(linha[1] for linha in self.conn.execute('PRAGMA main.table_info(leituras_sensores)')
+                            if linha[1] != 'id')
+        dia = (_PERIODO_RESUMO_EPOCH if self.data_hora_epoch else _PERIODO_RESUMO)['resumo_diario']
+        meses = [linha[0] for linha in self.conn.execute(
+            f'SELECT DISTINCT substr({dia}, 1, 7) FROM main.leituras_sensores ORDER BY 1'
+        )]
+        selecao = ('SELECT id FROM main.leituras_sensores WHERE data_hora >= ? AND data_hora < ? '
+                   'ORDER BY data_hora, id LIMIT ?')
+        
+        movidas = 0
+        for mes in meses:
+            tabela = self._tabela_para_mes(mes)
+            parametros = (self._valor_data_hora(f'{mes}-01'),
+                          self._valor_data_hora(f'{_mes_seguinte(mes)}-01'), tamanho_lote)
+            while True:
+                with self._escrita() as cursor:
+                    cursor.execute(
+                        f'INSERT INTO {tabela} ({colunas}) SELECT {colunas} FROM main.leituras_sensores '
+                        f'WHERE id IN ({selecao}) ORDER BY data_hora, id', parametros
+                    )
+                    cursor.execute(f'DELETE FROM main.leituras_sensores WHERE id IN ({selecao})',
+                                   parametros)
+                    movidas_lote = cursor.rowcount
+                if movidas_lote <= 0:
+                    break
+                movidas += movidas_lote
+        if movidas:
+            self.compactar()
+            self.recarregar_recentes()
+        return movidas
+    
+    def migrar_data_hora_para_epoch(self, tamanho_lote: int = 5000, pausa: float = 0.0) -> int:
+        """
+        Converte data_hora de texto ISO para epoch em milissegundos (INTEGER) em
+        um banco existente, sem parar a ingestão.
+        
+        As leituras são copiadas por ID, em lotes, para uma tabela nova; gatilhos
+        levam para ela as alterações e remoções feitas durante a cópia. No fim,
+        em uma única transação, a tabela nova substitui a antiga e recebe os
+        índices. Se for interrompida, a migração continua de onde parou.
+        Outras conexões abertas no banco precisam ser reabertas depois.
+        
+        Args:
+            tamanho_lote: Leituras copiadas por transação
+            pausa: Segundos de espera entre lotes, liberando o escritor para a ingestão
+        
+        Returns:
+            Número de leituras convertidas
+        """
+        if self.data_hora_epoch:
+            return 0
+        if self.particionado:
+            raise ValueError("Migre data_hora antes de ativar o modo particionado")
+        definicao = self._definicao_leituras('leituras_epoch')
+        if 'data_hora TEXT NOT NULL' not in definicao:
+            raise ValueError("Definição de leituras_sensores não reconhecida")
+        nomes = [linha[1] for linha in self.conn.execute('PRAGMA main.table_info(leituras_sensores)')]
+        colunas = ", ".join(nomes)
+        valores = ", ".join(_SQL_EPOCH_MS.format(nome) if nome == 'data_hora' else nome for nome in nomes)
+        novos = ", ".join(f"{nome} = {_SQL_EPOCH_MS.format('NEW.' + nome) if nome == 'data_hora' else 'NEW.' + nome}"
+                          for nome in nomes if nome != 'id')
+        copia = (f'INSERT INTO leituras_epoch ({colunas}) SELECT {valores} FROM leituras_sensores '
+                 'WHERE id > (SELECT COALESCE(MAX(id), 0) FROM leituras_epoch) ORDER BY id')
+        
+        with self._escrita() as cursor:
+            cursor.execute(definicao.replace('data_hora TEXT NOT NULL', 'data_hora INTEGER NOT NULL', 1))
+            # Leituras novas são copiadas pelos lotes; alteradas e removidas, pelos gatilhos
+            cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS migracao_epoch_atualizar
+            AFTER UPDATE ON leituras_sensores BEGIN
+                UPDATE leituras_epoch SET {novos} WHERE id = OLD.id;
+            END
+            ''')
+            cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS migracao_epoch_deletar
+            AFTER DELETE ON leituras_sensores BEGIN
+                DELETE FROM leituras_epoch WHERE id = OLD.id;
+            END
+            ''')
+        
+        convertidas = 0
+        while True:
+            with self._escrita() as cursor:
+                cursor.execute(f'{copia} LIMIT ?', (tamanho_lote,))
+                copiadas = cursor.rowcount
+            if copiadas <= 0:
+                break
+            convertidas += copiadas
+            if pausa:
+                time.sleep(pausa)
+        
+        with self._escrita() as cursor:
+            cursor.execute(copia)
+            convertidas += max(cursor.rowcount, 0)
+            # Mantém a sequência de IDs, mesmo que as últimas leituras tenham sido removidas
+            cursor.execute(
+                "UPDATE sqlite_sequence SET seq = MAX(seq, (SELECT seq FROM sqlite_sequence "
+                "WHERE name = 'leituras_sensores')) WHERE name = 'leituras_epoch'"
+            )
+            cursor.execute('DROP TRIGGER migracao_epoch_atualizar')
+            cursor.execute('DROP TRIGGER migracao_epoch_deletar')
+            cursor.execute('DROP TABLE leituras_sensores')
+            cursor.execute('ALTER TABLE leituras_epoch RENAME TO leituras_sensores')
+            for indice, colunas_indice in _INDICES_LEITURAS.items():
+                cursor.execute(f'CREATE INDEX {indice} ON leituras_sensores ({colunas_indice})')
+        self.data_hora_epoch = True
+        self.compactar()
+        self.recarregar_recentes()
+        return convertidas
+    
+    def _anexar_arquivo(self, caminho: str) -> str:
+        """
+        Anexa o banco de arquivo como 'arquivo' e garante nele a tabela de
+        leituras com as colunas atuais.
+        
+        Returns:
+            Lista de colunas (texto) usada na cópia
+        """
+        self.conn.execute('ATTACH DATABASE ? AS arquivo', (caminho,))
+        self.conn.execute(self._definicao_leituras('arquivo.leituras_sensores'))
+        colunas = [(linha[1], linha[2]) for linha in
+                   self.conn.execute('PRAGMA main.table_info(leituras_sensores)')]
+        existentes = {linha[1]: linha[2] for linha in
+                      self.conn.execute('PRAGMA arquivo.table_info(leituras_sensores)')}
+        tipo_arquivo = existentes.get('data_hora')
+        if tipo_arquivo is not None and tipo_arquivo.upper() != dict(colunas)['data_hora'].upper():
+            self.conn.execute('DETACH DATABASE arquivo')
+            raise ValueError(f"O arquivo {caminho} guarda data_hora como {tipo_arquivo}; use outro arquivo")
+        for nome, tipo in colunas:
+            if nome not in existentes:
+                self.conn.execute(f'ALTER TABLE arquivo.leituras_sensores ADD COLUMN {nome} {tipo}')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS arquivo.idx_leituras_data_hora '
+                          'ON leituras_sensores (data_hora)')
+        return ", ".join(nome for nome, _ in colunas)
+    
+    def compactar(self) -> int:
+        """
+        Devolve ao sistema as páginas livres do arquivo do banco (incremental_vacuum)
+        e trunca o WAL. Um banco criado sem auto_vacuum incremental é convertido
+        uma única vez com um VACUUM completo.
+        
+        Returns:
+            Número de páginas liberadas
+        """
+        with self._trava_escrita():
+            livres = self.conn.execute('PRAGMA freelist_count').fetchone()[0]
+            if self.conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                self.conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                self.conn.execute('VACUUM')
+            else:
+                # executescript roda o PRAGMA até o fim (execute libera só uma página)
+                self.conn.executescript('PRAGMA incremental_vacuum;')
+        self.checkpoint('TRUNCATE')
+        return livres
+
+    def exportar_para_csv(self, nome_arquivo: str = "dados_sensores.csv",
+                          inicio: Any = None, fim: Any = None,
+                          compressao: Optional[str] = None, tamanho_parte: Optional[int] = None,
+                          partes: Optional[List[str]] = None) -> str:
+        """
+        Exporta os dados para um arquivo CSV. O banco é lido em lotes e cada
+        lote é gravado assim que chega, sem materializar a tabela.
+        
+        Args:
+            nome_arquivo: Nome do arquivo CSV (com compressão, ganha .gz ou .zst se ainda não tiver)
+            inicio: Início opcional do período (inclusivo)
+            fim: Fim opcional do período (exclusivo)
+            compressao: 'gzip' ou 'zstd' (requer o pacote zstandard)
+            tamanho_parte: Divide a saída em arquivos de até esse tamanho em bytes
+                (do CSV sem compressão), cada um com o cabeçalho:
+                dados_sensores_parte001.csv, dados_sensores_parte002.csv...
+            partes: Lista opcional que recebe o caminho de cada arquivo gravado
+            
+        Returns:
+            Caminho do arquivo CSV gerado (com partes, o da primeira)
+            
+        Raises:
+            ValueError: Se a compressão for desconhecida ou tamanho_parte não for positivo
+        """
+        if compressao is not None:
+            if compressao not in EXTENSOES_COMPRESSAO:
+                raise ValueError(f"Compressão inválida: {compressao!r} (use 'gzip' ou 'zstd')")
+            if not nome_arquivo.endswith(EXTENSOES_COMPRESSAO[compressao]):
+                nome_arquivo += EXTENSOES_COMPRESSAO[compressao]
+        if tamanho_parte is not None and tamanho_parte <= 0:
+            raise ValueError("tamanho_parte deve ser positivo")
+            
+        # As leituras são lidas do banco em lotes (colunas em arrays), sem materializar a tabela
+        lotes = self.iterar_leituras(tamanho_lote=10000, tipo_linha='batch', em_lotes=True,
+                                     inicio=inicio, fim=fim)
+        primeiro = next(lotes, None)
+        
+        if primeiro is None:
+            return "Sem dados para exportar"
+            
+        if tamanho_parte is not None:
+            caminhos = _gravar_csv_em_partes(nome_arquivo, primeiro.colunas, chain([primeiro], lotes),
+                                             compressao, tamanho_parte, None)
+        else:
+            with _abrir_saida_csv(nome_arquivo, compressao, None) as csvfile:
+                writer = csv.writer(csvfile)
+                
+                writer.writerow(primeiro.colunas)
+                writer.writerows(primeiro.tuplas())
+                for lote in lotes:
+                    writer.writerows(lote.tuplas())
+            caminhos = [os.path.abspath(nome_arquivo)]
+            
+        if partes is not None:
+            partes.extend(caminhos)
+        return caminhos[0]
+    
+    def importar_do_serial(self, dados_serial: List[str]) -> List[int]:
+        """
+        Importa dados do monitor serial.
+        
+        Args:
+            dados_serial: Lista de strings com dados do monitor serial
+            
+        Returns:
+            Lista de IDs dos registros inseridos
+        """
+        ids_inseridos = []
+        
+        for linha in dados_serial:
+            # Assumindo formato: "umidade,ph,fosforo,potassio,status_bomba"
+            try:
+                registro = converter_linha_serial(linha)
+                if registro is not None:
+                    id_leitura = self.inserir_leitura(*registro)
+                    ids_inseridos.append(id_leitura)
+            except (ValueError, IndexError) as e:
+                print(f"Erro ao processar linha: {linha}. Erro: {e}")
+                
+        return ids_inseridos
+    
+    def inserir_leituras_em_lote(self, registros: Iterable[Sequence[Any]],
+                                 colunas: Sequence[str] = COLUNAS_SERIAL) -> Sequence[int]:
+        """
+        Insere várias leituras com um único executemany e um único commit.
+        No modo particionado, é um executemany e um commit por mês do lote.
+        
+        Args:
+            registros: Tuplas com os valores na ordem de `colunas`
+            colunas: Colunas preenchidas. Sem 'data_hora', todas as leituras
+                do lote recebem o horário atual.
+        
+        Returns:
+            Intervalo (range) com os IDs inseridos; no modo particionado, uma
+            lista de IDs quando o lote cobre mais de um mês
+        """
+        colunas = tuple(colunas)
+        invalidas = set(colunas) - set(COLUNAS_LEITURA)
+        if invalidas:
+            raise ValueError(f"Colunas inválidas: {sorted(invalidas)}")
+        
+        if 'data_hora' not in colunas:
+            data_hora = (self._agora(),)
+            registros = [data_hora + tuple(registro) for registro in registros]
+            colunas = ('data_hora',) + colunas
+        else:
+            # Em texto, datetime e 'AAAA-MM-DD HH:MM:SS' são gravados no formato de _agora()
+            posicao = colunas.index('data_hora')
+            converter = self._valor_data_hora
+            registros = [tuple(registro[:posicao]) + (converter(registro[posicao]),)
+                         + tuple(registro[posicao + 1:]) for registro in registros]
+        
+        if not self.particionado:
+            return self._gravar_lote('leituras_sensores', colunas, registros)
+        
+        posicao = colunas.index('data_hora')
+        meses = {}
+        for registro in registros:
+            meses.setdefault(_texto_data_hora(registro[posicao])[:7], []).append(registro)
+        faixas = [self._gravar_lote(self._tabela_para_mes(mes), colunas, grupo)
+                  for mes, grupo in sorted(meses.items())]
+        if len(faixas) == 1:
+            return faixas[0]
+        return [id_leitura for faixa in faixas for id_leitura in faixa]
+    
+    def _gravar_lote(self, tabela: str, colunas: Tuple[str, ...],
+                     registros: Iterable[Sequence[Any]]) -> range:
+        """
+        Grava um lote em uma tabela de leituras e nos resumos, em uma única
+        transação, e registra as leituras novas em self.recentes.
+        """
+        if not isinstance(registros, (list, tuple)):
+            registros = list(registros)
+        marcadores = ", ".join("?" * len(colunas))
+        # O buffer é atualizado ainda com a trava de escrita: uma recarga
+        # (recarregar_recentes) não se intercala entre o commit e o registro
+        with self._trava_escrita():
+            with self._escrita() as cursor:
+                cursor.executemany(
+                    f'INSERT INTO {tabela} ({", ".join(colunas)}) VALUES ({marcadores})',
+                    registros
+                )
+                total = cursor.rowcount
+                ultimo_id = cursor.execute('SELECT last_insert_rowid()').fetchone()[0]
+                if total > 0:
+                    self._somar_aos_resumos(cursor, 'id BETWEEN ? AND ?',
+                                            (ultimo_id - total + 1, ultimo_id), tabela)
+            
+            if total <= 0:
+                return range(0)
+            # Com um único escritor, os IDs AUTOINCREMENT de uma transação são contíguos
+            ids = range(ultimo_id - total + 1, ultimo_id + 1)
+            self._registrar_recentes(ids, colunas, registros)
+            return ids
+
+    def _registrar_recentes(self, ids: Sequence[int], colunas: Sequence[str],
+                            registros: Sequence[Sequence[Any]]) -> None:
+        """Leva para self.recentes as leituras gravadas (uma por ID, na ordem de `colunas`)."""
+        if self.recentes.tamanho <= 0:
+            return
+        posicao_data = colunas.index('data_hora')
+        # As datas já chegam no formato gravado (texto ISO com 'T' ou epoch em ms)
+        datas = [registro[posicao_data] for registro in registros]
+        padrao = dict.fromkeys(self._colunas_leituras)
+
+        def montar(posicao: int) -> Dict[str, Any]:
+            leitura = dict(padrao)
+            leitura.update(zip(colunas, registros[posicao]))
+            leitura['id'] = ids[posicao]
+            leitura['data_hora'] = (_data_hora_de_epoch(datas[posicao]) if self.data_hora_epoch
+                                    else datas[posicao])
+            return leitura
+
+        # A Fase 3 tem um único dispositivo (0)
+        self.recentes.adicionar_lote([0] * len(registros), datas, montar)
+
+    def recarregar_recentes(self) -> None:
+        """
+        Carrega do banco as leituras mais recentes de self.recentes. Chamado ao
+        abrir e depois de alterações que o buffer não acompanha linha a linha
+        (remoções, retenção, migrações). Gravações de outros processos não
+        aparecem no buffer até a próxima recarga.
+        """
+        # A conexão de escrita e o buffer são compartilhados (ex.: sessões do
+        # Streamlit): a recarga não se intercala com uma gravação
+        with self._trava_escrita():
+            self._colunas_leituras = tuple(
+                linha[1] for linha in self.conn.execute('PRAGMA main.table_info(leituras_sensores)')
+            )
+            if self.recentes.tamanho <= 0:
+                return
+            self.recentes.substituir(0, reversed(self._ultimas_do_banco(self.recentes.tamanho)))
+
+    def _ultimas_do_banco(self, quantidade: int) -> List[Dict[str, Any]]:
+        """Até `quantidade` leituras mais recentes, da mais recente à mais antiga."""
+        leituras = []
+        for tabela in self._tabelas_leituras(decrescente=True):
+            leituras.extend(self._iterar_consulta(
+                f'SELECT * FROM {tabela} ORDER BY data_hora DESC LIMIT ?',
+                (quantidade - len(leituras),), quantidade, 'dict', False
+            ))
+            if len(leituras) >= quantidade:
+                break
+        return leituras
+
+    def importar_do_serial_em_lote(self, dados_serial: Iterable[str],
+                                   tamanho_lote: int = 5000,
+                                   erros: Optional[List[str]] = None) -> List[int]:
+        """
+        Importa dados do monitor serial em lotes, com uma transação por lote.
+        Linhas inválidas, inclusive as incompletas (menos de 5 campos, ex.: uma
+        captura cortada), são reportadas e ignoradas sem interromper o lote;
+        só linhas em branco são puladas sem aviso.
+        
+        Args:
+            dados_serial: Linhas do monitor serial (lista, arquivo ou gerador)
+            tamanho_lote: Quantidade de linhas gravadas por transação
+            erros: Lista opcional que recebe as linhas que não puderam ser lidas
+                (a quantidade de linhas rejeitadas é len(erros))
+            
+        Returns:
+            Lista com os IDs inseridos (outras conexões podem gravar entre os
+            lotes: os IDs não são necessariamente contíguos)
+        """
+        ids_inseridos = []
+        lote = []
+        
+        def gravar_lote() -> None:
+            ids_inseridos.extend(self.inserir_leituras_em_lote(lote))
+            lote.clear()
+        
+        for linha in dados_serial:
+            if not linha.strip():
+                continue
+            try:
+                registro = converter_linha_serial(linha)
+                if registro is None:
+                    raise ValueError("linha incompleta (menos de 5 campos)")
+            except (ValueError, IndexError) as e:
+                print(f"Erro ao processar linha: {linha}. Erro: {e}")
+                if erros is not None:
+                    erros.append(linha)
+                continue
+            
+            lote.append(registro)
+            if len(lote) >= tamanho_lote:
+                gravar_lote()
+        
+        if lote:
+            gravar_lote()
+        
+        return ids_inseridos
+    
+    def fechar(self):
+        """Fecha a conexão com o banco de dados (e o pool, se ativo)."""
+        if self.pool is not None:
+            self.pool.fechar()
+        elif self.conn:
+            self.conn.close()
+            
+    def __enter__(self):
+        return self
+        
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.fechar()
+
+
+# Função para gerar dados simulados do monitor serial
+def gerar_dados_exemplo(num_amostras: int = 10) -> List[str]:
+    """
+    Gera dados simulados do monitor serial.
+    
+    Args:
+        num_amostras: Número de amostras a serem geradas
+        
+    Returns:
+        Lista de strings simulando dados do monitor serial
+    """
+    dados = []
+    
+    for _ in range(num_amostras):
+        umidade = round(random.uniform(20.0, 90.0), 1)  # 20% a 90%
+        ph = round(random.uniform(4.0, 8.5), 1)  # pH 4.0 a 8.5
+        fosforo = random.randint(0, 100)  # Nível de 0 a 100
+        potassio = random.randint(0, 100)  # Nível de 0 a 100
+        status_bomba = 1 if umidade < 40.0 else 0  # Liga a bomba se umidade < 40%
+        
+        linha = f"{umidade},{ph},{fosforo},{potassio},{status_bomba}"
+        dados.append(linha)
+        
+    return dados
+
+
+# Demonstração do uso da classe
+if __name__ == "__main__":
+    # Criar instância do banco de dados
+    bd = BancoDadosAgricola()
+    
+    print("\n=== Demonstração do Sistema de Banco de Dados Agrícola ===\n")
+    
+    # 1. Gerar e importar dados simulados
+    print("Gerando dados simulados do monitor serial...")
+    dados_serial = gerar_dados_exemplo(15)
+    print(f"Dados gerados: {dados_serial[:3]}... (total: {len(dados_serial)})")
+    
+    print("\nImportando dados para o banco de dados...")
+    ids_inseridos = bd.importar_do_serial(dados_serial)
+    print(f"Registros inseridos: {len(ids_inseridos)}")
+    
+    # 2. Consultar todos os registros
+    print("\nConsultando todos os registros:")
+    todas_leituras = bd.obter_todas_leituras()
+    for i, leitura in enumerate(todas_leituras[:3]):
+        print(f"  Registro {i+1}: {leitura}")
+    if len(todas_leituras) > 3:
+        print(f"  ... (mais {len(todas_leituras) - 3} registros)")
+    
+    # 3. Consultar um registro específico
+    if ids_inseridos:
+        id_leitura = ids_inseridos[0]
+        print(f"\nConsultando registro com ID {id_leitura}:")
+        leitura = bd.obter_leitura_por_id(id_leitura)
+        print(f"  {leitura}")
+    
+    # 4. Atualizar um registro
+    if ids_inseridos:
+        id_leitura = ids_inseridos[0]
+        print(f"\nAtualizando registro com ID {id_leitura}:")
+        sucesso = bd.atualizar_leitura(id_leitura, umidade=95.5, observacoes="Valor atualizado manualmente")
+        print(f"  Atualização {'bem-sucedida' if sucesso else 'falhou'}")
+        
+        # Verificar a atualização
+        leitura_atualizada = bd.obter_leitura_por_id(id_leitura)
+        print(f"  Registro atualizado: {leitura_atualizada}")
+    
+    # 5. Deletar um registro
+    if len(ids_inseridos) > 1:
+        id_leitura = ids_inseridos[-1]
+        print(f"\nDeletando registro com ID {id_leitura}:")
+        sucesso = bd.deletar_leitura(id_leitura)
+        print(f"  Deleção {'bem-sucedida' if sucesso else 'falhou'}")
+        
+        # Verificar a deleção
+        leitura_deletada = bd.obter_leitura_por_id(id_leitura)
+        print(f"  Tentativa de buscar registro deletado: {leitura_deletada}")
+    
+    # 6. Exportar para CSV
+    print("\nExportando dados para CSV:")
+    caminho_csv = bd.exportar_para_csv()
+    print(f"  Arquivo CSV gerado em: {caminho_csv}")
+    
+    # Fechar a conexão
+    bd.fechar()
     print("\n=== Demonstração concluída ===")
\ No newline at end of file
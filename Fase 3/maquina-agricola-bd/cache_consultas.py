@@ -0,0 +1,129 @@
+import sys
+import threading
+from collections import OrderedDict
+from itertools import islice
+from typing import Dict, Any, Callable, Hashable
+
+
+def estimar_tamanho(valor: Any, amostra: int = 100) -> int:
+    """
+    Estima os bytes ocupados por um resultado de consulta. DataFrames e arrays
+    informam o próprio tamanho; listas, tuplas e dicionários grandes têm uma
+    amostra dos itens medida e extrapolada.
+
+    Args:
+        valor: Resultado a medir
+        amostra: Itens medidos em cada coleção
+    """
+    uso = getattr(valor, 'memory_usage', None)
+    if callable(uso):
+        # pandas: Series.memory_usage é um número, DataFrame.memory_usage uma Series
+        total = uso(deep=True)
+        return int(total.sum()) if hasattr(total, 'sum') else int(total)
+    if hasattr(valor, 'nbytes'):
+        return int(valor.nbytes)
+
+    tamanho = sys.getsizeof(valor)
+    if isinstance(valor, dict):
+        itens = [item for par in islice(valor.items(), amostra) for item in par]
+    elif isinstance(valor, (list, tuple, set, frozenset)):
+        itens = list(islice(valor, amostra))
+    else:
+        return tamanho
+    medidos = min(len(valor), amostra)
+    if medidos:
+        tamanho += sum(estimar_tamanho(item, amostra) for item in itens) * len(valor) // medidos
+    return tamanho
+
+
+class CacheConsultas:
+    """
+    Cache LRU de resultados de consultas, limitado pelo tamanho estimado em bytes.
+
+    Cada consulta informa a versão atual dos dados (ver
+    BancoDadosAgricola.versao_dados). Enquanto a versão não muda, os resultados
+    valem indefinidamente; quando muda (houve gravação), todos são descartados
+    de uma vez. Assim não há dado velho nem releitura sem necessidade, como
+    acontece com um tempo de expiração fixo.
+
+    Os resultados são compartilhados entre quem consulta e não devem ser
+    alterados. Seguro para uso por várias threads.
+    """
+
+    def __init__(self, limite_bytes: int = 64 * 1024 ** 2):
+        """
+        Args:
+            limite_bytes: Tamanho máximo estimado dos resultados guardados (0 desativa)
+        """
+        self.limite_bytes = limite_bytes
+        self._entradas = OrderedDict()
+        self._versao = None
+        self._bytes = 0
+        self._trava = threading.Lock()
+        self._estatisticas = {
+            'acertos': 0,
+            'falhas': 0,
+            'invalidacoes': 0,
+            'remocoes': 0,
+        }
+
+    def _conferir_versao(self, versao: Hashable) -> None:
+        """Descarta as entradas se os dados mudaram (deve ser chamado com a trava)."""
+        if versao != self._versao:
+            if self._entradas:
+                self._estatisticas['invalidacoes'] += 1
+            self._entradas.clear()
+            self._bytes = 0
+            self._versao = versao
+
+    def obter(self, chave: Hashable, versao: Hashable, calcular: Callable[[], Any]) -> Any:
+        """
+        Retorna o resultado guardado para `chave` ou o calcula e guarda.
+
+        Args:
+            chave: Identifica a consulta (ex.: função e argumentos)
+            versao: Versão dos dados lida antes da consulta
+            calcular: Função sem argumentos que executa a consulta
+
+        Returns:
+            Resultado da consulta
+        """
+        if self.limite_bytes <= 0:
+            return calcular()
+        with self._trava:
+            self._conferir_versao(versao)
+            entrada = self._entradas.get(chave)
+            if entrada is not None:
+                self._entradas.move_to_end(chave)
+                self._estatisticas['acertos'] += 1
+                return entrada[0]
+            self._estatisticas['falhas'] += 1
+
+        # A consulta roda fora da trava: outras threads continuam sendo atendidas
+        valor = calcular()
+        tamanho = estimar_tamanho(valor)
+        with self._trava:
+            # Se os dados mudaram durante a consulta, o resultado não é guardado
+            if versao == self._versao and tamanho <= self.limite_bytes and chave not in self._entradas:
+                self._entradas[chave] = (valor, tamanho)
+                self._bytes += tamanho
+                while self._bytes > self.limite_bytes:
+                    _, (_, removido) = self._entradas.popitem(last=False)
+                    self._bytes -= removido
+                    self._estatisticas['remocoes'] += 1
+        return valor
+
+    def limpar(self) -> None:
+        """Descarta todos os resultados guardados."""
+        with self._trava:
+            self._entradas.clear()
+            self._bytes = 0
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Retorna acertos, falhas, invalidações, remoções por tamanho e ocupação."""
+        with self._trava:
+            dados = dict(self._estatisticas)
+            dados['entradas'] = len(self._entradas)
+            dados['bytes'] = self._bytes
+            dados['limite_bytes'] = self.limite_bytes
+        return dados
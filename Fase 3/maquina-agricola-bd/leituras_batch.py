@@ -0,0 +1,253 @@
+import sys
+import math
+import array
+import datetime
+from collections.abc import Mapping
+from typing import Dict, Any, List, Sequence, Iterator, Tuple
+
+# Origem dos instantes guardados em microssegundos (hora local, sem fuso, como data_hora)
+_EPOCA = datetime.datetime(1970, 1, 1)
+_MICROSSEGUNDO = datetime.timedelta(microseconds=1)
+
+
+class _Coluna:
+    """
+    Valores de uma coluna do lote. O tipo sai do primeiro valor não nulo:
+    'real' (array 'd', NULL = NaN), 'inteiro' (array 'q'), 'instante'
+    (datetime em µs, array 'q') ou 'objeto' (lista, para texto). Inteiros e
+    instantes marcam os NULL em `nulos`, criado só quando aparece o primeiro.
+    Um valor que não cabe no array (ex.: texto numa coluna REAL) passa a
+    coluna inteira para lista.
+    """
+
+    __slots__ = ('tipo', 'valores', 'nulos')
+
+    def __init__(self):
+        self.tipo = None
+        # Enquanto só houver NULL, guarda apenas a quantidade
+        self.valores = 0
+        self.nulos = None
+
+    def __len__(self) -> int:
+        return self.valores if self.tipo is None else len(self.valores)
+
+    def _iniciar(self, primeiro: Any) -> None:
+        anteriores = self.valores
+        if isinstance(primeiro, float):
+            self.tipo, self.valores = 'real', array.array('d', [math.nan]) * anteriores
+        elif isinstance(primeiro, (int, datetime.datetime)):
+            self.tipo = 'inteiro' if isinstance(primeiro, int) else 'instante'
+            self.valores = array.array('q', [0]) * anteriores
+            self.nulos = bytearray(b'\x01') * anteriores if anteriores else None
+        else:
+            self.tipo, self.valores = 'objeto', [None] * anteriores
+
+    def anexar(self, valores: Sequence[Any]) -> None:
+        if self.tipo is None:
+            primeiro = next((valor for valor in valores if valor is not None), None)
+            if primeiro is None:
+                self.valores += len(valores)
+                return
+            self._iniciar(primeiro)
+        if self.tipo != 'objeto':
+            try:
+                self._estender(valores)
+                return
+            except (TypeError, OverflowError):
+                self.valores, self.tipo, self.nulos = self.lista(), 'objeto', None
+        self.valores.extend(valores)
+
+    def _estender(self, valores: Sequence[Any]) -> None:
+        """Acrescenta ao array (o novo trecho é montado antes: um erro não deixa a coluna pela metade)."""
+        if self.tipo == 'real':
+            self.valores.extend(array.array('d', [math.nan if valor is None else valor for valor in valores]))
+            return
+        if self.tipo == 'inteiro':
+            novos = array.array('q', [0 if valor is None else valor for valor in valores])
+        else:
+            novos = array.array('q', [0 if valor is None else (valor - _EPOCA) // _MICROSSEGUNDO
+                                      for valor in valores])
+        if None in valores:
+            if self.nulos is None:
+                self.nulos = bytearray(len(self.valores))
+            self.nulos.extend(valor is None for valor in valores)
+        elif self.nulos is not None:
+            self.nulos.extend(bytes(len(valores)))
+        self.valores.extend(novos)
+
+    def valor(self, posicao: int) -> Any:
+        if self.tipo is None:
+            return None
+        valor = self.valores[posicao]
+        if self.tipo == 'real':
+            return None if valor != valor else valor
+        if self.tipo == 'objeto':
+            return valor
+        if self.nulos is not None and self.nulos[posicao]:
+            return None
+        return valor if self.tipo == 'inteiro' else _EPOCA + datetime.timedelta(microseconds=valor)
+
+    def lista(self) -> List[Any]:
+        """Valores como objetos Python (NULL = None)."""
+        if self.tipo is None:
+            return [None] * self.valores
+        if self.tipo == 'objeto':
+            return self.valores
+        if self.tipo == 'real':
+            return [None if valor != valor else valor for valor in self.valores]
+        valores = self.valores.tolist()
+        if self.tipo == 'instante':
+            valores = [_EPOCA + datetime.timedelta(microseconds=valor) for valor in valores]
+        if self.nulos is not None:
+            valores = [None if nulo else valor for valor, nulo in zip(valores, self.nulos)]
+        return valores
+
+    def para_numpy(self, np) -> Any:
+        """Array NumPy da coluna, sem cópia para reais e para inteiros/instantes sem NULL."""
+        if self.tipo is None:
+            return np.full(self.valores, np.nan)
+        if self.tipo == 'objeto':
+            return self.valores
+        if self.tipo == 'real':
+            return np.frombuffer(self.valores, dtype=np.float64)
+        dados = np.frombuffer(self.valores, dtype=np.int64)
+        if self.tipo == 'instante':
+            dados = dados.view('datetime64[us]')
+        if self.nulos is None:
+            return dados
+        # Com NULL, como o pandas faz: inteiros viram reais com NaN, instantes ganham NaT
+        dados = dados.astype(np.float64) if self.tipo == 'inteiro' else dados.copy()
+        dados[np.frombuffer(self.nulos, dtype=np.bool_)] = np.nan if self.tipo == 'inteiro' else np.datetime64('NaT')
+        return dados
+
+    @property
+    def nbytes(self) -> int:
+        if self.tipo is None:
+            return 0
+        if self.tipo == 'objeto':
+            return sys.getsizeof(self.valores) + sum(sys.getsizeof(valor) for valor in self.valores
+                                                     if valor is not None)
+        return self.valores.itemsize * len(self.valores) + len(self.nulos or b'')
+
+
+class Leitura(Mapping):
+    """
+    Uma linha de um LeiturasBatch, sem cópia: lê os valores dos arrays do lote.
+    Funciona como um dicionário somente leitura (leitura['ph'], .get, .keys,
+    dict(leitura)) e por atributo (leitura.ph).
+    """
+
+    __slots__ = ('_lote', '_posicao')
+
+    def __init__(self, lote: 'LeiturasBatch', posicao: int):
+        self._lote = lote
+        self._posicao = posicao
+
+    def __getitem__(self, coluna: str) -> Any:
+        return self._lote.valor(self._posicao, coluna)
+
+    def __getattr__(self, coluna: str) -> Any:
+        if coluna.startswith('_'):
+            raise AttributeError(coluna)
+        try:
+            return self._lote.valor(self._posicao, coluna)
+        except KeyError:
+            raise AttributeError(coluna) from None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._lote.colunas)
+
+    def __len__(self) -> int:
+        return len(self._lote.colunas)
+
+    def para_dict(self) -> Dict[str, Any]:
+        return dict(zip(self._lote.colunas, (self._lote.valor(self._posicao, coluna)
+                                             for coluna in self._lote.colunas)))
+
+    def __repr__(self) -> str:
+        return f"Leitura({self.para_dict()!r})"
+
+
+class LeiturasBatch:
+    """
+    Lote de leituras guardado por coluna (struct-of-arrays): os números ficam
+    em arrays compactos (array.array), sem um dicionário e um objeto Python
+    por valor em cada leitura. NULL é NaN nas colunas reais e uma marca à
+    parte nas inteiras.
+
+    Cada posição é acessível como uma Leitura (lote[i], iteração), com os
+    mesmos valores que iterar_leituras produziria. para_dataframe() monta um
+    DataFrame que usa os próprios arrays, sem cópia, nas colunas numéricas.
+    """
+
+    def __init__(self, colunas: Sequence[str]):
+        """
+        Args:
+            colunas: Nomes das colunas, na ordem das linhas anexadas
+        """
+        self.colunas = tuple(colunas)
+        self._colunas = {coluna: _Coluna() for coluna in self.colunas}
+        self._linhas = 0
+
+    def anexar_linhas(self, linhas: Sequence[Sequence[Any]]) -> None:
+        """Acrescenta linhas (tuplas na ordem de self.colunas), ex.: um fetchmany."""
+        if not linhas:
+            return
+        for coluna, valores in zip(self._colunas.values(), zip(*linhas)):
+            coluna.anexar(valores)
+        self._linhas += len(linhas)
+
+    def __len__(self) -> int:
+        return self._linhas
+
+    def __getitem__(self, posicao: int) -> Leitura:
+        if posicao < 0:
+            posicao += self._linhas
+        if not 0 <= posicao < self._linhas:
+            raise IndexError(posicao)
+        return Leitura(self, posicao)
+
+    def __iter__(self) -> Iterator[Leitura]:
+        return (Leitura(self, posicao) for posicao in range(self._linhas))
+
+    def valor(self, posicao: int, coluna: str) -> Any:
+        """Valor de uma coluna em uma posição (KeyError se a coluna não existe)."""
+        return self._colunas[coluna].valor(posicao)
+
+    def valores(self, coluna: str) -> List[Any]:
+        """Valores de uma coluna como lista de objetos Python (NULL = None)."""
+        return self._colunas[coluna].lista()
+
+    def tuplas(self) -> Iterator[Tuple]:
+        """Percorre as linhas como tuplas, na ordem de self.colunas."""
+        return zip(*(coluna.lista() for coluna in self._colunas.values()))
+
+    def para_dicts(self) -> List[Dict[str, Any]]:
+        """Linhas como dicionários (o formato de obter_todas_leituras)."""
+        return [dict(zip(self.colunas, linha)) for linha in self.tuplas()]
+
+    def para_dataframe(self):
+        """
+        Monta um DataFrame do pandas. Colunas reais, inteiras sem NULL e
+        instantes apontam para os arrays do lote, sem cópia (e, enquanto o
+        DataFrame existir, o lote não aceita novas linhas). Inteiros com NULL
+        viram reais com NaN, como no pandas; data_hora em texto é convertida
+        para datetime.
+        """
+        # pandas/NumPy só são necessários aqui
+        import numpy as np
+        import pandas as pd
+
+        dados = {nome: coluna.para_numpy(np) for nome, coluna in self._colunas.items()}
+        df = pd.DataFrame(dados, columns=list(self.colunas), copy=False)
+        if 'data_hora' in df.columns and self._colunas['data_hora'].tipo in (None, 'objeto'):
+            df['data_hora'] = pd.to_datetime(df['data_hora'], format='ISO8601')
+        return df
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes ocupados pelos valores (usado pelo cache de consultas)."""
+        return sum(coluna.nbytes for coluna in self._colunas.values())
+
+    def __repr__(self) -> str:
+        return f"LeiturasBatch({self._linhas} leituras, colunas={list(self.colunas)})"
@@ -0,0 +1,170 @@
+import sqlite3
+import threading
+import queue
+import time
+from contextlib import contextmanager
+from urllib.parse import quote
+from typing import Dict, Any, Iterator, Optional
+
+
+class PoolConexoes:
+    """
+    Pool de conexões SQLite: uma conexão de escrita (protegida por trava) e até
+    `max_leitores` conexões somente leitura, emprestadas por context manager.
+
+    Em modo WAL os leitores não bloqueiam o escritor, então as leituras de
+    várias threads (ex.: Streamlit) rodam em paralelo com a ingestão.
+    """
+
+    def __init__(self, nome_bd: str, max_leitores: int = 4,
+                 pragmas: Optional[Dict[str, Any]] = None, timeout: float = 30.0):
+        """
+        Args:
+            nome_bd: Caminho do arquivo SQLite (não pode ser ':memory:')
+            max_leitores: Limite de conexões de leitura abertas ao mesmo tempo
+            pragmas: PRAGMAs aplicados em cada conexão aberta pelo pool
+            timeout: Segundos de espera por um leitor livre antes de TimeoutError
+        """
+        if nome_bd == ':memory:':
+            raise ValueError("O pool precisa de um arquivo; ':memory:' não é compartilhado entre conexões")
+        if max_leitores < 1:
+            raise ValueError("max_leitores deve ser pelo menos 1")
+
+        self.nome_bd = nome_bd
+        self.max_leitores = max_leitores
+        self.pragmas = dict(pragmas or {})
+        self.timeout = timeout
+
+        self._livres = queue.LifoQueue()
+        self._trava = threading.Lock()
+        self._trava_escrita = threading.RLock()
+        self._local = threading.local()
+        self._leitores = []
+        self._monitor = None
+        self._fechado = False
+        self._estatisticas = {
+            'emprestimos_leitura': 0,
+            'esperas_leitura': 0,
+            'tempo_espera_leitura': 0.0,
+            'escritas': 0,
+            'tempo_espera_escrita': 0.0,
+        }
+
+        self.escritor = sqlite3.connect(nome_bd, check_same_thread=False)
+        self._aplicar_pragmas(self.escritor, leitura=False)
+
+    def _aplicar_pragmas(self, conn: sqlite3.Connection, leitura: bool) -> None:
+        """Aplica os PRAGMAs configurados; journal_mode e auto_vacuum só valem para o escritor."""
+        for nome, valor in self.pragmas.items():
+            if leitura and nome in ('journal_mode', 'auto_vacuum'):
+                continue
+            conn.execute(f'PRAGMA {nome} = {valor}')
+
+    def _abrir_leitor(self) -> sqlite3.Connection:
+        """Abre uma nova conexão somente leitura."""
+        conn = sqlite3.connect(f"file:{quote(self.nome_bd)}?mode=ro", uri=True,
+                               check_same_thread=False)
+        self._aplicar_pragmas(conn, leitura=True)
+        return conn
+
+    def _obter_leitor(self) -> sqlite3.Connection:
+        """Retira um leitor livre, abre um novo se houver vaga ou espera por um."""
+        try:
+            return self._livres.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._trava:
+            if self._fechado:
+                raise sqlite3.ProgrammingError("Pool de conexões fechado")
+            if len(self._leitores) < self.max_leitores:
+                conn = self._abrir_leitor()
+                self._leitores.append(conn)
+                return conn
+            self._estatisticas['esperas_leitura'] += 1
+
+        inicio = time.perf_counter()
+        try:
+            conn = self._livres.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(
+                f"Nenhuma conexão de leitura livre após {self.timeout}s "
+                f"(max_leitores={self.max_leitores})"
+            ) from None
+        with self._trava:
+            self._estatisticas['tempo_espera_leitura'] += time.perf_counter() - inicio
+        return conn
+
+    @contextmanager
+    def leitor(self) -> Iterator[sqlite3.Connection]:
+        """
+        Empresta uma conexão de leitura. Dentro da mesma thread o empréstimo é
+        reentrante: chamadas aninhadas reutilizam a conexão já emprestada.
+        """
+        atual = getattr(self._local, 'conexao', None)
+        if atual is not None:
+            self._local.profundidade += 1
+            try:
+                yield atual
+            finally:
+                self._local.profundidade -= 1
+            return
+
+        conn = self._obter_leitor()
+        with self._trava:
+            self._estatisticas['emprestimos_leitura'] += 1
+        self._local.conexao = conn
+        self._local.profundidade = 0
+        try:
+            yield conn
+        finally:
+            self._local.conexao = None
+            if conn.in_transaction:
+                conn.rollback()
+            self._livres.put(conn)
+
+    @contextmanager
+    def escrita(self) -> Iterator[sqlite3.Connection]:
+        """Dá acesso exclusivo à conexão de escrita enquanto o bloco executa."""
+        inicio = time.perf_counter()
+        with self._trava_escrita:
+            with self._trava:
+                self._estatisticas['escritas'] += 1
+                self._estatisticas['tempo_espera_escrita'] += time.perf_counter() - inicio
+            yield self.escritor
+
+    def versao_dados(self) -> int:
+        """
+        PRAGMA data_version de uma conexão reservada, que nunca grava: o valor
+        muda a cada commit de qualquer outra conexão, inclusive o escritor do
+        pool e outros processos.
+        """
+        with self._trava:
+            if self._fechado:
+                raise sqlite3.ProgrammingError("Pool de conexões fechado")
+            if self._monitor is None:
+                self._monitor = self._abrir_leitor()
+            return self._monitor.execute('PRAGMA data_version').fetchone()[0]
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Retorna contadores de uso do pool."""
+        with self._trava:
+            dados = dict(self._estatisticas)
+            dados['max_leitores'] = self.max_leitores
+            dados['leitores_abertos'] = len(self._leitores)
+            dados['leitores_livres'] = self._livres.qsize()
+            dados['leitores_em_uso'] = len(self._leitores) - self._livres.qsize()
+        return dados
+
+    def fechar(self) -> None:
+        """Fecha o escritor e todos os leitores."""
+        with self._trava:
+            self._fechado = True
+            leitores, self._leitores = self._leitores, []
+            if self._monitor is not None:
+                leitores.append(self._monitor)
+                self._monitor = None
+        for conn in leitores:
+            conn.close()
+        with self._trava_escrita:
+            self.escritor.close()
@@ -0,0 +1,274 @@
+import os
+import json
+import time
+import bisect
+import argparse
+import threading
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Colunas do arquivo e tipo NumPy de cada uma (little-endian, tamanho fixo). As
+# de texto (observacoes) ficam de fora: não dá para mapeá-las sem cópia.
+COLUNAS_COLUNAR = {
+    'id': '<i8',
+    'data_hora': '<M8[us]',
+    'umidade': '<f8',
+    'ph': '<f8',
+    'fosforo': '<i1',
+    'potassio': '<i1',
+    'status_bomba': '<i1',
+    'previsao_irrigacao': '<i1',
+    'confianca_previsao': '<f8',
+    'dispositivo': '<i4',
+    'sequencia': '<i8',
+}
+
+# Valor gravado no lugar de NULL nas colunas inteiras (nas reais, NaN)
+NULO_INTEIRO = -1
+
+# Linhas por bloco do índice de tempo
+LINHAS_POR_BLOCO = 65536
+
+ARQUIVO_INDICE = 'indice.json'
+VERSAO_FORMATO = 1
+
+
+def _instante(valor: Any) -> np.datetime64:
+    """Converte datetime/date/texto ISO/datetime64 para o instante do arquivo (µs)."""
+    return np.datetime64(valor, 'us')
+
+
+class ArquivoColunar:
+    """
+    Histórico de leituras em formato colunar: um arquivo binário por coluna
+    (`<coluna>.bin`, mapeável com numpy.memmap) e um índice JSON com a
+    quantidade de linhas e os blocos de tempo (primeira linha, linhas, menor e
+    maior data_hora de cada bloco).
+
+    As linhas ficam em ordem de data_hora e só são acrescentadas no fim. ler()
+    devolve fatias dos arquivos mapeados, sem cópia: abrir um ano de leituras
+    custa só a busca nos blocos, e vários processos lendo o mesmo arquivo
+    compartilham as páginas do cache do sistema operacional.
+
+    Um único processo grava por vez. Os dados são gravados antes do índice, que
+    é trocado de uma vez: quem lê nunca vê uma linha pela metade.
+    """
+
+    def __init__(self, pasta: str, colunas: Optional[Dict[str, str]] = None):
+        """
+        Abre o arquivo em `pasta` ou, se não existir, o cria.
+
+        Args:
+            pasta: Diretório do arquivo colunar
+            colunas: Colunas (nome -> tipo NumPy) de um arquivo novo
+                (padrão: COLUNAS_COLUNAR); num arquivo existente vale o índice
+        """
+        self.pasta = pasta
+        self._mapas = {}
+        self._trava = threading.Lock()
+        indice = self._ler_indice()
+        if indice is None:
+            os.makedirs(pasta, exist_ok=True)
+            colunas = dict(colunas or COLUNAS_COLUNAR)
+            if 'data_hora' not in colunas:
+                raise ValueError("O arquivo colunar precisa da coluna data_hora")
+            indice = {'versao': VERSAO_FORMATO, 'colunas': colunas, 'linhas': 0,
+                      'blocos': [], 'metadados': {}}
+            for coluna in colunas:
+                open(self._caminho(coluna), 'wb').close()
+            self._salvar_indice(indice)
+        elif indice['versao'] != VERSAO_FORMATO:
+            raise ValueError(f"Versão do arquivo colunar não suportada: {indice['versao']}")
+        self._indice = indice
+        self.colunas = {nome: np.dtype(tipo) for nome, tipo in indice['colunas'].items()}
+
+    def _caminho(self, coluna: str) -> str:
+        return os.path.join(self.pasta, f"{coluna}.bin")
+
+    def _ler_indice(self) -> Optional[Dict[str, Any]]:
+        caminho = os.path.join(self.pasta, ARQUIVO_INDICE)
+        if not os.path.exists(caminho):
+            return None
+        with open(caminho, encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+
+    def _salvar_indice(self, indice: Dict[str, Any]) -> None:
+        caminho = os.path.join(self.pasta, ARQUIVO_INDICE)
+        with open(caminho + '.tmp', 'w', encoding='utf-8') as arquivo:
+            json.dump(indice, arquivo)
+        os.replace(caminho + '.tmp', caminho)
+
+    def recarregar(self) -> None:
+        """Relê o índice, passando a enxergar as linhas anexadas por outro processo."""
+        indice = self._ler_indice()
+        with self._trava:
+            self._indice = indice
+
+    def __len__(self) -> int:
+        return self._indice['linhas']
+
+    @property
+    def metadados(self) -> Dict[str, Any]:
+        """Dados livres gravados junto com as linhas por anexar() (ex.: a última leitura exportada)."""
+        return dict(self._indice['metadados'])
+
+    def intervalo(self) -> Optional[Tuple[np.datetime64, np.datetime64]]:
+        """Menor e maior data_hora do arquivo, ou None se estiver vazio."""
+        blocos = self._indice['blocos']
+        if not blocos:
+            return None
+        return (np.datetime64(blocos[0][2], 'us'), np.datetime64(blocos[-1][3], 'us'))
+
+    def _converter(self, coluna: str, valores: Any) -> np.ndarray:
+        """Converte os valores de uma coluna para o tipo do arquivo (None vira NaN ou NULO_INTEIRO)."""
+        tipo = self.colunas[coluna]
+        if isinstance(valores, np.ndarray):
+            return valores.astype(tipo, copy=False)
+        if tipo.kind in 'iu':
+            valores = [NULO_INTEIRO if valor is None else valor for valor in valores]
+        return np.array(valores, dtype=tipo)
+
+    def anexar(self, dados: Dict[str, Any], metadados: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Acrescenta linhas no fim do arquivo.
+
+        Args:
+            dados: Coluna -> valores (sequência ou array), todas as colunas do
+                arquivo e do mesmo tamanho; data_hora em ordem crescente e não
+                anterior à última do arquivo
+            metadados: Atualizações dos metadados, gravadas junto com as linhas
+
+        Returns:
+            Quantidade de linhas anexadas
+
+        Raises:
+            ValueError: Se faltarem colunas, os tamanhos diferirem ou as datas estiverem fora de ordem
+        """
+        faltando = set(self.colunas) - set(dados)
+        if faltando:
+            raise ValueError(f"Colunas ausentes: {sorted(faltando)}")
+        arrays = {coluna: self._converter(coluna, dados[coluna]) for coluna in self.colunas}
+        quantidade = len(arrays['data_hora'])
+        if any(len(array) != quantidade for array in arrays.values()):
+            raise ValueError("As colunas devem ter o mesmo tamanho")
+
+        indice = dict(self._indice)
+        datas = arrays['data_hora'].astype(np.int64)
+        if quantidade and (np.any(datas[1:] < datas[:-1]) or
+                           (indice['blocos'] and datas[0] < indice['blocos'][-1][3])):
+            raise ValueError("As leituras devem ser anexadas em ordem de data_hora")
+
+        linhas = indice['linhas']
+        for coluna, array in arrays.items():
+            with open(self._caminho(coluna), 'r+b') as arquivo:
+                # Descarta o que sobrou de uma gravação interrompida, além das linhas do índice
+                arquivo.truncate(linhas * array.itemsize)
+                arquivo.seek(0, os.SEEK_END)
+                arquivo.write(np.ascontiguousarray(array).tobytes())
+
+        # Completa o último bloco e abre os seguintes
+        blocos = [list(bloco) for bloco in indice['blocos']]
+        posicao = 0
+        while posicao < quantidade:
+            if blocos and blocos[-1][1] < LINHAS_POR_BLOCO:
+                bloco = blocos[-1]
+            else:
+                bloco = [linhas + posicao, 0, int(datas[posicao]), int(datas[posicao])]
+                blocos.append(bloco)
+            parte = min(LINHAS_POR_BLOCO - bloco[1], quantidade - posicao)
+            bloco[1] += parte
+            bloco[3] = int(datas[posicao + parte - 1])
+            posicao += parte
+
+        indice['linhas'] = linhas + quantidade
+        indice['blocos'] = blocos
+        indice['metadados'] = {**indice['metadados'], **(metadados or {})}
+        self._salvar_indice(indice)
+        with self._trava:
+            self._indice = indice
+        return quantidade
+
+    def _mapa(self, coluna: str, linhas: int) -> np.ndarray:
+        """Arquivo da coluna mapeado com `linhas` linhas (reaproveitado enquanto não cresce)."""
+        with self._trava:
+            mapa = self._mapas.get(coluna)
+            if mapa is None or len(mapa) != linhas:
+                if linhas == 0:
+                    mapa = np.empty(0, dtype=self.colunas[coluna])
+                else:
+                    mapa = np.memmap(self._caminho(coluna), dtype=self.colunas[coluna],
+                                     mode='r', shape=(linhas,))
+                self._mapas[coluna] = mapa
+            return mapa
+
+    def _primeira_linha(self, instante: np.datetime64, blocos: List[List[int]],
+                        datas: np.ndarray) -> int:
+        """Primeira linha com data_hora >= instante: busca nos blocos e depois no bloco achado."""
+        valor = int(instante.astype(np.int64))
+        posicao = bisect.bisect_left([bloco[3] for bloco in blocos], valor)
+        if posicao == len(blocos):
+            return len(datas)
+        primeira, linhas = blocos[posicao][0], blocos[posicao][1]
+        return primeira + int(np.searchsorted(datas[primeira:primeira + linhas], instante))
+
+    def linhas_periodo(self, inicio: Any = None, fim: Any = None) -> Tuple[int, int]:
+        """
+        Intervalo de linhas [primeira, ultima) com data_hora no período [inicio, fim).
+        """
+        indice = self._indice
+        datas = self._mapa('data_hora', indice['linhas'])
+        primeira = self._primeira_linha(_instante(inicio), indice['blocos'], datas) if inicio is not None else 0
+        ultima = self._primeira_linha(_instante(fim), indice['blocos'], datas) if fim is not None else len(datas)
+        return primeira, max(primeira, ultima)
+
+    def ler(self, inicio: Any = None, fim: Any = None,
+            colunas: Optional[Sequence[str]] = None) -> Dict[str, np.ndarray]:
+        """
+        Retorna as leituras do período como arrays somente leitura, sem cópia
+        (fatias dos arquivos mapeados). NULL aparece como NaN nas colunas reais
+        e como NULO_INTEIRO nas inteiras.
+
+        Args:
+            inicio: Início do período (inclusivo), datetime/date, texto ISO ou datetime64
+            fim: Fim do período (exclusivo)
+            colunas: Colunas retornadas (padrão: todas)
+
+        Returns:
+            Dicionário coluna -> array
+        """
+        colunas = list(colunas or self.colunas)
+        invalidas = set(colunas) - set(self.colunas)
+        if invalidas:
+            raise ValueError(f"Colunas inválidas: {sorted(invalidas)}")
+        linhas = self._indice['linhas']
+        primeira, ultima = self.linhas_periodo(inicio, fim)
+        return {coluna: self._mapa(coluna, linhas)[primeira:ultima] for coluna in colunas}
+
+
+if __name__ == "__main__":
+    from banco_dados_agricola import BancoDadosAgricola
+
+    parser = argparse.ArgumentParser(description="Exporta o histórico de leituras para o formato colunar")
+    parser.add_argument("--banco", default="dados_agricolas.db")
+    parser.add_argument("--pasta", default="historico_colunar")
+    parser.add_argument("--particionado", action="store_true")
+    parser.add_argument("--dias", type=int, default=None, help="Lê os últimos N dias depois de exportar")
+    args = parser.parse_args()
+
+    with BancoDadosAgricola(args.banco, particionado=args.particionado) as bd:
+        inicio = time.perf_counter()
+        anexadas = bd.exportar_para_colunar(args.pasta)
+        print(f"{anexadas} leituras anexadas em {time.perf_counter() - inicio:.2f}s")
+
+    arquivo = ArquivoColunar(args.pasta)
+    periodo = arquivo.intervalo()
+    if periodo is not None:
+        print(f"{len(arquivo)} leituras de {periodo[0]} a {periodo[1]}")
+        if args.dias:
+            desde = periodo[1] - np.timedelta64(args.dias, 'D')
+            inicio = time.perf_counter()
+            dados = arquivo.ler(desde)
+            print(f"{len(dados['data_hora'])} leituras dos últimos {args.dias} dias abertas em "
+                  f"{(time.perf_counter() - inicio) * 1000:.2f} ms; umidade média "
+                  f"{np.nanmean(dados['umidade']):.1f}%")
@@ -0,0 +1,445 @@
+import os
+import csv
+import sys
+import json
+import math
+import time
+import sqlite3
+import argparse
+import datetime
+from urllib.parse import quote
+from typing import Dict, Any, List, Optional, Callable
+
+from banco_dados_agricola import BancoDadosAgricola
+
+# Tabelas copiadas pelos backups incrementais (IDs AUTOINCREMENT: só crescem)
+TABELAS_INCREMENTAIS = ('leituras_sensores', 'leituras_equipamento')
+
+# Catálogo da pasta de backups: ordem dos backups e marca d'água (maior ID) de cada um
+ARQUIVO_CATALOGO = 'catalogo_backup.json'
+
+# Assinatura do acompanhamento: (feito, total), em páginas ou em linhas
+Progresso = Callable[[int, int], None]
+
+
+class _BackupReiniciado(Exception):
+    """Outra conexão gravou no banco durante a cópia em passos e a cópia recomeçou."""
+
+
+def _ler_catalogo(pasta: str) -> Dict[str, Any]:
+    caminho = os.path.join(pasta, ARQUIVO_CATALOGO)
+    if not os.path.exists(caminho):
+        return {'banco': None, 'backups': []}
+    with open(caminho, encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+
+def _salvar_catalogo(pasta: str, catalogo: Dict[str, Any]) -> None:
+    # Grava em um arquivo temporário e troca, para não deixar um catálogo pela metade
+    caminho = os.path.join(pasta, ARQUIVO_CATALOGO)
+    with open(caminho + '.tmp', 'w', encoding='utf-8') as arquivo:
+        json.dump(catalogo, arquivo, indent=2, ensure_ascii=False)
+    os.replace(caminho + '.tmp', caminho)
+
+
+def _conferir_catalogo(catalogo: Dict[str, Any], bd: BancoDadosAgricola) -> None:
+    banco = os.path.abspath(bd.nome_bd)
+    if catalogo['banco'] is None:
+        catalogo['banco'] = banco
+    elif catalogo['banco'] != banco:
+        raise ValueError(f"A pasta de backups pertence a outro banco: {catalogo['banco']}")
+
+
+def _raiz_backup(bd: BancoDadosAgricola, catalogo: Dict[str, Any], data: datetime.datetime) -> str:
+    """Nome base dos arquivos de um backup: banco, posição no catálogo e data."""
+    nome = os.path.splitext(os.path.basename(bd.nome_bd))[0]
+    return f"{nome}_{len(catalogo['backups']):04d}_{data:%Y%m%dT%H%M%S}"
+
+
+def _abrir_somente_leitura(caminho: str) -> sqlite3.Connection:
+    return sqlite3.connect(f"file:{quote(caminho)}?mode=ro", uri=True)
+
+
+def _tabelas_existentes(conn: sqlite3.Connection) -> List[str]:
+    existentes = {linha[0] for linha in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    return [tabela for tabela in TABELAS_INCREMENTAIS if tabela in existentes]
+
+
+def _ultimos_ids(conn: sqlite3.Connection) -> Dict[str, int]:
+    return {tabela: conn.execute(f'SELECT COALESCE(MAX(id), 0) FROM {tabela}').fetchone()[0]
+            for tabela in _tabelas_existentes(conn)}
+
+
+def copiar_banco(origem: sqlite3.Connection, caminho_destino: str, paginas_por_passo: int = 1024,
+                 pausa: float = 0.0, max_reinicios: int = 3,
+                 progresso: Optional[Progresso] = None) -> Dict[str, int]:
+    """
+    Copia um banco aberto para um arquivo com a API de backup do SQLite, em
+    passos de `paginas_por_passo` páginas. Entre os passos o banco fica livre:
+    a ingestão continua gravando.
+
+    Quando outra conexão grava durante a cópia, o SQLite recomeça do início.
+    Depois de `max_reinicios` recomeços, a cópia é feita em um único passo, que
+    no modo WAL lê um retrato consistente sem bloquear o escritor.
+
+    Args:
+        origem: Conexão do banco de origem
+        caminho_destino: Arquivo de destino (sobrescrito)
+        paginas_por_passo: Páginas copiadas por passo
+        pausa: Segundos de espera entre os passos
+        max_reinicios: Recomeços aceitos antes de copiar em um único passo
+        progresso: Chamado a cada passo com (páginas copiadas, total de páginas)
+
+    Returns:
+        Dicionário com páginas, passos e reinícios
+    """
+    resultado = {'paginas': 0, 'passos': 0, 'reinicios': 0}
+    restantes_anterior = None
+
+    def acompanhar(status: int, restantes: int, total: int) -> None:
+        nonlocal restantes_anterior
+        resultado['passos'] += 1
+        resultado['paginas'] = total
+        if restantes_anterior is not None and restantes > restantes_anterior:
+            resultado['reinicios'] += 1
+            if resultado['reinicios'] > max_reinicios:
+                raise _BackupReiniciado()
+        restantes_anterior = restantes
+        if progresso is not None:
+            progresso(total - restantes, total)
+        if pausa and restantes:
+            time.sleep(pausa)
+
+    destino = sqlite3.connect(caminho_destino)
+    try:
+        try:
+            origem.backup(destino, pages=paginas_por_passo, progress=acompanhar)
+        except _BackupReiniciado:
+            restantes_anterior = None
+            origem.backup(destino, pages=-1, progress=acompanhar)
+    finally:
+        destino.close()
+    return resultado
+
+
+def backup_completo(bd: BancoDadosAgricola, pasta: str = "backups", paginas_por_passo: int = 1024,
+                    pausa: float = 0.0, progresso: Optional[Progresso] = None) -> Dict[str, Any]:
+    """
+    Faz um backup completo do banco (e, no modo particionado, de cada partição)
+    com a ingestão em andamento, e registra no catálogo da pasta o maior ID de
+    cada tabela copiada: os backups incrementais seguintes partem dele.
+
+    Args:
+        bd: Banco de origem (precisa ser um arquivo)
+        pasta: Pasta dos backups (criada se não existir)
+        paginas_por_passo: Páginas copiadas por passo (ver copiar_banco)
+        pausa: Segundos de espera entre os passos
+        progresso: Chamado com (páginas copiadas, total) de cada arquivo
+
+    Returns:
+        Entrada registrada no catálogo (arquivos, maiores IDs, páginas, duração)
+    """
+    if bd.nome_bd == ':memory:':
+        raise ValueError("Backup precisa de um banco em arquivo")
+    os.makedirs(pasta, exist_ok=True)
+    catalogo = _ler_catalogo(pasta)
+    _conferir_catalogo(catalogo, bd)
+
+    inicio = time.perf_counter()
+    data = datetime.datetime.now()
+    raiz = _raiz_backup(bd, catalogo, data)
+    arquivo = f"{raiz}.db"
+    caminho = os.path.join(pasta, arquivo)
+
+    origem = _abrir_somente_leitura(bd.nome_bd)
+    try:
+        copia = copiar_banco(origem, caminho, paginas_por_passo, pausa, progresso=progresso)
+    finally:
+        origem.close()
+
+    # O catálogo de partições da cópia diz quais arquivos de mês copiar
+    conn = sqlite3.connect(caminho)
+    try:
+        particoes = conn.execute('SELECT arquivo FROM particoes ORDER BY mes').fetchall() \
+            if bd.particionado else []
+        ultimo_id = {} if bd.particionado else _ultimos_ids(conn)
+    finally:
+        conn.close()
+    pasta_particoes = os.path.join(pasta, raiz)
+    if particoes:
+        os.makedirs(pasta_particoes, exist_ok=True)
+    for (arquivo_particao,) in particoes:
+        origem = _abrir_somente_leitura(os.path.join(os.path.dirname(bd.nome_bd), arquivo_particao))
+        try:
+            parcial = copiar_banco(origem, os.path.join(pasta_particoes, arquivo_particao),
+                                   paginas_por_passo, pausa, progresso=progresso)
+        finally:
+            origem.close()
+        for chave in copia:
+            copia[chave] += parcial[chave]
+
+    entrada = {
+        'tipo': 'completo',
+        'data': data.isoformat(timespec='seconds'),
+        'arquivo': arquivo,
+        'particoes': [os.path.join(os.path.basename(pasta_particoes), a) for (a,) in particoes],
+        'ultimo_id': ultimo_id,
+        'paginas': copia['paginas'],
+        'reinicios': copia['reinicios'],
+        'segundos': round(time.perf_counter() - inicio, 3),
+    }
+    catalogo['backups'].append(entrada)
+    _salvar_catalogo(pasta, catalogo)
+    return entrada
+
+
+def _literal_sql(valor: Any) -> str:
+    """
+    Valor Python como literal SQL. Floats vão com 17 dígitos: com a
+    representação mais curta (repr), o SQLite às vezes lê um valor vizinho.
+    """
+    if valor is None or (isinstance(valor, float) and math.isnan(valor)):
+        return 'NULL'
+    if isinstance(valor, float):
+        if math.isinf(valor):
+            return '9e999' if valor > 0 else '-9e999'
+        texto = format(valor, '.17g')
+        return texto if any(c in texto for c in '.e') else texto + '.0'
+    if isinstance(valor, int):
+        return str(valor)
+    if isinstance(valor, bytes):
+        return f"X'{valor.hex()}'"
+    return "'" + str(valor).replace("'", "''") + "'"
+
+
+def backup_incremental(bd: BancoDadosAgricola, pasta: str = "backups", formato: str = 'sql',
+                       tamanho_lote: int = 10000,
+                       progresso: Optional[Progresso] = None) -> Dict[str, Any]:
+    """
+    Exporta só as linhas adicionadas desde o backup anterior (completo ou
+    incremental): as de ID acima da marca d'água do catálogo. Alterações e
+    remoções de linhas antigas não entram; para elas, faça um backup completo.
+
+    Em 'sql' gera um script com INSERT OR IGNORE (reaplicar é inofensivo);
+    em 'csv' gera um arquivo por tabela, com o ID na primeira coluna e NULL
+    como campo vazio.
+
+    Args:
+        bd: Banco de origem (não particionado)
+        pasta: Pasta dos backups, com um backup completo anterior
+        formato: 'sql' ou 'csv'
+        tamanho_lote: Linhas lidas por vez
+        progresso: Chamado a cada lote com (linhas exportadas, total a exportar)
+
+    Returns:
+        Entrada registrada no catálogo (arquivos, linhas por tabela, maiores IDs)
+    """
+    if formato not in ('sql', 'csv'):
+        raise ValueError("formato deve ser 'sql' ou 'csv'")
+    if bd.particionado:
+        raise ValueError("No modo particionado cada mês é um arquivo: use backup_completo")
+    catalogo = _ler_catalogo(pasta)
+    _conferir_catalogo(catalogo, bd)
+    if not any(entrada['tipo'] == 'completo' for entrada in catalogo['backups']):
+        raise ValueError("Faça um backup completo antes do primeiro incremental")
+    desde = catalogo['backups'][-1]['ultimo_id']
+
+    data = datetime.datetime.now()
+    raiz = _raiz_backup(bd, catalogo, data) + '_inc'
+    entrada = {'tipo': 'incremental', 'data': data.isoformat(timespec='seconds'), 'formato': formato,
+               'arquivos': [], 'desde_id': desde, 'ultimo_id': {}, 'linhas': {}}
+
+    with bd.conexao_leitura() as conn:
+        cursor = conn.cursor()
+        # Um retrato só: as linhas exportadas e as marcas d'água são do mesmo instante
+        cursor.execute('BEGIN')
+        try:
+            ate = _ultimos_ids(conn)
+            total = sum(
+                conn.execute(f'SELECT COUNT(*) FROM {tabela} WHERE id > ? AND id <= ?',
+                             (desde.get(tabela, 0), ultimo)).fetchone()[0]
+                for tabela, ultimo in ate.items()
+            )
+            exportadas = 0
+            script = None
+            if formato == 'sql':
+                entrada['arquivos'].append(f"{raiz}.sql")
+                script = open(os.path.join(pasta, f"{raiz}.sql"), 'w', encoding='utf-8')
+                script.write("BEGIN TRANSACTION;\n")
+            try:
+                for tabela, ultimo in ate.items():
+                    cursor.execute(f'SELECT * FROM {tabela} WHERE id > ? AND id <= ? ORDER BY id',
+                                   (desde.get(tabela, 0), ultimo))
+                    colunas = [descricao[0] for descricao in cursor.description]
+                    if formato == 'csv':
+                        entrada['arquivos'].append(f"{raiz}_{tabela}.csv")
+                        saida = open(os.path.join(pasta, f"{raiz}_{tabela}.csv"), 'w',
+                                     encoding='utf-8', newline='')
+                        escritor = csv.writer(saida)
+                        escritor.writerow(colunas)
+                    prefixo = f'INSERT OR IGNORE INTO "{tabela}" ({", ".join(colunas)}) VALUES('
+                    linhas = 0
+                    try:
+                        while True:
+                            lote = cursor.fetchmany(tamanho_lote)
+                            if not lote:
+                                break
+                            if formato == 'sql':
+                                script.writelines(
+                                    f"{prefixo}{','.join(map(_literal_sql, linha))});\n" for linha in lote
+                                )
+                            else:
+                                escritor.writerows(lote)
+                            linhas += len(lote)
+                            exportadas += len(lote)
+                            if progresso is not None:
+                                progresso(exportadas, total)
+                    finally:
+                        if formato == 'csv':
+                            saida.close()
+                    entrada['linhas'][tabela] = linhas
+                if formato == 'sql':
+                    script.write("COMMIT;\n")
+            finally:
+                if script is not None:
+                    script.close()
+        finally:
+            conn.rollback()
+
+    entrada['ultimo_id'] = {tabela: max(ultimo, desde.get(tabela, 0)) for tabela, ultimo in ate.items()}
+    catalogo['backups'].append(entrada)
+    _salvar_catalogo(pasta, catalogo)
+    return entrada
+
+
+def _aplicar_csv(conn: sqlite3.Connection, caminho: str, tabela: str, tamanho_lote: int = 10000) -> int:
+    """
+    Insere as linhas de um CSV incremental (campos vazios viram NULL). As
+    colunas REAL são convertidas pelo Python: a conversão de texto do SQLite
+    pode errar o último dígito.
+    """
+    inseridas = 0
+    reais = {linha[1] for linha in conn.execute(f'PRAGMA table_info({tabela})')
+             if linha[2].upper() in ('REAL', 'FLOAT', 'DOUBLE')}
+    with open(caminho, encoding='utf-8', newline='') as arquivo:
+        leitor = csv.reader(arquivo)
+        colunas = next(leitor)
+        conversoes = [float if coluna in reais else str for coluna in colunas]
+        sql = (f'INSERT OR IGNORE INTO {tabela} ({", ".join(colunas)}) '
+               f'VALUES ({", ".join("?" * len(colunas))})')
+        lote = []
+        for linha in leitor:
+            lote.append([converter(campo) if campo != '' else None
+                         for converter, campo in zip(conversoes, linha)])
+            if len(lote) >= tamanho_lote:
+                inseridas += conn.executemany(sql, lote).rowcount
+                lote = []
+        if lote:
+            inseridas += conn.executemany(sql, lote).rowcount
+    return inseridas
+
+
+def restaurar_backup(pasta: str, destino: str, ate: Optional[int] = None,
+                     progresso: Optional[Progresso] = None) -> Dict[str, Any]:
+    """
+    Restaura o último backup completo da pasta (até a entrada `ate` do
+    catálogo, se informada) e aplica os incrementais feitos depois dele, em
+    ordem. Os resumos do período recebido dos incrementais são recalculados.
+    O destino é sobrescrito e não deve estar em uso.
+
+    Args:
+        pasta: Pasta dos backups
+        destino: Caminho do banco restaurado (partições vão para o mesmo diretório)
+        ate: Índice da última entrada do catálogo a aplicar (None = todas)
+        progresso: Chamado com (páginas copiadas, total) na cópia do backup completo
+
+    Returns:
+        Dicionário com o backup completo usado, incrementais aplicados e linhas inseridas
+    """
+    entradas = _ler_catalogo(pasta)['backups']
+    if ate is not None:
+        entradas = entradas[:ate + 1]
+    completos = [indice for indice, entrada in enumerate(entradas) if entrada['tipo'] == 'completo']
+    if not completos:
+        raise ValueError(f"Nenhum backup completo em {pasta}")
+    base = entradas[completos[-1]]
+    incrementais = entradas[completos[-1] + 1:]
+
+    for sufixo in ('-wal', '-shm'):
+        if os.path.exists(destino + sufixo):
+            os.remove(destino + sufixo)
+    origem = _abrir_somente_leitura(os.path.join(pasta, base['arquivo']))
+    try:
+        copiar_banco(origem, destino, progresso=progresso)
+    finally:
+        origem.close()
+    for particao in base['particoes']:
+        origem = _abrir_somente_leitura(os.path.join(pasta, particao))
+        try:
+            copiar_banco(origem, os.path.join(os.path.dirname(destino), os.path.basename(particao)))
+        finally:
+            origem.close()
+
+    resultado = {'completo': base['arquivo'], 'incrementais': len(incrementais), 'linhas': 0}
+    if not incrementais:
+        return resultado
+    conn = sqlite3.connect(destino)
+    try:
+        for entrada in incrementais:
+            for arquivo in entrada['arquivos']:
+                caminho = os.path.join(pasta, arquivo)
+                if entrada['formato'] == 'sql':
+                    antes = conn.total_changes
+                    with open(caminho, encoding='utf-8') as script:
+                        conn.executescript(script.read())
+                    resultado['linhas'] += conn.total_changes - antes
+                else:
+                    tabela = next(t for t in TABELAS_INCREMENTAIS if arquivo.endswith(f"_{t}.csv"))
+                    with conn:
+                        resultado['linhas'] += _aplicar_csv(conn, caminho, tabela)
+        primeira = conn.execute('SELECT MIN(data_hora) FROM leituras_sensores WHERE id > ?',
+                                (base['ultimo_id'].get('leituras_sensores', 0),)).fetchone()[0]
+    finally:
+        conn.close()
+
+    # As linhas entraram por SQL direto: os resumos do período são recalculados
+    if primeira is not None:
+        with BancoDadosAgricola(destino) as bd:
+            bd.reconstruir_resumos(primeira)
+    return resultado
+
+
+def _mostrar_progresso(feito: int, total: int) -> None:
+    print(f"\r  {feito:>12,} / {total:,} ({feito / max(total, 1):.0%})", end='', flush=True)
+    if feito >= total:
+        print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backup do banco de leituras com a ingestão em andamento")
+    parser.add_argument("acao", choices=['completo', 'incremental', 'restaurar'])
+    parser.add_argument("--banco", default="dados_agricolas.db")
+    parser.add_argument("--pasta", default="backups")
+    parser.add_argument("--formato", choices=['sql', 'csv'], default='sql', help="Formato do incremental")
+    parser.add_argument("--paginas", type=int, default=1024, help="Páginas copiadas por passo")
+    parser.add_argument("--pausa", type=float, default=0.0, help="Segundos entre os passos")
+    parser.add_argument("--particionado", action="store_true")
+    parser.add_argument("--destino", help="Banco restaurado (restaurar)")
+    parser.add_argument("--ate", type=int, default=None, help="Última entrada do catálogo a restaurar")
+    args = parser.parse_args()
+
+    if args.acao == 'restaurar':
+        if not args.destino:
+            sys.exit("Informe --destino para restaurar")
+        resultado = restaurar_backup(args.pasta, args.destino, args.ate, _mostrar_progresso)
+        print(f"Restaurado {resultado['completo']} + {resultado['incrementais']} incrementais "
+              f"({resultado['linhas']} linhas) em {args.destino}")
+    else:
+        with BancoDadosAgricola(args.banco, particionado=args.particionado) as bd:
+            if args.acao == 'completo':
+                entrada = backup_completo(bd, args.pasta, args.paginas, args.pausa, _mostrar_progresso)
+                print(f"Backup completo {entrada['arquivo']}: {entrada['paginas']} páginas em "
+                      f"{entrada['segundos']}s ({entrada['reinicios']} reinícios)")
+            else:
+                entrada = backup_incremental(bd, args.pasta, args.formato, progresso=_mostrar_progresso)
+                print(f"Backup incremental {', '.join(entrada['arquivos'])}: {entrada['linhas']}")
@@ -0,0 +1,301 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import sqlite3
+import platform
+import argparse
+import datetime
+import tempfile
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from banco_dados_agricola import BancoDadosAgricola
+from arquivo_colunar import ArquivoColunar
+from gerador_dados import GeradorLeituras, COLUNAS_GERADAS
+
+# Sufixo da métrica -> True se valores maiores são melhores
+SENTIDO_METRICAS = {
+    '_por_s': True,
+    '_ms': False,
+    '_s': False,
+    '_mb': False,
+    '_vezes': True,
+}
+
+
+def _percentil(valores: List[float], p: float) -> float:
+    return float(np.percentile(valores, p)) if valores else 0.0
+
+
+def _cronometrar(funcao) -> float:
+    inicio = time.perf_counter()
+    funcao()
+    return time.perf_counter() - inicio
+
+
+def _carregar_dataframe(bd: BancoDadosAgricola) -> pd.DataFrame:
+    """Carrega as leituras em um DataFrame com data_hora convertida, como o painel."""
+    return bd.obter_leituras_batch(COLUNAS_GERADAS).para_dataframe()
+
+
+def medir_tamanho(tamanho: int, pasta: str, perfil: str = "balanced", semente: int = 42,
+                  operacoes: int = 1000, consultas: int = 20,
+                  limite_leitura_completa: int = 1_000_000,
+                  data_hora_epoch: bool = False) -> Dict[str, float]:
+    """
+    Mede as operações do BancoDadosAgricola em um banco novo com `tamanho` leituras.
+
+    Args:
+        tamanho: Leituras no banco
+        pasta: Diretório dos arquivos temporários
+        perfil: Perfil de desempenho do banco
+        semente: Semente dos dados gerados e das escolhas aleatórias
+        operacoes: Quantidade de inserções unitárias, atualizações e exclusões medidas
+        consultas: Quantidade de consultas por período medidas
+        limite_leitura_completa: Acima disso obter_todas_leituras (lista em memória)
+            e a carga em DataFrame não são medidas; a leitura completa por
+            iterar_leituras é sempre medida
+        data_hora_epoch: Grava data_hora em epoch (ms) em vez de texto ISO
+
+    Returns:
+        Dicionário métrica -> valor
+    """
+    caminho = os.path.join(pasta, f"benchmark_{tamanho}.db")
+    for sufixo in ('', '-wal', '-shm'):
+        if os.path.exists(caminho + sufixo):
+            os.remove(caminho + sufixo)
+
+    sorteio = random.Random(semente)
+    resultado = {}
+    gerador = GeradorLeituras(semente, dispositivos=4, intervalo_s=10.0)
+
+    with BancoDadosAgricola(caminho, perfil=perfil, data_hora_epoch=data_hora_epoch) as bd:
+        # Ingestão em lote: só o tempo de gravação (a geração fica fora)
+        tempo_lote = 0.0
+        for dados in gerador.lotes(tamanho, 100_000):
+            if data_hora_epoch:
+                datas = gerador.epoch_ms(dados['data_hora']).tolist()
+            else:
+                datas = np.datetime_as_string(dados['data_hora'], unit='us').tolist()
+            registros = list(zip(datas, *(dados[nome].tolist() for nome in COLUNAS_GERADAS[1:])))
+            tempo_lote += _cronometrar(lambda: bd.inserir_leituras_em_lote(registros, COLUNAS_GERADAS))
+        resultado['ingestao_lote_linhas_por_s'] = tamanho / tempo_lote
+
+        # Reenvio do último lote: tudo repete (dispositivo, sequencia) e é ignorado
+        tempo_reenvio = _cronometrar(lambda: bd.inserir_leituras_em_lote(registros, COLUNAS_GERADAS))
+        resultado['reenvio_lote_linhas_por_s'] = len(registros) / tempo_reenvio
+        bd.checkpoint('TRUNCATE')
+        resultado['tamanho_banco_mb'] = os.path.getsize(caminho) / 1024 ** 2
+
+        # Ingestão unitária (um commit por leitura); as linhas são removidas depois
+        unitarias = min(operacoes, tamanho)
+        ids_unitarios = []
+        tempo_unitario = _cronometrar(lambda: ids_unitarios.extend(
+            bd.inserir_leitura(umidade=50.0, ph=6.5, fosforo=1, potassio=0, status_bomba=0)
+            for _ in range(unitarias)
+        ))
+        resultado['ingestao_unitaria_linhas_por_s'] = unitarias / tempo_unitario
+        for id_leitura in ids_unitarios:
+            bd.deletar_leitura(id_leitura)
+
+        # Leitura completa
+        tempo_iterar = _cronometrar(lambda: sum(1 for _ in bd.iterar_leituras(tipo_linha='tupla')))
+        resultado['iterar_leituras_linhas_por_s'] = tamanho / tempo_iterar
+        if tamanho <= limite_leitura_completa:
+            resultado['obter_todas_leituras_s'] = _cronometrar(bd.obter_todas_leituras)
+            resultado['obter_leituras_batch_s'] = _cronometrar(bd.obter_leituras_batch)
+            resultado['carregar_dataframe_s'] = _cronometrar(lambda: _carregar_dataframe(bd))
+
+        # Arquivo colunar: exportação e abertura de todas as leituras (arrays mapeados)
+        pasta_colunar = os.path.join(pasta, f"benchmark_{tamanho}_colunar")
+        shutil.rmtree(pasta_colunar, ignore_errors=True)
+        resultado['exportar_colunar_s'] = _cronometrar(lambda: bd.exportar_para_colunar(pasta_colunar))
+        resultado['abrir_colunar_ms'] = 1000 * _cronometrar(lambda: ArquivoColunar(pasta_colunar).ler())
+        shutil.rmtree(pasta_colunar)
+
+        # Consultas por período: uma janela de 1 dia, primeira página (1000 linhas)
+        primeira, ultima = bd.obter_intervalo_datas()
+        dias = max((ultima - primeira).days, 1)
+        latencias = []
+        for _ in range(consultas):
+            inicio = primeira + datetime.timedelta(days=sorteio.randrange(dias))
+            latencias.append(1000 * _cronometrar(
+                lambda: bd.obter_leituras_periodo(inicio, inicio + datetime.timedelta(days=1))
+            ))
+        resultado['consulta_periodo_p50_ms'] = _percentil(latencias, 50)
+        resultado['consulta_periodo_p95_ms'] = _percentil(latencias, 95)
+
+        # Última leitura de um dispositivo (índice dispositivo, data_hora)
+        latencias = [1000 * _cronometrar(lambda: bd.obter_ultima_leitura(sorteio.randrange(gerador.dispositivos)))
+                     for _ in range(consultas)]
+        resultado['ultima_leitura_dispositivo_p50_ms'] = _percentil(latencias, 50)
+
+        # Atualizações e exclusões unitárias por ID. Cada etapa de exclusão remove no
+        # máximo um décimo da tabela: a exportação e a importação medem uma tabela cheia.
+        # Os IDs são sorteados (fora da medição) entre os existentes: não são 1..N no
+        # modo particionado nem depois de exclusões e da retenção
+        existentes = bd.obter_leituras_batch(['id'], tamanho_lote=100_000).valores('id')
+        quantidade = min(operacoes, tamanho // 10)
+        sorteados = sorteio.sample(existentes, quantidade + min(10 * operacoes, tamanho // 10))
+        del existentes
+        ids = sorteados[:quantidade]
+        tempo_atualizar = _cronometrar(lambda: [
+            bd.atualizar_leitura(id_leitura, observacoes="benchmark") for id_leitura in ids
+        ])
+        resultado['atualizar_leitura_ops_por_s'] = len(ids) / tempo_atualizar
+        tempo_deletar = _cronometrar(lambda: [bd.deletar_leitura(id_leitura) for id_leitura in ids])
+        resultado['deletar_leitura_ops_por_s'] = len(ids) / tempo_deletar
+
+        # Atualização e exclusão em lote (ex.: previsões do modelo gravadas de volta)
+        lote = sorteados[quantidade:]
+        previsoes = {id_leitura: {'previsao_irrigacao': 1, 'confianca_previsao': 0.9} for id_leitura in lote}
+        tempo_atualizar = _cronometrar(lambda: bd.atualizar_leituras_em_lote(previsoes))
+        resultado['atualizar_lote_linhas_por_s'] = len(lote) / tempo_atualizar
+        tempo_deletar = _cronometrar(lambda: bd.deletar_leituras(lote))
+        resultado['deletar_lote_linhas_por_s'] = len(lote) / tempo_deletar
+
+        # Exportação CSV
+        caminho_csv = os.path.join(pasta, f"benchmark_{tamanho}.csv")
+        resultado['exportar_csv_s'] = _cronometrar(lambda: bd.exportar_para_csv(caminho_csv))
+
+    # Importação do CSV exportado em um banco novo (conversão em paralelo, um escritor)
+    caminho_importado = os.path.join(pasta, f"benchmark_{tamanho}_importado.db")
+    with BancoDadosAgricola(caminho_importado, perfil=perfil, data_hora_epoch=data_hora_epoch) as bd:
+        importacao = bd.importar_de_csv(caminho_csv)
+        resultado['importar_csv_linhas_por_s'] = importacao['linhas_por_s']
+    os.remove(caminho_csv)
+
+    # Importação do monitor serial em um banco novo: linha a linha (importar_do_serial,
+    # um commit por linha) e em lote (importar_do_serial_em_lote), com o último lote gerado
+    linhas_serial = [
+        f"{umidade:.2f},{ph:.2f},{'SIM' if fosforo else 'NAO'},{'SIM' if potassio else 'NAO'},{bomba}"
+        for umidade, ph, fosforo, potassio, bomba in zip(
+            dados['umidade'].tolist(), dados['ph'].tolist(), dados['fosforo'].tolist(),
+            dados['potassio'].tolist(), dados['status_bomba'].tolist())
+    ]
+    caminho_serial = os.path.join(pasta, f"benchmark_{tamanho}_serial.db")
+    with BancoDadosAgricola(caminho_serial, perfil=perfil, data_hora_epoch=data_hora_epoch) as bd:
+        unitarias = min(operacoes, len(linhas_serial))
+        tempo_linha = _cronometrar(lambda: bd.importar_do_serial(linhas_serial[:unitarias]))
+        resultado['importar_serial_linhas_por_s'] = unitarias / tempo_linha
+        tempo_lote = _cronometrar(lambda: bd.importar_do_serial_em_lote(linhas_serial))
+        resultado['importar_serial_lote_linhas_por_s'] = len(linhas_serial) / tempo_lote
+        resultado['importar_serial_ganho_lote_vezes'] = (resultado['importar_serial_lote_linhas_por_s']
+                                                         / resultado['importar_serial_linhas_por_s'])
+
+    for banco in (caminho, caminho_importado, caminho_serial):
+        for sufixo in ('', '-wal', '-shm'):
+            if os.path.exists(banco + sufixo):
+                os.remove(banco + sufixo)
+    return resultado
+
+
+def executar_benchmark(tamanhos: List[int], pasta: Optional[str] = None,
+                       perfil: str = "balanced", semente: int = 42,
+                       data_hora_epoch: bool = False) -> Dict[str, Any]:
+    """
+    Executa o benchmark para cada tamanho de banco.
+
+    Returns:
+        Dicionário com 'metadados' do ambiente e 'resultados' por tamanho
+    """
+    metadados = {
+        'data': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'plataforma': platform.platform(),
+        'perfil': perfil,
+        'semente': semente,
+        'data_hora': 'epoch_ms' if data_hora_epoch else 'texto',
+    }
+    resultados = {}
+    with tempfile.TemporaryDirectory(dir=pasta) as temporaria:
+        for tamanho in tamanhos:
+            print(f"Medindo {tamanho} leituras...")
+            resultados[str(tamanho)] = medir_tamanho(tamanho, temporaria, perfil, semente,
+                                                     data_hora_epoch=data_hora_epoch)
+    return {'metadados': metadados, 'resultados': resultados}
+
+
+def _maior_e_melhor(metrica: str) -> bool:
+    for sufixo, maior_melhor in SENTIDO_METRICAS.items():
+        if metrica.endswith(sufixo):
+            return maior_melhor
+    raise ValueError(f"Métrica sem sentido conhecido: {metrica}")
+
+
+def comparar_com_base(atual: Dict[str, Any], base: Dict[str, Any],
+                      tolerancia: float = 0.2) -> List[Dict[str, Any]]:
+    """
+    Compara os resultados com uma execução de referência.
+
+    Args:
+        atual: Resultado de executar_benchmark
+        base: Resultado salvo anteriormente
+        tolerancia: Piora relativa aceita antes de marcar regressão (0.2 = 20%)
+
+    Returns:
+        Lista de comparações (tamanho, métrica, base, atual, variação, regressao)
+    """
+    comparacoes = []
+    for tamanho, metricas in atual['resultados'].items():
+        referencia = base.get('resultados', {}).get(tamanho, {})
+        for metrica, valor in metricas.items():
+            valor_base = referencia.get(metrica)
+            if not valor_base:
+                continue
+            variacao = (valor - valor_base) / valor_base
+            piora = -variacao if _maior_e_melhor(metrica) else variacao
+            comparacoes.append({
+                'tamanho': tamanho,
+                'metrica': metrica,
+                'base': valor_base,
+                'atual': valor,
+                'variacao': variacao,
+                'regressao': piora > tolerancia,
+            })
+    return comparacoes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark da camada de armazenamento")
+    parser.add_argument("--tamanhos", default="10000,1000000",
+                        help="Tamanhos do banco separados por vírgula (ex.: 10000,1000000,10000000)")
+    parser.add_argument("--perfil", default="balanced")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--pasta", default=None, help="Diretório dos bancos temporários")
+    parser.add_argument("--saida", default="benchmark_resultados.json")
+    parser.add_argument("--base", default=None, help="JSON de referência para comparação")
+    parser.add_argument("--tolerancia", type=float, default=0.2)
+    parser.add_argument("--epoch", action="store_true",
+                        help="data_hora em epoch (ms); compare com --base de uma execução em texto")
+    args = parser.parse_args()
+
+    tamanhos = [int(t) for t in args.tamanhos.split(',')]
+    atual = executar_benchmark(tamanhos, args.pasta, args.perfil, args.semente, args.epoch)
+    with open(args.saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(atual, arquivo, indent=2, ensure_ascii=False)
+    print(f"Resultados salvos em {args.saida}")
+
+    for tamanho, metricas in atual['resultados'].items():
+        print(f"\n{tamanho} leituras:")
+        for metrica, valor in metricas.items():
+            print(f"  {metrica:<34} {valor:>14,.2f}")
+
+    if args.base:
+        with open(args.base, encoding='utf-8') as arquivo:
+            base = json.load(arquivo)
+        comparacoes = comparar_com_base(atual, base, args.tolerancia)
+        regressoes = [c for c in comparacoes if c['regressao']]
+        print(f"\nComparação com {args.base} (tolerância {args.tolerancia:.0%}):")
+        for c in comparacoes:
+            marca = "REGRESSÃO" if c['regressao'] else "ok"
+            print(f"  {c['tamanho']:>10} {c['metrica']:<34} {c['variacao']:>+8.1%}  {marca}")
+        if regressoes:
+            print(f"\n{len(regressoes)} regressões encontradas.")
+            sys.exit(1)
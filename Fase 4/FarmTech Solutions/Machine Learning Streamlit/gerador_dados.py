@@ -0,0 +1,201 @@
+import sys
+import time
+import argparse
+import datetime
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+
+from banco_dados_agricola import BancoDadosAgricola
+from protocolo_binario import montar_quadros, epoch_de_hora_local
+
+# Colunas de cada lote gerado, na ordem usada pelas saídas
+COLUNAS_GERADAS = ('data_hora', 'dispositivo', 'sequencia', 'umidade', 'ph', 'fosforo', 'potassio',
+                   'status_bomba')
+
+
+class GeradorLeituras:
+    """
+    Gerador vetorizado (NumPy) de leituras simuladas para testes de capacidade.
+
+    Cada dispositivo tem uma umidade média e um pH próprios; a umidade segue um
+    ciclo diário (máxima de madrugada, mínima no meio da tarde) com ruído, e a
+    bomba liga quando a umidade fica abaixo de 40%, como no firmware. As leituras
+    dos dispositivos se intercalam a cada `intervalo_s` segundos. A sequência
+    é o contador de envio de cada dispositivo.
+
+    Com a mesma semente e o mesmo tamanho de lote, os dados são idênticos.
+    """
+
+    def __init__(self, semente: int = 42, dispositivos: int = 4,
+                 inicio: Optional[datetime.datetime] = None, intervalo_s: float = 60.0,
+                 npk: str = 'binario'):
+        """
+        Args:
+            semente: Semente do gerador aleatório
+            dispositivos: Quantidade de ESP32 simulados
+            inicio: Horário da primeira leitura (padrão: 00:00 de 30 dias atrás)
+            intervalo_s: Intervalo entre leituras de um mesmo dispositivo
+            npk: 'binario' (0/1, esquema da Fase 4) ou 'nivel' (0-100, Fase 3)
+        """
+        if npk not in ('binario', 'nivel'):
+            raise ValueError("npk deve ser 'binario' ou 'nivel'")
+        if inicio is None:
+            hoje = datetime.datetime.combine(datetime.date.today(), datetime.time())
+            inicio = hoje - datetime.timedelta(days=30)
+
+        self.semente = semente
+        self.dispositivos = dispositivos
+        self.inicio = np.datetime64(inicio, 'us')
+        self.intervalo_us = int(intervalo_s * 1_000_000)
+        self.npk = npk
+
+        perfil = np.random.default_rng(semente)
+        self._umidade_media = perfil.uniform(45.0, 65.0, dispositivos)
+        self._ph_medio = perfil.uniform(5.5, 7.2, dispositivos)
+
+    def lote(self, primeira_linha: int, quantidade: int) -> Dict[str, np.ndarray]:
+        """
+        Gera `quantidade` leituras a partir da linha `primeira_linha`.
+
+        Returns:
+            Dicionário coluna -> array, com as chaves de COLUNAS_GERADAS
+        """
+        rng = np.random.default_rng([self.semente, primeira_linha])
+        linhas = np.arange(primeira_linha, primeira_linha + quantidade, dtype=np.int64)
+        dispositivo = (linhas % self.dispositivos).astype(np.uint16)
+        ciclo = linhas // self.dispositivos
+
+        # Pequeno atraso por leitura, menor que o intervalo, para não repetir horários
+        atraso = rng.integers(0, max(self.intervalo_us // 4, 1), quantidade)
+        data_hora = self.inicio + (ciclo * self.intervalo_us + atraso).astype('timedelta64[us]')
+
+        hora = (data_hora - data_hora.astype('datetime64[D]')).astype(np.int64) / 3.6e9
+        umidade = (self._umidade_media[dispositivo]
+                   + 18.0 * np.cos(2 * np.pi * (hora - 5.0) / 24.0)
+                   + rng.normal(0.0, 4.0, quantidade))
+        umidade = np.round(np.clip(umidade, 5.0, 98.0), 1)
+        ph = np.round(np.clip(self._ph_medio[dispositivo] + rng.normal(0.0, 0.15, quantidade), 4.0, 8.5), 1)
+
+        if self.npk == 'binario':
+            fosforo = (rng.random(quantidade) < 0.6).astype(np.int8)
+            potassio = (rng.random(quantidade) < 0.6).astype(np.int8)
+        else:
+            fosforo = rng.integers(0, 101, quantidade, dtype=np.int16)
+            potassio = rng.integers(0, 101, quantidade, dtype=np.int16)
+
+        return {
+            'data_hora': data_hora,
+            'dispositivo': dispositivo,
+            'sequencia': ciclo,
+            'umidade': umidade,
+            'ph': ph,
+            'fosforo': fosforo,
+            'potassio': potassio,
+            'status_bomba': (umidade < 40.0).astype(np.int8),
+        }
+
+    def lotes(self, total: int, tamanho_lote: int = 100_000) -> Iterator[Dict[str, np.ndarray]]:
+        """Gera `total` leituras em lotes de até `tamanho_lote`."""
+        for primeira in range(0, total, tamanho_lote):
+            yield self.lote(primeira, min(tamanho_lote, total - primeira))
+
+    def epoch_ms(self, data_hora: np.ndarray) -> np.ndarray:
+        """Converte a coluna data_hora (hora local) de um lote em epoch (ms), com o fuso de cada horário."""
+        return epoch_de_hora_local(data_hora)
+
+    # --- Saídas ---
+
+    def para_sqlite(self, bd: BancoDadosAgricola, total: int, tamanho_lote: int = 100_000) -> int:
+        """
+        Grava as leituras no banco com inserir_leituras_em_lote (uma transação por lote).
+        Só vão as colunas que a tabela do banco tem: funciona também com o
+        BancoDadosAgricola da Fase 3 (sem dispositivo e sequencia), usando npk='nivel'.
+        Em um banco com data_hora em epoch, os horários já vão em milissegundos.
+
+        Returns:
+            Número de leituras gravadas
+        """
+        with bd.conexao_leitura() as conn:
+            existentes = {linha[1] for linha in conn.execute('PRAGMA main.table_info(leituras_sensores)')}
+        colunas_banco = tuple(nome for nome in COLUNAS_GERADAS if nome in existentes)
+        gravadas = 0
+        for dados in self.lotes(total, tamanho_lote):
+            if bd.data_hora_epoch:
+                colunas = [self.epoch_ms(dados['data_hora']).tolist()]
+            else:
+                colunas = [np.datetime_as_string(dados['data_hora'], unit='us').tolist()]
+            colunas += [dados[nome].tolist() for nome in colunas_banco[1:]]
+            gravadas += len(bd.inserir_leituras_em_lote(zip(*colunas), colunas_banco))
+        return gravadas
+
+    def para_csv(self, caminho: str, total: int, tamanho_lote: int = 100_000) -> int:
+        """
+        Escreve as leituras em CSV (cabeçalho COLUNAS_GERADAS), lote a lote.
+        Cada lote vai direto dos arrays para o arquivo com DataFrame.to_csv,
+        sem montar as linhas em Python; só a data_hora é formatada antes
+        (ISO com 'T', como no banco, pelo NumPy).
+
+        Returns:
+            Número de leituras escritas
+        """
+        # pandas só é necessário aqui
+        import pandas as pd
+
+        escritas = 0
+        with open(caminho, 'w', encoding='utf-8', newline='') as arquivo:
+            arquivo.write(','.join(COLUNAS_GERADAS) + '\n')
+            for dados in self.lotes(total, tamanho_lote):
+                colunas = dict(dados, data_hora=np.datetime_as_string(dados['data_hora'], unit='us'))
+                pd.DataFrame(colunas, columns=list(COLUNAS_GERADAS), copy=False).to_csv(
+                    arquivo, header=False, index=False, lineterminator='\n'
+                )
+                escritas += len(dados['data_hora'])
+        return escritas
+
+    def para_binario(self, caminho: str, total: int, tamanho_lote: int = 100_000) -> int:
+        """
+        Escreve as leituras como quadros do protocolo_binario, sem passar por
+        objetos Python. O horário local é convertido em epoch pelo fuso de cada leitura.
+
+        Returns:
+            Número de quadros escritos
+        """
+        if self.npk != 'binario':
+            raise ValueError("O quadro binário só representa fósforo/potássio como presença (npk='binario')")
+        escritas = 0
+        with open(caminho, 'wb') as arquivo:
+            for dados in self.lotes(total, tamanho_lote):
+                quadros = montar_quadros(dados['dispositivo'], dados['sequencia'],
+                                         self.epoch_ms(dados['data_hora']), dados['umidade'], dados['ph'],
+                                         dados['fosforo'], dados['potassio'], dados['status_bomba'])
+                quadros.tofile(arquivo)
+                escritas += len(quadros)
+        return escritas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera leituras simuladas em massa")
+    parser.add_argument("destino", help="Arquivo .db, .csv ou .bin")
+    parser.add_argument("--linhas", type=int, default=1_000_000)
+    parser.add_argument("--dispositivos", type=int, default=4)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--intervalo", type=float, default=60.0, help="Segundos entre leituras de um dispositivo")
+    parser.add_argument("--lote", type=int, default=100_000)
+    parser.add_argument("--npk", choices=['binario', 'nivel'], default='binario')
+    parser.add_argument("--epoch", action="store_true", help="Banco novo com data_hora em epoch (ms)")
+    args = parser.parse_args()
+
+    gerador = GeradorLeituras(args.semente, args.dispositivos, intervalo_s=args.intervalo, npk=args.npk)
+    inicio = time.perf_counter()
+    if args.destino.endswith('.csv'):
+        total = gerador.para_csv(args.destino, args.linhas, args.lote)
+    elif args.destino.endswith('.bin'):
+        total = gerador.para_binario(args.destino, args.linhas, args.lote)
+    elif args.destino.endswith('.db'):
+        with BancoDadosAgricola(args.destino, perfil="ingest", data_hora_epoch=args.epoch) as bd:
+            total = gerador.para_sqlite(bd, args.linhas, args.lote)
+    else:
+        sys.exit("Destino deve terminar em .db, .csv ou .bin")
+    duracao = time.perf_counter() - inicio
+    print(f"{total} leituras geradas em {duracao:.1f}s ({total / duracao:,.0f} leituras/s) -> {args.destino}")
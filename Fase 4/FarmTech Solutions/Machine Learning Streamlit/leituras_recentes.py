@@ -0,0 +1,181 @@
+import heapq
+import threading
+from collections import deque
+from typing import Dict, Any, List, Optional, Iterable, Sequence, Set
+
+
+class LeiturasRecentes:
+    """
+    Buffer circular em memória com as `tamanho` leituras mais recentes (por
+    data_hora) de cada dispositivo, na frente do SQLite.
+
+    O BancoDadosAgricola preenche o buffer ao abrir e a cada gravação; as
+    consultas de "última leitura", "últimas N" e "variação desde a anterior"
+    são respondidas daqui, sem acessar o disco. Cada buffer fica em ordem de
+    data_hora: leituras que chegam em ordem entram no fim em O(1) e a mais
+    antiga sai sozinha; as atrasadas são encaixadas na posição certa.
+
+    Seguro para uso por várias threads (ex.: pool de leitores do Streamlit).
+    """
+
+    def __init__(self, tamanho: int = 32, medidas: Sequence[str] = ('umidade', 'ph', 'fosforo', 'potassio')):
+        """
+        Args:
+            tamanho: Leituras guardadas por dispositivo (0 desativa o buffer)
+            medidas: Campos comparados por variacao()
+        """
+        self.tamanho = tamanho
+        self.medidas = tuple(medidas)
+        self._buffers = {}
+        self._trava = threading.Lock()
+
+    def _buffer(self, dispositivo: int) -> deque:
+        buffer = self._buffers.get(dispositivo)
+        if buffer is None:
+            buffer = self._buffers[dispositivo] = deque(maxlen=self.tamanho)
+        return buffer
+
+    def _encaixar(self, buffer: deque, leitura: Dict[str, Any]) -> None:
+        """Coloca a leitura na posição de data_hora (deve ser chamado com a trava)."""
+        data_hora = leitura['data_hora']
+        if not buffer or data_hora >= buffer[-1]['data_hora']:
+            buffer.append(leitura)
+            return
+        if len(buffer) == self.tamanho:
+            if data_hora < buffer[0]['data_hora']:
+                return
+            buffer.popleft()
+        posicao = len(buffer)
+        while posicao > 0 and buffer[posicao - 1]['data_hora'] > data_hora:
+            posicao -= 1
+        buffer.insert(posicao, leitura)
+
+    def adicionar(self, dispositivo: int, leitura: Dict[str, Any]) -> None:
+        """Registra uma leitura gravada (dicionário com as colunas da tabela)."""
+        if self.tamanho <= 0:
+            return
+        with self._trava:
+            self._encaixar(self._buffer(dispositivo), leitura)
+
+    def adicionar_lote(self, dispositivos: Sequence[int], datas: Sequence[Any],
+                       montar) -> None:
+        """
+        Registra um lote gravado sem montar uma leitura por linha: só as
+        `tamanho` mais recentes de cada dispositivo viram dicionários.
+
+        Args:
+            dispositivos: Dispositivo de cada linha do lote
+            datas: data_hora de cada linha, no formato das leituras do buffer
+            montar: Função posição -> leitura (dicionário)
+        """
+        if self.tamanho <= 0 or not datas:
+            return
+        posicoes = {}
+        for posicao, dispositivo in enumerate(dispositivos):
+            posicoes.setdefault(dispositivo, []).append(posicao)
+        escolhidas = {
+            dispositivo: heapq.nlargest(self.tamanho, lista, key=datas.__getitem__)
+            for dispositivo, lista in posicoes.items()
+        }
+        with self._trava:
+            for dispositivo, lista in escolhidas.items():
+                buffer = self._buffer(dispositivo)
+                for posicao in reversed(lista):
+                    self._encaixar(buffer, montar(posicao))
+
+    def substituir(self, dispositivo: int, leituras: Iterable[Dict[str, Any]]) -> None:
+        """Troca o buffer de um dispositivo (leituras da mais antiga à mais recente)."""
+        with self._trava:
+            buffer = self._buffers[dispositivo] = deque(maxlen=self.tamanho)
+            for leitura in leituras:
+                self._encaixar(buffer, leitura)
+            if not buffer:
+                del self._buffers[dispositivo]
+
+    def limpar(self) -> None:
+        """Esvazia o buffer de todos os dispositivos."""
+        with self._trava:
+            self._buffers.clear()
+
+    def atualizar(self, id_leitura: int, campos: Dict[str, Any]) -> bool:
+        """
+        Aplica uma atualização à leitura, se ela estiver no buffer. Não vale
+        para data_hora nem dispositivo, que mudam a posição da leitura.
+
+        Returns:
+            True se a leitura estava no buffer
+        """
+        return self.atualizar_lote({id_leitura: campos}) > 0
+
+    def atualizar_lote(self, atualizacoes: Dict[int, Dict[str, Any]]) -> int:
+        """
+        Aplica várias atualizações (ID -> campos) percorrendo o buffer uma
+        única vez. As mesmas restrições de atualizar() valem aqui.
+
+        Returns:
+            Quantidade de leituras do buffer atualizadas
+        """
+        atualizadas = 0
+        with self._trava:
+            for buffer in self._buffers.values():
+                for leitura in buffer:
+                    campos = atualizacoes.get(leitura['id'])
+                    if campos is not None:
+                        leitura.update(campos)
+                        atualizadas += 1
+        return atualizadas
+
+    def contem(self, id_leitura: int) -> Optional[int]:
+        """Retorna o dispositivo cujo buffer tem a leitura `id_leitura`, ou None."""
+        with self._trava:
+            for dispositivo, buffer in self._buffers.items():
+                if any(leitura['id'] == id_leitura for leitura in buffer):
+                    return dispositivo
+        return None
+
+    def dispositivos_de(self, ids: Iterable[int]) -> Set[int]:
+        """Dispositivos cujos buffers têm alguma das leituras `ids`."""
+        ids = set(ids)
+        with self._trava:
+            return {dispositivo for dispositivo, buffer in self._buffers.items()
+                    if any(leitura['id'] in ids for leitura in buffer)}
+
+    def dispositivos(self) -> List[int]:
+        """Dispositivos com leituras no buffer, em ordem."""
+        with self._trava:
+            return sorted(self._buffers)
+
+    def ultima(self, dispositivo: int = 0) -> Optional[Dict[str, Any]]:
+        """Leitura mais recente do dispositivo, ou None."""
+        with self._trava:
+            buffer = self._buffers.get(dispositivo)
+            return dict(buffer[-1]) if buffer else None
+
+    def ultimas(self, quantidade: int = 2, dispositivo: int = 0) -> List[Dict[str, Any]]:
+        """
+        Até `quantidade` leituras mais recentes do dispositivo (limitado ao
+        tamanho do buffer), da mais recente para a mais antiga.
+        """
+        with self._trava:
+            buffer = self._buffers.get(dispositivo, ())
+            quantidade = min(quantidade, len(buffer))
+            return [dict(buffer[-1 - indice]) for indice in range(quantidade)]
+
+    def variacao(self, dispositivo: int = 0) -> Optional[Dict[str, Any]]:
+        """
+        Variação de cada medida da penúltima para a última leitura do dispositivo.
+
+        Returns:
+            Dicionário medida -> diferença (None se faltar o valor em uma das
+            leituras), ou None se o dispositivo tiver menos de duas leituras
+        """
+        with self._trava:
+            buffer = self._buffers.get(dispositivo)
+            if not buffer or len(buffer) < 2:
+                return None
+            ultima, anterior = buffer[-1], buffer[-2]
+        return {
+            medida: (ultima[medida] - anterior[medida]
+                     if ultima.get(medida) is not None and anterior.get(medida) is not None else None)
+            for medida in self.medidas
+        }
@@ -0,0 +1,270 @@
+import re
+import os
+import sys
+import time
+import random
+import tempfile
+from typing import List, Dict, Any, Tuple, Optional, Iterable, Iterator, IO, Union
+
+from banco_dados_agricola import BancoDadosAgricola, converter_linha_serial
+
+# Formatos reconhecidos
+FORMATO_CSV = 'csv'                 # "40.0,6.5,SIM,NAO,0[,obs[,disp,seq]]" (monitor serial / importar_do_serial)
+FORMATO_PLOTTER = 'plotter'         # "Umidade:40.00 pH:6.50 Bomba:1" (printToSerialPlotter)
+FORMATO_EQUIPAMENTO = 'equipamento' # blocos "Temperatura: .. °C / Vibração: .. g / Distância: .. cm"
+
+# Prefixo do "Mostrar timestamp" do monitor serial da IDE Arduino: "12:34:56.789 -> "
+_PREFIXO_ARDUINO = re.compile(r'^\d{2}:\d{2}:\d{2}\.\d{3} -> ')
+
+_PLOTTER = re.compile(r'Umidade:\s*(\S+)\s+pH:\s*(\S+)\s+Bomba:\s*(\d)')
+_VALOR = re.compile(r':\s*(-?[\d.]+|nan|inf|ovf)', re.IGNORECASE)
+
+
+class ParserSerial:
+    """
+    Converte logs do monitor serial dos ESP32 em registros para a ingestão em lote.
+
+    O formato é detectado linha a linha, então logs que misturam as saídas
+    (CSV, Serial Plotter e o monitoramento do Enterprise Challenge) funcionam.
+    O parser guarda estado entre chamadas: um bloco do Enterprise Challenge pode
+    chegar dividido entre dois lotes de linhas.
+
+    Registros de solo seguem a ordem de COLUNAS_SERIAL; os do plotter não têm
+    fósforo/potássio (None). Registros de equipamento seguem
+    COLUNAS_EQUIPAMENTO sem a data_hora.
+    """
+
+    def __init__(self):
+        self.linhas_lidas = 0
+        self.linhas_invalidas = 0
+        self.contagem_formatos = {FORMATO_CSV: 0, FORMATO_PLOTTER: 0, FORMATO_EQUIPAMENTO: 0}
+        self._equipamento = self._bloco_vazio()
+
+    @staticmethod
+    def _bloco_vazio() -> Dict[str, Any]:
+        return {'temperatura': None, 'vibracao': None, 'distancia': None, 'observacoes': []}
+
+    def processar(self, linhas: Iterable[str]) -> Tuple[List[Tuple], List[Tuple]]:
+        """
+        Converte um lote de linhas.
+
+        Args:
+            linhas: Linhas de texto (com ou sem quebra de linha no final)
+
+        Returns:
+            Tupla (registros de solo, registros de equipamento)
+        """
+        solo = []
+        equipamento = []
+        contagem = self.contagem_formatos
+        plotter = _PLOTTER.match
+        bloco = self._equipamento
+        lidas = 0
+        invalidas = 0
+
+        for linha in linhas:
+            lidas += 1
+            linha = linha.strip()
+            if not linha:
+                continue
+            if linha[2:3] == ':' and linha[12:16] == ' -> ':
+                linha = _PREFIXO_ARDUINO.sub('', linha)
+            inicial = linha[0]
+
+            try:
+                # CSV: começa com número
+                if inicial.isdigit() or inicial in '-.':
+                    registro = converter_linha_serial(linha)
+                    if registro is None:
+                        invalidas += 1
+                    else:
+                        solo.append(registro)
+                        contagem[FORMATO_CSV] += 1
+
+                # Serial Plotter
+                elif inicial == 'U':
+                    encontrado = plotter(linha)
+                    if encontrado is None:
+                        invalidas += 1
+                    else:
+                        umidade, ph, bomba = encontrado.groups()
+                        solo.append((float(umidade), float(ph), None, None, int(bomba), "", 0, None))
+                        contagem[FORMATO_PLOTTER] += 1
+
+                # Enterprise Challenge: acumula o bloco até a linha de STATUS
+                elif linha.startswith('Temperatura'):
+                    bloco['temperatura'] = float(_VALOR.search(linha).group(1))
+                elif linha.startswith('Vibra'):
+                    bloco['vibracao'] = float(_VALOR.search(linha).group(1))
+                elif linha.startswith('Dist'):
+                    bloco['distancia'] = float(_VALOR.search(linha).group(1))
+                elif linha.startswith('STATUS:'):
+                    status = linha[7:].split('-', 1)[0].strip()
+                    equipamento.append((bloco['temperatura'], bloco['vibracao'], bloco['distancia'],
+                                        status, "; ".join(bloco['observacoes'])))
+                    contagem[FORMATO_EQUIPAMENTO] += 1
+                    bloco = self._bloco_vazio()
+                elif linha.startswith(('ALERTA', 'Aviso', 'EMERG', 'Falha')):
+                    bloco['observacoes'].append(linha)
+
+                else:
+                    invalidas += 1
+            except (ValueError, IndexError, AttributeError):
+                invalidas += 1
+
+        self._equipamento = bloco
+        self.linhas_lidas += lidas
+        self.linhas_invalidas += invalidas
+        return solo, equipamento
+
+
+def ler_linhas(origem: Union[str, IO], acompanhar: bool = False,
+               espera: float = 0.5) -> Iterator[Optional[str]]:
+    """
+    Lê linhas de um arquivo de log, pty ou porta serial aberta, sem carregar tudo na memória.
+
+    Args:
+        origem: Caminho do arquivo ou objeto com readline() (arquivo, pty, pyserial)
+        acompanhar: Se True, continua esperando novas linhas no fim do arquivo (como tail -f)
+        espera: Intervalo (s) entre verificações quando não há dados novos
+
+    Yields:
+        Linhas lidas. No modo acompanhar, produz None quando fica ocioso,
+        sinalizando que o lote parcial pode ser gravado.
+    """
+    arquivo = open(origem, 'r', encoding='utf-8', errors='replace') if isinstance(origem, str) else origem
+    try:
+        while True:
+            linha = arquivo.readline()
+            if isinstance(linha, bytes):
+                linha = linha.decode('utf-8', errors='replace')
+            if linha:
+                yield linha
+            elif not acompanhar:
+                break
+            else:
+                yield None
+                time.sleep(espera)
+    finally:
+        if isinstance(origem, str):
+            arquivo.close()
+
+
+def importar_log(bd: BancoDadosAgricola, linhas: Iterable[Optional[str]],
+                 tamanho_lote: int = 5000, parser: Optional[ParserSerial] = None) -> Dict[str, Any]:
+    """
+    Lê um log em lotes e grava os registros com a ingestão em lote do banco.
+    Reenviar um log já importado só grava as leituras que faltavam: as que
+    têm dispositivo e sequência já gravados são contadas como duplicadas.
+
+    Args:
+        bd: Banco de destino
+        linhas: Linhas do log (ex.: ler_linhas); None força a gravação do lote parcial
+        tamanho_lote: Linhas convertidas e gravadas por transação
+        parser: Parser a reutilizar (mantém o estado entre chamadas)
+
+    Returns:
+        Dicionário com contagens e a vazão (linhas/s)
+    """
+    parser = parser or ParserSerial()
+    inicio = time.perf_counter()
+    leituras_solo = 0
+    leituras_equipamento = 0
+    duplicadas = bd.leituras_duplicadas
+    lote = []
+
+    def gravar() -> None:
+        nonlocal leituras_solo, leituras_equipamento
+        solo, equipamento = parser.processar(lote)
+        if solo:
+            leituras_solo += len(bd.inserir_leituras_em_lote(solo))
+        if equipamento:
+            leituras_equipamento += len(bd.inserir_leituras_equipamento_em_lote(equipamento))
+        lote.clear()
+
+    for linha in linhas:
+        if linha is None:
+            if lote:
+                gravar()
+            continue
+        lote.append(linha)
+        if len(lote) >= tamanho_lote:
+            gravar()
+    if lote:
+        gravar()
+
+    duracao = time.perf_counter() - inicio
+    return {
+        'linhas_lidas': parser.linhas_lidas,
+        'linhas_invalidas': parser.linhas_invalidas,
+        'formatos': dict(parser.contagem_formatos),
+        'leituras_solo': leituras_solo,
+        'leituras_duplicadas': bd.leituras_duplicadas - duplicadas,
+        'leituras_equipamento': leituras_equipamento,
+        'segundos': duracao,
+        'linhas_por_segundo': parser.linhas_lidas / duracao if duracao > 0 else 0.0,
+    }
+
+
+def gerar_log_exemplo(caminho: str, num_linhas: int) -> None:
+    """
+    Gera um log misturando as três saídas dos ESP32, para o benchmark.
+
+    Args:
+        caminho: Arquivo de saída
+        num_linhas: Quantidade aproximada de linhas
+    """
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        escritas = 0
+        while escritas < num_linhas:
+            umidade = random.uniform(20.0, 90.0)
+            ph = random.uniform(4.0, 8.5)
+            sorteio = random.random()
+            if sorteio < 0.45:
+                arquivo.write(f"Umidade:{umidade:.2f} pH:{ph:.2f} Bomba:{int(umidade < 50)}\n")
+                escritas += 1
+            elif sorteio < 0.9:
+                fosforo = random.choice(['SIM', 'NAO'])
+                potassio = random.choice(['SIM', 'NAO'])
+                arquivo.write(f"{umidade:.1f},{ph:.1f},{fosforo},{potassio},{int(umidade < 40)}\n")
+                escritas += 1
+            else:
+                arquivo.write(f"Temperatura: {random.uniform(30, 80):.2f} °C\n"
+                              f"Vibração: {random.uniform(0, 2):.2f} g\n"
+                              f"Distância: {random.uniform(50, 250):.2f} cm\n"
+                              "STATUS: NORMAL - LED Verde ativado\n")
+                escritas += 4
+
+
+if __name__ == "__main__":
+    # Benchmark: python parser_serial.py [num_linhas]
+    # Para importar um log real: python parser_serial.py --importar caminho.log [banco.db]
+    if len(sys.argv) > 2 and sys.argv[1] == '--importar':
+        nome_bd = sys.argv[3] if len(sys.argv) > 3 else "dados_agricolas.db"
+        with BancoDadosAgricola(nome_bd, perfil="ingest") as bd:
+            print(importar_log(bd, ler_linhas(sys.argv[2])))
+        sys.exit(0)
+
+    num_linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho_log = os.path.join(pasta, "serial.log")
+        print(f"Gerando log com {num_linhas} linhas...")
+        gerar_log_exemplo(caminho_log, num_linhas)
+
+        parser = ParserSerial()
+        inicio = time.perf_counter()
+        with open(caminho_log, encoding='utf-8') as arquivo:
+            while True:
+                bloco = arquivo.readlines(1 << 20)
+                if not bloco:
+                    break
+                parser.processar(bloco)
+        duracao = time.perf_counter() - inicio
+        print(f"Somente conversão: {parser.linhas_lidas / duracao:,.0f} linhas/s "
+              f"({parser.contagem_formatos})")
+
+        with BancoDadosAgricola(os.path.join(pasta, "benchmark.db"), perfil="ingest") as bd:
+            resultado = importar_log(bd, ler_linhas(caminho_log))
+        print(f"Conversão + gravação: {resultado['linhas_por_segundo']:,.0f} linhas/s "
+              f"({resultado['leituras_solo']} leituras de solo, "
+              f"{resultado['leituras_equipamento']} de equipamento)")
@@ -0,0 +1,291 @@
+import io
+import sys
+import time
+import random
+import struct
+import datetime
+from typing import List, Tuple, IO
+
+import numpy as np
+
+from banco_dados_agricola import (BancoDadosAgricola, COLUNAS_SERIAL, BITS_CONTADOR_SEQUENCIA,
+                                  converter_linha_serial)
+
+# Quadro binário de uma leitura (little-endian), com os campos do struct
+# SensorData do firmware mais identificação e tempo. Umidade e pH vão em
+# centésimos (a mesma precisão das 2 casas da linha de texto) e os três
+# booleanos em bits de um byte; os campos ficam alinhados, sem padding. O
+# reinício é o número de boots do dispositivo (guardado na NVS do ESP32), que
+# distingue o contador de envio depois de um reinício (ver chave_sequencia):
+#
+#   struct QuadroSensor {
+#     uint8_t  versao;            // VERSAO_QUADRO
+#     uint8_t  estados;           // bit 0 fósforo, bit 1 potássio, bit 2 bomba
+#     uint16_t dispositivo;       // id do ESP32
+#     uint32_t sequencia;         // contador de envio do dispositivo
+#     uint32_t segundos;          // epoch em s (0 = usar a hora de chegada)
+#     uint16_t milissegundos;     // 0-999
+#     uint16_t umidade;           // humidity * 100 (0-10000)
+#     uint16_t ph;                // phSimulado * 100 (0-1400)
+#     uint16_t reinicio;          // boots do dispositivo (0 = não informado)
+#   };                            // 20 bytes
+VERSAO_QUADRO = 3
+FORMATO_QUADRO = struct.Struct('<BBHIIHHHH')
+TAMANHO_QUADRO = FORMATO_QUADRO.size
+
+# Mesmo layout para decodificação vetorizada com NumPy
+DTYPE_QUADRO = np.dtype([
+    ('versao', '<u1'),
+    ('estados', '<u1'),
+    ('dispositivo', '<u2'),
+    ('sequencia', '<u4'),
+    ('segundos', '<u4'),
+    ('milissegundos', '<u2'),
+    ('umidade', '<u2'),
+    ('ph', '<u2'),
+    ('reinicio', '<u2'),
+])
+
+# Bits do campo estados
+BIT_FOSFORO, BIT_POTASSIO, BIT_BOMBA = 1, 2, 4
+
+# Faixas válidas de umidade (%) e pH; fora delas (ou NaN) o quadro não é montado
+FAIXA_UMIDADE = (0.0, 100.0)
+FAIXA_PH = (0.0, 14.0)
+
+# Colunas gravadas a partir de um quadro (ordem dos registros decodificados).
+# A sequencia gravada (chave da deduplicação de reenvios) é o contador de envio
+# com o reinício, a mesma da linha de texto da mesma leitura.
+COLUNAS_QUADRO = ('data_hora', 'dispositivo', 'sequencia', 'umidade', 'ph', 'fosforo', 'potassio',
+                  'status_bomba')
+
+# As mudanças de fuso (horário de verão) acontecem em horários múltiplos de
+# 15 min: dentro de um bloco de 15 min o deslocamento da hora local é um só
+_BLOCO_FUSO_MS = 15 * 60 * 1000
+
+
+def _deslocamentos_fuso(timestamps_ms: np.ndarray) -> np.ndarray:
+    """Deslocamento (ms) da hora local em relação ao UTC vigente em cada timestamp (epoch em ms)."""
+    blocos, posicoes = np.unique(timestamps_ms // _BLOCO_FUSO_MS, return_inverse=True)
+    deslocamentos = np.array([time.localtime(int(bloco) * _BLOCO_FUSO_MS // 1000).tm_gmtoff
+                              for bloco in blocos], dtype=np.int64)
+    return deslocamentos[posicoes] * 1000
+
+
+def epoch_de_hora_local(data_hora: np.ndarray) -> np.ndarray:
+    """
+    Converte horários locais (datetime64) em epoch (ms), com o fuso vigente em
+    cada horário: um lote pode atravessar a mudança do horário de verão.
+    """
+    locais = data_hora.astype('datetime64[ms]').astype(np.int64)
+    blocos, posicoes = np.unique(locais // _BLOCO_FUSO_MS, return_inverse=True)
+    origem = datetime.datetime(1970, 1, 1)
+    # datetime sem fuso em timestamp(): o Python o interpreta como hora local
+    deslocamentos = np.array([
+        int(bloco) * _BLOCO_FUSO_MS // 1000
+        - int((origem + datetime.timedelta(milliseconds=int(bloco) * _BLOCO_FUSO_MS)).timestamp())
+        for bloco in blocos
+    ], dtype=np.int64)
+    return locais - deslocamentos[posicoes] * 1000
+
+
+def codificar_quadros(leituras: List[Tuple]) -> bytes:
+    """
+    Empacota leituras no formato do quadro (usado por simuladores e pelo benchmark).
+
+    Args:
+        leituras: Tuplas (dispositivo, sequencia, timestamp_ms, umidade, ph,
+                  fosforo, potassio, bomba[, reinicio])
+
+    Returns:
+        Bytes com os quadros concatenados
+
+    Raises:
+        ValueError: Se alguma umidade ou pH estiver fora da faixa ou for NaN
+    """
+    if not leituras:
+        return b''
+    colunas = list(zip(*leituras))
+    return montar_quadros(*colunas).tobytes()
+
+
+def montar_quadros(dispositivo: np.ndarray, sequencia: np.ndarray, timestamp_ms: np.ndarray,
+                   umidade: np.ndarray, ph: np.ndarray, fosforo: np.ndarray,
+                   potassio: np.ndarray, bomba: np.ndarray, reinicio: np.ndarray = 0) -> np.ndarray:
+    """
+    Monta o array de quadros a partir de colunas (versão vetorizada de codificar_quadros).
+
+    Raises:
+        ValueError: Se alguma umidade ou pH estiver fora da faixa ou for NaN
+            (o valor em centésimos não cabe no campo de 16 bits)
+    """
+    umidade = np.asarray(umidade, dtype=np.float64)
+    ph = np.asarray(ph, dtype=np.float64)
+    for nome, valores, (minimo, maximo) in (('umidade', umidade, FAIXA_UMIDADE), ('ph', ph, FAIXA_PH)):
+        # A comparação com NaN é falsa: NaN também conta como inválido
+        invalidos = ~((valores >= minimo) & (valores <= maximo))
+        if invalidos.any():
+            raise ValueError(f"{int(invalidos.sum())} leituras com {nome} fora de {minimo:g}-{maximo:g} ou NaN "
+                             f"(primeira: {valores[invalidos][0]})")
+    quadros = np.empty(len(dispositivo), dtype=DTYPE_QUADRO)
+    quadros['versao'] = VERSAO_QUADRO
+    quadros['estados'] = (np.asarray(fosforo, dtype=np.uint8) * BIT_FOSFORO
+                          | np.asarray(potassio, dtype=np.uint8) * BIT_POTASSIO
+                          | np.asarray(bomba, dtype=np.uint8) * BIT_BOMBA)
+    quadros['dispositivo'] = dispositivo
+    quadros['sequencia'] = sequencia
+    quadros['segundos'], quadros['milissegundos'] = np.divmod(np.asarray(timestamp_ms, dtype=np.int64), 1000)
+    quadros['umidade'] = np.rint(umidade * 100)
+    quadros['ph'] = np.rint(ph * 100)
+    quadros['reinicio'] = reinicio
+    return quadros
+
+
+def decodificar_quadros(buffer: bytes, epoch: bool = False) -> Tuple[List[Tuple], bytes]:
+    """
+    Decodifica todos os quadros completos de um buffer em registros, de uma vez
+    (numpy.frombuffer e conversão por coluna, sem laço por quadro).
+
+    Args:
+        buffer: Bytes recebidos (podem terminar com um quadro incompleto)
+        epoch: data_hora em epoch (ms) em vez de texto ISO
+
+    Returns:
+        Tupla (registros na ordem de COLUNAS_QUADRO, bytes restantes)
+
+    Raises:
+        ValueError: Se algum quadro tiver versão desconhecida
+    """
+    quadros, resto = decodificar_quadros_numpy(buffer)
+    return registros_de_array(quadros, epoch), resto
+
+
+def decodificar_quadros_numpy(buffer: bytes) -> Tuple[np.ndarray, bytes]:
+    """
+    Decodifica os quadros completos de um buffer sem cópia, como array estruturado.
+
+    Args:
+        buffer: Bytes recebidos (podem terminar com um quadro incompleto)
+
+    Returns:
+        Tupla (array com DTYPE_QUADRO, bytes restantes)
+
+    Raises:
+        ValueError: Se algum quadro tiver versão desconhecida
+    """
+    completos = len(buffer) // TAMANHO_QUADRO
+    quadros = np.frombuffer(buffer, dtype=DTYPE_QUADRO, count=completos)
+    if completos and (quadros['versao'] != VERSAO_QUADRO).any():
+        raise ValueError("Versão de quadro desconhecida no buffer")
+    return quadros, bytes(buffer[completos * TAMANHO_QUADRO:])
+
+
+def registros_de_array(quadros: np.ndarray, epoch: bool = False) -> List[Tuple]:
+    """
+    Converte o array decodificado em registros na ordem de COLUNAS_QUADRO.
+
+    Todas as colunas, inclusive a data_hora, são convertidas em bloco. Com
+    epoch=True (banco com data_hora em epoch) o timestamp vai direto, em ms;
+    senão vira hora local com o fuso vigente em cada leitura.
+    """
+    chegada = datetime.datetime.now().isoformat(timespec='microseconds')
+    timestamps = quadros['segundos'].astype(np.int64) * 1000 + quadros['milissegundos']
+    if epoch:
+        datas = np.where(timestamps == 0, time.time_ns() // 1_000_000, timestamps).astype(np.int64).tolist()
+    elif len(timestamps):
+        locais = (timestamps + _deslocamentos_fuso(timestamps)).astype('datetime64[ms]')
+        datas = np.datetime_as_string(locais, unit='us').astype(object)
+        datas[timestamps == 0] = chegada
+        datas = datas.tolist()
+    else:
+        datas = []
+    # Centésimos / 100: o mesmo float que float("45.67") no caminho texto
+    umidade = (quadros['umidade'] / 100).tolist()
+    ph = (quadros['ph'] / 100).tolist()
+    # Como chave_sequencia: sem reinício (0), é o próprio contador
+    sequencias = (quadros['reinicio'].astype(np.int64) << BITS_CONTADOR_SEQUENCIA
+                  | quadros['sequencia']).tolist()
+    estados = quadros['estados']
+    return list(zip(datas, quadros['dispositivo'].tolist(), sequencias, umidade, ph,
+                    ((estados & BIT_FOSFORO) > 0).astype(np.int8).tolist(),
+                    ((estados & BIT_POTASSIO) > 0).astype(np.int8).tolist(),
+                    ((estados & BIT_BOMBA) > 0).astype(np.int8).tolist()))
+
+
+def importar_quadros(bd: BancoDadosAgricola, origem: IO, tamanho_lote: int = 5000) -> int:
+    """
+    Lê quadros de um arquivo ou stream binário e grava em lotes. Quadros já
+    gravados (mesmo dispositivo, contador e reinício), por este caminho ou
+    pela linha de texto, são ignorados, então reenviar um arquivo inteiro é seguro.
+
+    Args:
+        bd: Banco de destino
+        origem: Objeto com read() em modo binário (arquivo, socket.makefile('rb'), serial)
+        tamanho_lote: Quadros por transação
+
+    Returns:
+        Número de leituras novas gravadas
+    """
+    gravadas = 0
+    duplicadas = bd.leituras_duplicadas
+    resto = b''
+    while True:
+        dados = origem.read(tamanho_lote * TAMANHO_QUADRO - len(resto))
+        if not dados:
+            break
+        quadros, resto = decodificar_quadros_numpy(resto + dados)
+        if len(quadros):
+            registros = registros_de_array(quadros, bd.data_hora_epoch)
+            gravadas += len(bd.inserir_leituras_em_lote(registros, COLUNAS_QUADRO))
+    if resto:
+        print(f"Aviso: {len(resto)} bytes finais não formam um quadro completo e foram ignorados")
+    if bd.leituras_duplicadas > duplicadas:
+        print(f"{bd.leituras_duplicadas - duplicadas} quadros repetidos ignorados")
+    return gravadas
+
+
+def _medir(nome: str, funcao, quantidade: int, bytes_por_leitura: float) -> None:
+    inicio = time.perf_counter()
+    funcao()
+    duracao = time.perf_counter() - inicio
+    print(f"{nome:<28} {quantidade / duracao:>14,.0f} leituras/s   {bytes_por_leitura:5.1f} bytes/leitura")
+
+
+if __name__ == "__main__":
+    # Benchmark: python protocolo_binario.py [num_leituras]
+    num = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    agora_ms = int(time.time() * 1000)
+    # Umidade e pH com 2 casas, como o firmware imprime
+    leituras = [
+        (i % 8, i, agora_ms + i * 1000, round(random.uniform(20, 90), 2), round(random.uniform(4, 8.5), 2),
+         random.random() < 0.5, random.random() < 0.5, random.random() < 0.3)
+        for i in range(num)
+    ]
+    # Linha de texto com a mesma identificação do quadro (dispositivo e sequência);
+    # o horário é o de chegada, como no servidor_ingestao
+    texto = ''.join(
+        f"{u:.2f},{p:.2f},{'SIM' if f else 'NAO'},{'SIM' if k else 'NAO'},{int(b)},,{d},{s}\n"
+        for d, s, _, u, p, f, k, b in leituras
+    ).encode('utf-8')
+    texto_simples = sum(len(f"{u:.2f},{p:.2f},{'SIM' if f else 'NAO'},{'SIM' if k else 'NAO'},{int(b)}\n")
+                        for _, _, _, u, p, f, k, b in leituras)
+    binario = codificar_quadros(leituras)
+    print(f"Tamanho: texto {texto_simples / num:.1f} bytes/leitura sem identificação, "
+          f"{len(texto) / num:.1f} com; binário {TAMANHO_QUADRO} bytes/leitura (com identificação e horário)")
+
+    def decodificar_texto():
+        chegada = datetime.datetime.now().isoformat()
+        return [(chegada,) + converter_linha_serial(linha) for linha in texto.decode('utf-8').splitlines()]
+
+    print(f"Decodificação de {num} leituras:")
+    _medir("texto (split/float)", decodificar_texto, num, len(texto) / num)
+    _medir("binário (numpy)", lambda: decodificar_quadros(binario), num, TAMANHO_QUADRO)
+    _medir("binário (numpy, epoch)", lambda: decodificar_quadros(binario, epoch=True), num, TAMANHO_QUADRO)
+
+    print("\nDecodificação + gravação em lote (banco em memória):")
+    with BancoDadosAgricola(":memory:", perfil="ingest") as bd:
+        _medir("texto", lambda: bd.inserir_leituras_em_lote(decodificar_texto(), ('data_hora',) + COLUNAS_SERIAL),
+               num, len(texto) / num)
+    with BancoDadosAgricola(":memory:", perfil="ingest") as bd:
+        _medir("binário (numpy)", lambda: importar_quadros(bd, io.BytesIO(binario)),
+               num, TAMANHO_QUADRO)
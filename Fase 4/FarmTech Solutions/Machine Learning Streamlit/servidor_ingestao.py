@@ -0,0 +1,355 @@
+import asyncio
+import argparse
+import datetime
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+from banco_dados_agricola import BancoDadosAgricola, COLUNAS_SERIAL, converter_linha_serial
+
+# Ordem dos valores de cada item da fila (data_hora de recebimento + campos do serial)
+COLUNAS_FILA = ('data_hora',) + COLUNAS_SERIAL
+
+# Marca colocada na fila no desligamento: tudo o que veio antes dela é gravado
+_FIM = object()
+
+# Pausa máxima (s) entre novas tentativas de um lote com falha
+PAUSA_MAXIMA_REGRAVACAO = 30.0
+
+
+class ServidorIngestao:
+    """
+    Servidor asyncio que recebe leituras dos ESP32 por TCP e/ou UDP.
+
+    Cada linha segue o protocolo do monitor serial
+    ("umidade,ph,fosforo,potassio,status_bomba[,observacoes[,dispositivo,sequencia[,reinicio]]]",
+    com SIM/NAO para fósforo e potássio) e vai para uma fila limitada. Linhas
+    reenviadas por um gateway depois de uma queda da conexão, com dispositivo e
+    sequência já gravados, são ignoradas e contadas em leituras_duplicadas. Uma única tarefa escritora
+    esvazia a fila em lotes, por tamanho ou por tempo, com
+    inserir_leituras_em_lote em uma thread dedicada ao SQLite.
+
+    Com a fila cheia, as conexões TCP param de ser lidas (o controle de fluxo do
+    TCP segura os dispositivos); linhas UDP excedentes são descartadas e
+    contadas. Ao parar, tudo o que já entrou na fila é gravado antes de fechar o banco.
+
+    Um lote que falha ao gravar (ex.: banco travado ou disco cheio) é tentado de
+    novo com pausas crescentes. Se todas as tentativas falharem, ele fica em
+    lotes_com_falha e a escritora para de esvaziar a fila até conseguir gravá-lo
+    (pausas de até PAUSA_MAXIMA_REGRAVACAO): a fila enche e vale o mesmo
+    controle de fluxo de um banco lento, sem acumular leituras na memória.
+    Nenhuma leitura aceita é descartada; o que ainda não foi gravado ao parar
+    faz parar() levantar um erro, com as leituras disponíveis em lotes_com_falha.
+    """
+
+    def __init__(self, nome_bd: str = "dados_agricolas.db", host: str = "127.0.0.1",
+                 porta_tcp: Optional[int] = 9000, porta_udp: Optional[int] = None,
+                 tamanho_fila: int = 10000, tamanho_lote: int = 1000,
+                 intervalo_flush: float = 1.0, perfil: str = "ingest",
+                 tentativas: int = 3, pausa_tentativas: float = 0.5):
+        """
+        Args:
+            nome_bd: Arquivo SQLite de destino
+            host: Endereço de escuta
+            porta_tcp: Porta TCP (None desativa; 0 escolhe uma porta livre)
+            porta_udp: Porta UDP (None desativa; 0 escolhe uma porta livre)
+            tamanho_fila: Máximo de leituras aguardando gravação
+            tamanho_lote: Leituras por transação
+            intervalo_flush: Tempo máximo (s) que uma leitura espera na fila
+            perfil: Perfil de desempenho do banco usado pela escritora
+            tentativas: Tentativas de gravação de um lote antes de guardá-lo em lotes_com_falha
+            pausa_tentativas: Pausa (s) antes da segunda tentativa; dobra a cada nova falha
+        """
+        self.nome_bd = nome_bd
+        self.host = host
+        self.porta_tcp = porta_tcp
+        self.porta_udp = porta_udp
+        self.tamanho_lote = tamanho_lote
+        self.intervalo_flush = intervalo_flush
+        self.perfil = perfil
+        self.tentativas = tentativas
+        self.pausa_tentativas = pausa_tentativas
+        # Lotes que não puderam ser gravados, do mais antigo ao mais novo (ordem de COLUNAS_FILA)
+        self.lotes_com_falha = deque()
+        self._ultimo_erro = None
+
+        self._tamanho_fila = tamanho_fila
+        self._fila = None
+        self._parando = None
+        self._servidor_tcp = None
+        self._transporte_udp = None
+        self._tarefa_escritora = None
+        self._conexoes = set()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="escritor-sqlite")
+        self._bd = None
+        self._estatisticas = {
+            'linhas_recebidas': 0,
+            'linhas_invalidas': 0,
+            'linhas_udp_descartadas': 0,
+            'leituras_gravadas': 0,
+            'leituras_duplicadas': 0,
+            'lotes_gravados': 0,
+            'falhas_gravacao': 0,
+            'leituras_com_falha': 0,
+        }
+
+    # --- Ciclo de vida ---
+
+    async def iniciar(self) -> None:
+        """Abre o banco, inicia a tarefa escritora e os listeners TCP/UDP."""
+        loop = asyncio.get_running_loop()
+        self._fila = asyncio.Queue(maxsize=self._tamanho_fila)
+        self._parando = asyncio.Event()
+        # O banco é aberto na própria thread escritora (conexões SQLite são por thread)
+        self._bd = await loop.run_in_executor(
+            self._executor, lambda: BancoDadosAgricola(self.nome_bd, perfil=self.perfil)
+        )
+        self._tarefa_escritora = asyncio.create_task(self._escritor())
+
+        if self.porta_tcp is not None:
+            self._servidor_tcp = await asyncio.start_server(
+                self._atender_tcp, self.host, self.porta_tcp
+            )
+            self.porta_tcp = self._servidor_tcp.sockets[0].getsockname()[1]
+
+        if self.porta_udp is not None:
+            self._transporte_udp, _ = await loop.create_datagram_endpoint(
+                lambda: _ProtocoloUDP(self), local_addr=(self.host, self.porta_udp)
+            )
+            self.porta_udp = self._transporte_udp.get_extra_info('sockname')[1]
+
+    async def parar(self, espera_conexoes: float = 5.0) -> None:
+        """
+        Para de aceitar dados e grava tudo o que já está na fila antes de fechar o banco.
+
+        Args:
+            espera_conexoes: Tempo (s) dado às conexões TCP abertas para terminar de
+                enviar; depois disso elas são encerradas
+
+        Raises:
+            RuntimeError: Se ficaram leituras sem gravar (em lotes_com_falha)
+        """
+        if self._servidor_tcp is not None:
+            self._servidor_tcp.close()
+        if self._transporte_udp is not None:
+            self._transporte_udp.close()
+
+        conexoes = list(self._conexoes)
+        if conexoes:
+            _, pendentes = await asyncio.wait(conexoes, timeout=espera_conexoes)
+            for tarefa in pendentes:
+                tarefa.cancel()
+            await asyncio.gather(*conexoes, return_exceptions=True)
+        if self._servidor_tcp is not None:
+            await self._servidor_tcp.wait_closed()
+
+        if self._tarefa_escritora is not None:
+            # A escritora deixa de esperar pelos lotes com falha e esvazia a fila
+            self._parando.set()
+            await self._fila.put(_FIM)
+            await self._tarefa_escritora
+            await self._regravar_falhas()
+
+        if self._bd is not None:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._bd.fechar)
+            self._bd = None
+        self._executor.shutdown(wait=True)
+
+        if self.lotes_com_falha:
+            raise RuntimeError(
+                f"{self._estatisticas['leituras_com_falha']} leituras não puderam ser gravadas "
+                "(disponíveis em lotes_com_falha)"
+            ) from self._ultimo_erro
+
+    async def __aenter__(self):
+        await self.iniciar()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.parar()
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """Retorna os contadores do servidor e a ocupação atual da fila."""
+        dados = dict(self._estatisticas)
+        dados['fila'] = self._fila.qsize() if self._fila is not None else 0
+        return dados
+
+    # --- Recepção ---
+
+    def _converter(self, linha: str) -> Optional[Tuple]:
+        """Converte uma linha recebida no item da fila (ordem de COLUNAS_FILA)."""
+        self._estatisticas['linhas_recebidas'] += 1
+        try:
+            registro = converter_linha_serial(linha)
+        except (ValueError, IndexError):
+            registro = None
+        if registro is None:
+            self._estatisticas['linhas_invalidas'] += 1
+            return None
+        return (datetime.datetime.now().isoformat(),) + registro
+
+    async def _atender_tcp(self, reader: asyncio.StreamReader,
+                           writer: asyncio.StreamWriter) -> None:
+        """Lê linhas de uma conexão TCP; espera na fila cheia (backpressure)."""
+        tarefa = asyncio.current_task()
+        self._conexoes.add(tarefa)
+        try:
+            while True:
+                linha = await reader.readline()
+                if not linha:
+                    break
+                item = self._converter(linha.decode('utf-8', errors='replace'))
+                if item is not None:
+                    await self._fila.put(item)
+        except (asyncio.CancelledError, ConnectionError):
+            pass
+        finally:
+            self._conexoes.discard(tarefa)
+            writer.close()
+
+    def _receber_datagrama(self, dados: bytes) -> None:
+        """Enfileira as linhas de um datagrama; sem espaço na fila, descarta."""
+        for linha in dados.decode('utf-8', errors='replace').splitlines():
+            if not linha.strip():
+                continue
+            item = self._converter(linha)
+            if item is None:
+                continue
+            try:
+                self._fila.put_nowait(item)
+            except asyncio.QueueFull:
+                self._estatisticas['linhas_udp_descartadas'] += 1
+
+    # --- Gravação ---
+
+    async def _escritor(self) -> None:
+        """Tarefa única que agrupa a fila em lotes e grava no banco."""
+        loop = asyncio.get_running_loop()
+        terminar = False
+
+        while not terminar:
+            await self._esperar_falhas()
+            item = await self._fila.get()
+            if item is _FIM:
+                break
+            lote = [item]
+            prazo = loop.time() + self.intervalo_flush
+
+            while len(lote) < self.tamanho_lote:
+                if self._fila.empty():
+                    restante = prazo - loop.time()
+                    if restante <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._fila.get(), restante)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = self._fila.get_nowait()
+                if item is _FIM:
+                    terminar = True
+                    break
+                lote.append(item)
+
+            # Só há lotes com falha aqui no desligamento: este vai depois deles,
+            # mantendo a ordem de chegada, e parar() faz a última tentativa
+            if self.lotes_com_falha or not await self._gravar(lote):
+                self.lotes_com_falha.append(lote)
+                self._estatisticas['leituras_com_falha'] += len(lote)
+
+    async def _esperar_falhas(self) -> None:
+        """
+        Enquanto houver lotes em lotes_com_falha, tenta regravá-los com pausas
+        crescentes, sem tirar nada da fila. No desligamento, desiste para que
+        a fila seja esvaziada.
+        """
+        pausa = self.pausa_tentativas
+        while not self._parando.is_set() and not await self._regravar_falhas():
+            try:
+                await asyncio.wait_for(self._parando.wait(), pausa)
+            except asyncio.TimeoutError:
+                pass
+            pausa = min(pausa * 2, PAUSA_MAXIMA_REGRAVACAO)
+
+    async def _regravar_falhas(self) -> bool:
+        """
+        Tenta gravar os lotes de lotes_com_falha, do mais antigo ao mais novo.
+
+        Returns:
+            True se não sobrou nenhum
+        """
+        while self.lotes_com_falha:
+            if not await self._gravar(self.lotes_com_falha[0]):
+                return False
+            lote = self.lotes_com_falha.popleft()
+            self._estatisticas['leituras_com_falha'] -= len(lote)
+        return True
+
+    async def _gravar(self, lote: List[Tuple]) -> bool:
+        """
+        Grava um lote na thread do SQLite, com até `tentativas` tentativas
+        (a transação de uma tentativa que falha é desfeita por inteiro).
+
+        Returns:
+            True se o lote foi gravado
+        """
+        loop = asyncio.get_running_loop()
+        pausa = self.pausa_tentativas
+        for tentativa in range(1, self.tentativas + 1):
+            try:
+                ids = await loop.run_in_executor(
+                    self._executor, self._bd.inserir_leituras_em_lote, lote, COLUNAS_FILA
+                )
+            except Exception as e:
+                self._estatisticas['falhas_gravacao'] += 1
+                self._ultimo_erro = e
+                print(f"Erro ao gravar lote de {len(lote)} leituras "
+                      f"(tentativa {tentativa} de {self.tentativas}): {e}")
+                if tentativa < self.tentativas:
+                    await asyncio.sleep(pausa)
+                    pausa *= 2
+                continue
+            self._estatisticas['leituras_gravadas'] += len(ids)
+            self._estatisticas['leituras_duplicadas'] += len(lote) - len(ids)
+            self._estatisticas['lotes_gravados'] += 1
+            return True
+        return False
+
+
+class _ProtocoloUDP(asyncio.DatagramProtocol):
+    """Repasse dos datagramas UDP para o servidor."""
+
+    def __init__(self, servidor: ServidorIngestao):
+        self.servidor = servidor
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        self.servidor._receber_datagrama(data)
+
+
+async def executar(args) -> None:
+    """Executa o servidor até Ctrl+C."""
+    servidor = ServidorIngestao(args.banco, args.host, args.porta_tcp, args.porta_udp,
+                                tamanho_lote=args.lote, intervalo_flush=args.intervalo)
+    async with servidor:
+        print(f"Recebendo leituras em {args.host} (TCP {servidor.porta_tcp}, UDP {servidor.porta_udp})")
+        try:
+            while True:
+                await asyncio.sleep(10)
+                print(f"Estatísticas: {servidor.estatisticas()}")
+        except asyncio.CancelledError:
+            pass
+    print(f"Servidor encerrado. Estatísticas finais: {servidor.estatisticas()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor de ingestão das leituras dos ESP32")
+    parser.add_argument("--banco", default="dados_agricolas.db")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--porta-tcp", type=int, default=9000)
+    parser.add_argument("--porta-udp", type=int, default=9001)
+    parser.add_argument("--lote", type=int, default=1000)
+    parser.add_argument("--intervalo", type=float, default=1.0)
+    try:
+        asyncio.run(executar(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,109 @@
+import os
+import sys
+import sqlite3
+import argparse
+import tempfile
+import datetime
+from typing import List
+
+from banco_dados_agricola import BancoDadosAgricola, VERSAO_ESQUEMA
+
+# Tabela de leituras como era criada antes das migrações (sem dispositivo,
+# sequencia nem resumos): na Fase 3, sem as colunas de previsão
+ESQUEMAS_ANTIGOS = {
+    'fase3': '''
+    CREATE TABLE leituras_sensores (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        data_hora TEXT NOT NULL,
+        umidade REAL,
+        ph REAL,
+        fosforo INTEGER,
+        potassio INTEGER,
+        status_bomba INTEGER,
+        observacoes TEXT
+    )
+    ''',
+    'fase4': '''
+    CREATE TABLE leituras_sensores (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        data_hora TEXT NOT NULL,
+        umidade REAL,
+        ph REAL,
+        fosforo INTEGER,
+        potassio INTEGER,
+        status_bomba INTEGER,
+        previsao_irrigacao INTEGER,
+        confianca_previsao REAL,
+        observacoes TEXT
+    )
+    ''',
+}
+
+
+def criar_banco_antigo(caminho: str, esquema: str, leituras: int = 500) -> None:
+    """
+    Cria um banco no formato antigo, com leituras a cada 10 minutos. Na Fase 3,
+    fósforo e potássio guardam o nível do botão (0-100).
+    """
+    conn = sqlite3.connect(caminho)
+    conn.execute(ESQUEMAS_ANTIGOS[esquema])
+    inicio = datetime.datetime(2024, 1, 1)
+    nivel = 60 if esquema == 'fase3' else 1
+    conn.executemany(
+        'INSERT INTO leituras_sensores (data_hora, umidade, ph, fosforo, potassio, status_bomba, observacoes) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?)',
+        [((inicio + datetime.timedelta(minutes=10 * i)).isoformat(), 40.0 + i % 20, 6.5,
+          nivel * (i % 2), 0, i % 2, "") for i in range(leituras)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def verificar_banco(caminho: str, migrar: bool = True) -> List[str]:
+    """
+    Abre um banco antigo com BancoDadosAgricola e confere a migração: versão
+    do esquema, fósforo em presença (0/1) e resumos batendo com as leituras.
+
+    Args:
+        caminho: Banco no formato antigo
+        migrar: Migra ao abrir (False chama migrar_esquema() depois)
+
+    Returns:
+        Lista de problemas encontrados (vazia se estiver tudo certo)
+    """
+    problemas = []
+    with BancoDadosAgricola(caminho, migrar=migrar) as bd:
+        if not migrar:
+            bd.migrar_esquema()
+        versao = bd.conn.execute('PRAGMA user_version').fetchone()[0]
+        if versao != VERSAO_ESQUEMA:
+            problemas.append(f"versão do esquema {versao}, esperada {VERSAO_ESQUEMA}")
+        leituras, fosforo = bd.conn.execute('SELECT COUNT(*), MAX(fosforo) FROM leituras_sensores').fetchone()
+        if fosforo is not None and fosforo > 1:
+            problemas.append(f"fósforo não convertido para presença (máximo {fosforo})")
+        for tabela in ('resumo_horario', 'resumo_diario'):
+            resumidas = bd.conn.execute(f'SELECT COALESCE(SUM(quantidade), 0) FROM {tabela}').fetchone()[0]
+            if resumidas != leituras:
+                problemas.append(f"{tabela} com {resumidas} leituras, esperadas {leituras}")
+    return problemas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Confere a abertura e a migração de bancos no formato antigo")
+    parser.add_argument("--leituras", type=int, default=500)
+    args = parser.parse_args()
+
+    falhas = 0
+    with tempfile.TemporaryDirectory() as pasta:
+        for esquema in ESQUEMAS_ANTIGOS:
+            for migrar in (True, False):
+                caminho = os.path.join(pasta, f"{esquema}_{int(migrar)}.db")
+                criar_banco_antigo(caminho, esquema, args.leituras)
+                try:
+                    problemas = verificar_banco(caminho, migrar)
+                except sqlite3.Error as e:
+                    problemas = [f"erro ao abrir: {e}"]
+                situacao = "OK" if not problemas else "FALHOU: " + "; ".join(problemas)
+                print(f"Banco {esquema} (migrar={migrar}): {situacao}")
+                falhas += bool(problemas)
+    sys.exit(1 if falhas else 0)